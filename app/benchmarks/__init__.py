@@ -0,0 +1 @@
+# makes benchmarks importable (python -m benchmarks.<script> desde app/)
@@ -0,0 +1,94 @@
+# benchmarks/bench_banner_batch.py
+"""
+Lote de banners (services.banner_batch) contra un n8n falso local: throughput y latencia
+por ítem según la concurrencia. El servidor falso tarda una latencia log-normal por banner
+y solo atiende --server-capacity a la vez; por encima responde 503 con Retry-After, como
+un n8n saturado. Las llamadas pasan por el n8n_client real (HTTP de verdad, sin red externa).
+
+Uso (desde app/):
+    python -m benchmarks.bench_banner_batch --items 40 --concurrency 1 4 8 16
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data")
+
+
+def _fake_n8n(median_s: float, capacity: int):
+    busy = threading.BoundedSemaphore(capacity)
+    stats = {"503": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if not busy.acquire(blocking=False):
+                stats["503"] += 1
+                self.send_response(503)
+                self.send_header("Retry-After", "1")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            try:
+                time.sleep(random.lognormvariate(math.log(median_s), 0.3))
+            finally:
+                busy.release()
+            body = json.dumps({"status": "ok", "banner_url": f"https://bench.invalid/{time.time_ns()}.png"}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, fmt, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, stats
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--items", type=int, default=40)
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    ap.add_argument("--median-s", type=float, default=1.5, help="Latencia mediana del flujo por banner.")
+    ap.add_argument("--server-capacity", type=int, default=8, help="Banners que n8n procesa a la vez.")
+    args = ap.parse_args()
+
+    httpd, stats = _fake_n8n(args.median_s, args.server_capacity)
+    os.environ["N8N_WEBHOOK_URL"] = f"http://127.0.0.1:{httpd.server_address[1]}/webhook/banner/generate"
+    from services import banner_batch, n8n_client
+    n8n_client.N8N_WEBHOOK_URL = os.environ["N8N_WEBHOOK_URL"]
+
+    base = open(os.path.join(_DATA_DIR, "base_images", "Base2-banner.jpg"), "rb").read()
+    samples = [open(p, "rb").read() for p in sorted(glob.glob(os.path.join(_DATA_DIR, "product_images", "*.jpg")))]
+    products = [(f"producto_{i:03d}.jpg", samples[i % len(samples)]) for i in range(args.items)]
+
+    print(f"{args.items} banners, n8n falso: mediana {args.median_s:g} s, capacidad {args.server_capacity}")
+    print(f"{'conc.':>5} {'ok':>4} {'fallidos':>8} {'segundos':>9} {'banners/min':>11} "
+          f"{'p50 s':>6} {'p90 s':>6} {'máx s':>6} {'503s':>5}")
+    for c in args.concurrency:
+        stats["503"] = 0
+        batch = banner_batch.BannerBatch(base, products, concurrency=c, prepare=False)
+        batch.start()
+        while batch.running:
+            time.sleep(0.05)
+        r = batch.report()
+        print(f"{c:>5} {r['done']:>4} {r['failed']:>8} {r['wall_s']:>9.1f} {r['per_min']:>11.1f} "
+              f"{r['latency_p50_s'] or 0:>6.2f} {r['latency_p90_s'] or 0:>6.2f} {r['latency_max_s'] or 0:>6.2f} "
+              f"{stats['503']:>5}")
+    httpd.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# benchmarks/bench_banner_cache.py
+"""
+Caché de banners (services.banner_cache) contra un n8n falso local: un lote donde los
+mismos productos se repiten (re-subidas, el mismo catálogo pedido otra vez) corrido sin
+caché, con caché fría y con caché caliente. Se reportan las llamadas reales a n8n, el
+tiempo total y la latencia de un acierto frente a una generación.
+
+Uso (desde app/):
+    python -m benchmarks.bench_banner_cache --items 60 --distinct 20
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data")
+_TMP = tempfile.mkdtemp()
+os.environ["BANNER_CACHE_PATH"] = os.path.join(_TMP, "banner_cache.sqlite3")
+os.environ["BANNER_CACHE_DIR"] = os.path.join(_TMP, "files")
+
+
+def _fake_n8n(median_s: float):
+    calls = {"n": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            with lock:
+                calls["n"] += 1
+            time.sleep(random.lognormvariate(math.log(median_s), 0.3))
+            body = json.dumps({"status": "ok", "banner_url": f"https://bench.invalid/{time.time_ns()}.png"}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, fmt, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, calls
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--items", type=int, default=60, help="Productos en el lote (con repetidos).")
+    ap.add_argument("--distinct", type=int, default=20, help="Productos distintos entre ellos.")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--median-s", type=float, default=1.0, help="Latencia mediana del flujo por banner.")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    httpd, calls = _fake_n8n(args.median_s)
+    os.environ["N8N_WEBHOOK_URL"] = f"http://127.0.0.1:{httpd.server_address[1]}/webhook/banner/generate"
+    from services import banner_batch, banner_cache, n8n_client
+    n8n_client.N8N_WEBHOOK_URL = os.environ["N8N_WEBHOOK_URL"]
+
+    base = open(os.path.join(_DATA_DIR, "base_images", "Base2-banner.jpg"), "rb").read()
+    samples = [open(p, "rb").read() for p in sorted(glob.glob(os.path.join(_DATA_DIR, "product_images", "*.jpg")))]
+    # variantes distintas por contenido (la llave es el sha256 de los bytes enviados)
+    distinct = [samples[i % len(samples)] + i.to_bytes(4, "big") for i in range(args.distinct)]
+    rnd = random.Random(args.seed)
+    products = [(f"producto_{i:03d}.jpg", rnd.choice(distinct)) for i in range(args.items)]
+
+    print(f"{args.items} banners ({args.distinct} distintos), concurrencia {args.concurrency}, "
+          f"n8n falso: mediana {args.median_s:g} s")
+    print(f"{'escenario':<22} {'llamadas n8n':>12} {'de caché':>8} {'segundos':>9}")
+    for label, enabled in (("sin caché", False), ("caché fría", True), ("caché caliente", True)):
+        banner_cache.BANNER_CACHE_ENABLED = enabled
+        calls["n"] = 0
+        batch = banner_batch.BannerBatch(base, products, concurrency=args.concurrency, prepare=False)
+        batch.start()
+        while batch.running:
+            time.sleep(0.05)
+        r = batch.report()
+        print(f"{label:<22} {calls['n']:>12} {r['cached']:>8} {r['wall_s']:>9.1f}")
+
+    cache = banner_cache.get_cache()
+    key = cache.key(base, distinct[0], "default")
+    t0 = time.perf_counter()
+    for _ in range(200):
+        cache.get(key)
+    hit_ms = (time.perf_counter() - t0) / 200 * 1000
+    print(f"acierto: {hit_ms:.2f} ms por consulta vs ~{args.median_s * 1000:.0f} ms por generación "
+          f"({cache.stats()['rows']} entradas)")
+    httpd.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# benchmarks/bench_banner_polling.py
+"""
+Seguimiento de jobs asíncronos de banners: el bucle anterior (fetch_status cada 3 s fijos,
+bloqueando la sesión hasta 120 s) contra el registro de services.banner_jobs (backoff +
+jitter, consultado desde el panel en cada refresco).
+
+Se usa el registro real sobre una base SQLite temporal con reloj virtual y un n8n falso
+cuyos jobs tardan una duración log-normal. Se reportan las consultas de estado, la
+demora en enterarse del resultado, los jobs perdidos y el tiempo que la sesión queda
+bloqueada (para el registro, el costo real de cada refresco del panel).
+
+Uso (desde app/):
+    python -m benchmarks.bench_banner_polling --jobs 200 --median-s 45
+"""
+import argparse
+import math
+import os
+import random
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("BANNER_JOBS_DB_PATH", os.path.join(tempfile.mkdtemp(), "banner_jobs.sqlite3"))
+
+from services import banner_jobs  # noqa: E402
+
+_OLD_INTERVAL_S, _OLD_TIMEOUT_S = 3.0, 120.0
+
+
+def _pct(values: list, q: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--jobs", type=int, default=200)
+    ap.add_argument("--median-s", type=float, default=45.0, help="Mediana de la duración de un job en n8n.")
+    ap.add_argument("--sigma", type=float, default=0.6, help="Dispersión log-normal de la duración.")
+    ap.add_argument("--ui-refresh-s", type=float, default=2.0, help="Cada cuánto corre el panel (fragment).")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    rnd = random.Random(args.seed)
+    durations = [rnd.lognormvariate(math.log(args.median_s), args.sigma) for _ in range(args.jobs)]
+
+    # --- bucle anterior: una consulta cada 3 s hasta 120 s, con la sesión bloqueada
+    old_polls = old_lost = 0
+    old_delay, old_blocked = [], 0.0
+    for d in durations:
+        if d > _OLD_TIMEOUT_S:
+            old_lost += 1
+            old_polls += int(_OLD_TIMEOUT_S // _OLD_INTERVAL_S) + 1
+            old_blocked += _OLD_TIMEOUT_S
+            continue
+        n = math.ceil(d / _OLD_INTERVAL_S)
+        old_polls += n + 1
+        old_delay.append(n * _OLD_INTERVAL_S - d)
+        old_blocked += n * _OLD_INTERVAL_S
+
+    # --- registro: todos los jobs en curso a la vez, el panel refresca cada --ui-refresh-s
+    start = 1_000_000.0
+    ends = {f"job{i}": start + d for i, d in enumerate(durations)}
+    polls = 0
+
+    def fetch(job_id):
+        nonlocal polls
+        polls += 1
+        return ("done", f"https://bench.invalid/{job_id}.png") if now >= ends[job_id] else ("processing", None)
+
+    for job_id in ends:
+        banner_jobs.track(job_id, "bench", now=start)
+    delays, tick_ms, now = {}, [], start
+    while len(delays) < len(ends) and now - start < banner_jobs.BANNER_JOB_TIMEOUT_S + 60:
+        now += args.ui_refresh_s
+        t0 = time.perf_counter()
+        for job in banner_jobs.poll_due("bench", now=now, fetch=fetch):
+            delays[job.id] = now - ends[job.id] if job.status == banner_jobs.DONE else None
+        tick_ms.append((time.perf_counter() - t0) * 1000)
+    new_delay = [d for d in delays.values() if d is not None]
+    new_lost = len(ends) - len(new_delay)
+
+    print(f"{args.jobs} jobs, duración mediana {statistics.median(durations):.0f} s (máx {max(durations):.0f} s)")
+    print(f"{'estrategia':<26} {'consultas':>9} {'por job':>8} {'demora p50':>10} {'demora p90':>10} "
+          f"{'perdidos':>8} {'sesión bloqueada':>17}")
+    print(f"{'fijo 3 s (anterior)':<26} {old_polls:>9} {old_polls / args.jobs:>8.1f} {_pct(old_delay, .5):>9.1f}s "
+          f"{_pct(old_delay, .9):>9.1f}s {old_lost:>8} {old_blocked / args.jobs:>15.0f} s")
+    print(f"{'backoff + jitter (registro)':<26} {polls:>9} {polls / args.jobs:>8.1f} {_pct(new_delay, .5):>9.1f}s "
+          f"{_pct(new_delay, .9):>9.1f}s {new_lost:>8} {statistics.mean(tick_ms):>12.2f} ms/refresco")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# benchmarks/bench_classify_many.py
+"""
+Benchmark de classify_many contra un modelo falso local (sin red ni API key).
+
+Uso (desde app/):
+    python -m benchmarks.bench_classify_many --n 500 --latency-ms 200 --concurrency 1 4 8 16 --pack-size 1 20
+
+El modelo falso reemplaza a `gemini_classifier.model`: simula la latencia de una
+petición (fija + por texto) con time.sleep y responde JSON como Gemini, así que se
+mide el camino real de armado de prompts y parseo, más el solapamiento del pool.
+Con --invalid-rate una fracción de los ítems vuelve con valores fuera del esquema
+(se corrigen al re-pedirlos), para medir cuántas re-peticiones cuesta.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+# el benchmark asigna un modelo falso: nunca se configura ni se llama a la API real.
+# el modelo falso no tiene cuota: sin tope de peticiones/tokens para medir solo el pool
+os.environ.setdefault("GEMINI_RPM", "0")
+os.environ.setdefault("GEMINI_TPM", "0")
+
+from services import gemini_classifier  # noqa: E402
+from services.gemini_classifier import classify_many, parse_stats  # noqa: E402
+
+_ITEM_RE = re.compile(r"^(\d+)\. (.*)$", re.MULTILINE)
+
+
+def _label(texto: str) -> dict:
+    sent = "negativo" if "no " in texto else "positivo"
+    return {"Sentimiento": sent, "Clasificacion": "servicio"}
+
+
+class FakeModel:
+    """Imita GenerativeModel.generate_content: latencia = base + por_texto * n."""
+
+    def __init__(self, latency_ms: float, per_item_ms: float, jitter_ms: float, invalid_rate: float = 0.0):
+        self.latency_ms, self.per_item_ms, self.jitter_ms = latency_ms, per_item_ms, jitter_ms
+        self.invalid_rate = invalid_rate
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, contents, generation_config=None):
+        prompt = contents[0]["parts"][0]["text"]
+        items = _ITEM_RE.findall(prompt.split("Textos:\n", 1)[1]) if "Textos:\n" in prompt else []
+        n = max(1, len(items))
+        with self._lock:
+            self.requests += 1
+        delay = self.latency_ms + self.per_item_ms * n + random.uniform(-self.jitter_ms, self.jitter_ms)
+        time.sleep(max(0.0, delay) / 1000)
+        retry = "IMPORTANTE:" in prompt
+
+        def label(txt):
+            if not retry and random.random() < self.invalid_rate:
+                return {"Sentimiento": "muy negativo", "Clasificacion": "??"}
+            return _label(txt)
+
+        if items:
+            payload = [{"n": int(num), **label(txt)} for num, txt in items]
+        else:
+            payload = label(prompt.split("Texto:\n", 1)[-1].split("\n\n", 1)[0])
+        text = json.dumps(payload, ensure_ascii=False)
+        if getattr(generation_config, "response_mime_type", None) != "application/json":
+            text = "```json\n" + text + "\n```"  # sin salida estructurada Gemini suele envolver el JSON
+        part = SimpleNamespace(text=text)
+        return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))])
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--n", type=int, default=500, help="Cantidad de comentarios sintéticos.")
+    ap.add_argument("--latency-ms", type=float, default=200.0, help="Latencia fija por petición.")
+    ap.add_argument("--per-item-ms", type=float, default=5.0, help="Latencia adicional por texto en la petición.")
+    ap.add_argument("--jitter-ms", type=float, default=50.0, help="Variación aleatoria de la latencia.")
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    ap.add_argument("--pack-size", type=int, nargs="+", default=[1], help="Textos por petición (1 = sin empaquetar).")
+    ap.add_argument("--invalid-rate", type=float, default=0.0, help="Fracción de ítems con respuesta inválida.")
+    args = ap.parse_args()
+
+    texts = [f"reclamo {i}: no me dieron un buen trato" if i % 2 else f"reclamo {i}: me gustó la atención"
+             for i in range(args.n)]
+
+    print(f"{'paquete':>8} {'concurrencia':>12} {'peticiones':>10} {'segundos':>10} {'textos/s':>10} {'speedup':>8} "
+          f"{'re-pedidos':>10} {'fallos':>7}")
+    base = None
+    for pack in args.pack_size:
+        for c in args.concurrency:
+            fake = FakeModel(args.latency_ms, args.per_item_ms, args.jitter_ms, args.invalid_rate)
+            before = parse_stats()
+            gemini_classifier.model = fake
+            t0 = time.perf_counter()
+            out = classify_many(texts, max_concurrency=c, pack_size=pack, use_cache=False, use_fast_path=False)
+            dt = time.perf_counter() - t0
+            assert len(out) == len(texts)
+            assert all(p["Sentimiento"] == ("negativo" if i % 2 else "positivo") for i, (p, _) in enumerate(out)), \
+                "classify_many no preservó el orden de entrada"
+            thr = len(texts) / dt
+            base = base or thr
+            after = parse_stats()
+            print(f"{pack:>8} {c:>12} {fake.requests:>10} {dt:>10.2f} {thr:>10.1f} {thr / base:>7.1f}x "
+                  f"{after['retried'] - before['retried']:>10} {after['failed'] - before['failed']:>7}")
+
+
+if __name__ == "__main__":
+    main()
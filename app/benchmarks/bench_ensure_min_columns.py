@@ -0,0 +1,68 @@
+# benchmarks/bench_ensure_min_columns.py
+"""
+Benchmark de ensure_min_columns (vectorizado) contra la versión fila a fila anterior.
+
+Uso (desde app/):
+    python -m benchmarks.bench_ensure_min_columns --rows 10000 100000 1000000
+
+Genera CSV sintéticos en memoria (dni, det_reclamo y, en la mitad de las filas, una
+fecha; ~10 % sin DNI) y verifica que ambas versiones produzcan los mismos formatos:
+Id_reclamo idénticos donde hay DNI y fecha, y el patrón de ksid en el resto.
+"""
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from services.reclamos_schema import ensure_min_columns, ensure_min_columns_rowwise
+
+_KSID_RE = r"^{}-\d{{13}}-[0-9a-f]{{8}}$"
+_DNI_ID_RE = r"^\d+_\d{4}-\d{2}-\d{2}_\d{2}:\d{2}:\d{2}$"
+
+def _synthetic(n: int, seed: int = 3) -> pd.DataFrame:
+    rng = random.Random(seed)
+    base = pd.Timestamp("2025-01-01", tz="UTC")
+    return pd.DataFrame({
+        "dni": [rng.randint(1_000_000, 99_999_999) if rng.random() > 0.1 else None for _ in range(n)],
+        "det_reclamo": [f" reclamo {i} no me dieron un buen trato " for i in range(n)],
+        "fecha": [(base + pd.Timedelta(seconds=rng.randint(0, 10_000_000))).isoformat() if i % 2 else None
+                  for i in range(n)],
+    })
+
+def _check(fast: pd.DataFrame, slow: pd.DataFrame) -> None:
+    assert list(fast.columns) == list(slow.columns), "columnas distintas"
+    given = slow["DNI"].notna() & (fast.index % 2 == 1)
+    assert (fast.loc[given, "Id_reclamo"] == slow.loc[given, "Id_reclamo"]).all(), "Id_reclamo distinto"
+    for df in (fast, slow):
+        has_dni = df["DNI"].notna()
+        assert df.loc[has_dni, "Id_reclamo"].str.match(_DNI_ID_RE).all()
+        assert df.loc[~has_dni, "Id_reclamo"].str.match(_KSID_RE.format("R")).all()
+        assert df["Id_chat"].str.match(_KSID_RE.format("CHAT")).all()
+    assert fast["Id_chat"].is_unique, "Id_chat repetidos"
+    assert fast.loc[fast["DNI"].isna(), "Id_reclamo"].is_unique, "Id_reclamo (ksid) repetidos"
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    ap.add_argument("--skip-rowwise-above", type=int, default=1_000_000,
+                    help="No ejecutar la versión fila a fila por encima de este tamaño.")
+    args = ap.parse_args()
+
+    print(f"{'filas':>9} {'fila a fila (s)':>16} {'vectorizado (s)':>16} {'speedup':>8}")
+    for n in args.rows:
+        raw = _synthetic(n)
+        t0 = time.perf_counter()
+        fast = ensure_min_columns(raw)
+        t_fast = time.perf_counter() - t0
+        if n > args.skip_rowwise_above:
+            print(f"{n:>9} {'-':>16} {t_fast:>16.2f} {'-':>8}")
+            continue
+        t0 = time.perf_counter()
+        slow = ensure_min_columns_rowwise(raw)
+        t_slow = time.perf_counter() - t0
+        _check(fast, slow)
+        print(f"{n:>9} {t_slow:>16.2f} {t_fast:>16.2f} {t_slow / t_fast:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# benchmarks/bench_image_prep.py
+"""
+Bytes ahorrados y tiempo de subida con el preprocesado de imágenes (services.image_prep)
+sobre las imágenes de ejemplo del repo (data/base_images, data/product_images).
+
+La subida se mide de verdad contra un servidor HTTP local, enviando el cuerpo en base64
+(como hoy lo mandan n8n_client y productvision_client) a través de un enlace emulado de
+--uplink-mbps; no se llama a n8n ni a Cloud Run.
+
+Uso (desde app/):
+    python -m benchmarks.bench_image_prep
+    python -m benchmarks.bench_image_prep --uplink-mbps 5 20 --targets banner
+"""
+import argparse
+import base64
+import glob
+import http.client
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from services.image_prep import prepare_image
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data")
+_CHUNK = 16 * 1024
+
+
+class _Sink(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+def _upload_s(port: int, body: bytes, mbps: float) -> float:
+    """Segundos en subir `body` por un enlace de `mbps` (envío a trozos con pausas)."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=300)
+    t0 = time.perf_counter()
+    conn.putrequest("POST", "/")
+    conn.putheader("Content-Length", str(len(body)))
+    conn.endheaders()
+    sent, bytes_per_s = 0, mbps * 1e6 / 8
+    for i in range(0, len(body), _CHUNK):
+        conn.send(body[i:i + _CHUNK])
+        sent += len(body[i:i + _CHUNK])
+        ahead = sent / bytes_per_s - (time.perf_counter() - t0)
+        if ahead > 0:
+            time.sleep(ahead)
+    conn.getresponse().read()
+    conn.close()
+    return time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--images", nargs="+",
+                    default=sorted(glob.glob(os.path.join(_DATA_DIR, "*_images", "*.jpg"))))
+    ap.add_argument("--targets", nargs="+", default=["banner", "product"], choices=["banner", "product"])
+    ap.add_argument("--uplink-mbps", type=float, nargs="+", default=[10.0])
+    args = ap.parse_args()
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Sink)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    port = httpd.server_address[1]
+
+    print(f"{'imagen':<20} {'destino':<8} {'original':>15} {'final':>15} {'ahorro':>7} {'prep ms':>8} "
+          + " ".join(f"{f'subida {m:g}Mb/s':>24}" for m in args.uplink_mbps))
+    totals = {m: [0.0, 0.0] for m in args.uplink_mbps}
+    total_in = total_out = 0
+    for path in args.images:
+        raw = open(path, "rb").read()
+        for target in args.targets:
+            prep = prepare_image(raw, target)
+            total_in, total_out = total_in + len(raw), total_out + len(prep.data)
+            cols = []
+            for m in args.uplink_mbps:
+                before = _upload_s(port, base64.b64encode(raw), m)
+                after = _upload_s(port, base64.b64encode(prep.data), m)
+                totals[m][0] += before
+                totals[m][1] += after
+                cols.append(f"{before * 1000:>9.0f} → {after * 1000:>6.0f} ms")
+            dims = f"{prep.original_size[0]}x{prep.original_size[1]}→{prep.size[0]}x{prep.size[1]}"
+            print(f"{os.path.basename(path):<20} {target:<8} {len(raw) / 1024:>12.1f} KB {len(prep.data) / 1024:>12.1f} KB "
+                  f"{prep.saved_pct:>6.0f}% {prep.elapsed_ms:>8.0f} " + " ".join(f"{c:>24}" for c in cols)
+                  + f"  {dims}{'  (' + prep.note + ')' if prep.note else ''}")
+    httpd.shutdown()
+
+    print(f"\nTotal: {total_in / 1024:,.1f} KB → {total_out / 1024:,.1f} KB "
+          f"({100 * (1 - total_out / max(1, total_in)):.0f}% menos)")
+    for m, (before, after) in totals.items():
+        print(f"Subida a {m:g} Mb/s: {before:.2f} s → {after:.2f} s ({before / max(after, 1e-9):.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
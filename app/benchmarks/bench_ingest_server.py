@@ -0,0 +1,91 @@
+# benchmarks/bench_ingest_server.py
+"""
+Benchmark del servicio de ingesta con micro-lotes, en proceso y sin red externa.
+
+Uso (desde app/):
+    python -m benchmarks.bench_ingest_server --messages 2000 --clients 50 --batch-max 1 50 --wait-ms 0 200
+
+Levanta services.ingest_server en un puerto local con un procesador de lotes falso
+(latencia = base + por_ítem, como una petición empaquetada a Gemini + upsert) y lo
+bombardea con clientes HTTP concurrentes en ráfagas. Reporta latencia extremo a
+extremo (p50/p90/p99 de ?wait=1), mensajes/s y "llamadas al modelo" (= lotes).
+"""
+import argparse
+import http.client
+import json
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services.ingest_server import MicroBatcher, serve
+
+
+def _fake_process(base_ms: float, per_item_ms: float):
+    def process(payloads):
+        time.sleep((base_ms + per_item_ms * len(payloads)) / 1000)
+        return [({"Sentimiento": "negativo", "Clasificacion": "servicio"}, "") for _ in payloads]
+    return process
+
+
+def _client(port: int, n: int, burst: int, pause_ms: float, latencies: list, lock: threading.Lock) -> int:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    rejected = 0
+    for i in range(n):
+        if i and i % burst == 0:
+            time.sleep(random.uniform(0, pause_ms) / 1000)  # ráfagas separadas por silencios
+        body = json.dumps({"Det_reclamo": f"mensaje {i}: el pedido llegó tarde", "DNI": 10000000 + i})
+        t0 = time.perf_counter()
+        conn.request("POST", "/reclamos?wait=1", body, {"Content-Type": "application/json"})
+        resp = conn.getresponse()
+        resp.read()
+        if resp.status == 503:
+            rejected += 1
+            continue
+        with lock:
+            latencies.append(time.perf_counter() - t0)
+    conn.close()
+    return rejected
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--messages", type=int, default=2000)
+    ap.add_argument("--clients", type=int, default=50)
+    ap.add_argument("--burst", type=int, default=10, help="Mensajes seguidos por cliente antes de una pausa.")
+    ap.add_argument("--pause-ms", type=float, default=300.0)
+    ap.add_argument("--base-ms", type=float, default=300.0, help="Latencia fija por lote (petición al modelo).")
+    ap.add_argument("--per-item-ms", type=float, default=5.0)
+    ap.add_argument("--batch-max", type=int, nargs="+", default=[1, 50])
+    ap.add_argument("--wait-ms", type=float, nargs="+", default=[200.0])
+    ap.add_argument("--workers", type=int, default=2, help="Lotes procesándose a la vez.")
+    args = ap.parse_args()
+
+    print(f"{'lote máx':>8} {'ventana ms':>10} {'lotes':>7} {'msj/lote':>8} {'msj/s':>8} "
+          f"{'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'503':>5}")
+    per_client = max(1, args.messages // args.clients)
+    for batch_max in args.batch_max:
+        for wait_ms in args.wait_ms:
+            batcher = MicroBatcher(_fake_process(args.base_ms, args.per_item_ms), batch_max=batch_max,
+                                   wait_ms=wait_ms, workers=args.workers, queue_max=args.messages)
+            httpd = serve("127.0.0.1", 0, batcher)
+            threading.Thread(target=httpd.serve_forever, daemon=True).start()
+            latencies, lock = [], threading.Lock()
+            t0 = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.clients) as pool:
+                rejected = sum(pool.map(lambda _: _client(httpd.server_address[1], per_client, args.burst,
+                                                          args.pause_ms, latencies, lock), range(args.clients)))
+            dt = time.perf_counter() - t0
+            httpd.shutdown()
+            httpd.server_close()
+            batcher.close()
+            s = batcher.stats()
+            q = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+            print(f"{batch_max:>8} {wait_ms:>10.0f} {s['batches']:>7} {s['avg_batch']:>8.1f} "
+                  f"{len(latencies) / dt:>8.1f} {q[49] * 1000:>8.0f} {q[89] * 1000:>8.0f} {q[98] * 1000:>8.0f} "
+                  f"{rejected:>5}")
+
+
+if __name__ == "__main__":
+    main()
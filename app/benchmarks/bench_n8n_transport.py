@@ -0,0 +1,126 @@
+# benchmarks/bench_n8n_transport.py
+"""
+Compara los transportes del webhook de banners (N8N_TRANSPORT): "base64" (campos de texto
+image1_base64/image2_base64) contra "multipart" (archivos binarios base_image/product_image).
+
+Un servidor falso de n8n corre en otro proceso. Lee el cuerpo a --uplink-mbps, parsea el
+multipart y verifica que las dos imágenes lleguen idénticas. En el cliente se miden los
+bytes en el cable, el tiempo de la llamada y el pico de memoria asignada (tracemalloc)
+durante create_banner_with_two_images.
+
+Uso (desde app/):
+    python -m benchmarks.bench_n8n_transport
+    python -m benchmarks.bench_n8n_transport --base ../data/base_images/Base1-banner.jpg --uplink-mbps 10 50
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data")
+
+
+def _serve(port: int, mbps: float) -> None:
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length, chunks, t0 = int(self.headers["Content-Length"]), [], time.perf_counter()
+            got = 0
+            while got < length:  # enlace emulado: el servidor no lee más rápido que --uplink-mbps
+                chunk = self.rfile.read(min(64 * 1024, length - got))
+                chunks.append(chunk)
+                got += len(chunk)
+                ahead = got * 8 / (mbps * 1e6) - (time.perf_counter() - t0)
+                if ahead > 0:
+                    time.sleep(ahead)
+            msg = BytesParser(policy=HTTP).parsebytes(
+                f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + b"".join(chunks))
+            parts = {p.get_param("name", header="content-disposition"): p.get_payload(decode=True)
+                     for p in msg.iter_parts()}
+            if "base_image" in parts:
+                images = parts["base_image"], parts["product_image"]
+            else:
+                images = base64.b64decode(parts["image1_base64"]), base64.b64decode(parts["image2_base64"])
+            digest = "-".join(hashlib.sha1(i).hexdigest()[:12] for i in images)
+            body = json.dumps({"banner_url": f"https://bench.invalid/{digest}.png?wire={length}"}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, fmt, *args):
+            pass
+
+    HTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+
+def _free_port() -> int:
+    import socket
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--base", default=os.path.join(_DATA_DIR, "base_images", "Base1-banner.jpg"))
+    ap.add_argument("--product", default=os.path.join(_DATA_DIR, "product_images", "Alacena.jpg"))
+    ap.add_argument("--uplink-mbps", type=float, nargs="+", default=[20.0])
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    ap.add_argument("--mbps", type=float, default=20.0, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.serve:
+        return _serve(args.serve, args.mbps)
+
+    base, product = open(args.base, "rb").read(), open(args.product, "rb").read()
+    expected = "-".join(hashlib.sha1(i).hexdigest()[:12] for i in (base, product))
+    print(f"imágenes: {len(base) / 1024:,.1f} KB + {len(product) / 1024:,.1f} KB")
+    print(f"{'enlace':>8} {'transporte':>10} {'en el cable':>12} {'overhead':>9} {'ms (mediana)':>13} {'pico memoria':>13}")
+
+    for mbps in args.uplink_mbps:
+        port = _free_port()
+        server = subprocess.Popen([sys.executable, "-m", "benchmarks.bench_n8n_transport",
+                                   "--serve", str(port), "--mbps", str(mbps)])
+        try:
+            os.environ["N8N_WEBHOOK_URL"] = f"http://127.0.0.1:{port}/webhook/banner/generate"
+            from services import n8n_client
+            n8n_client.N8N_WEBHOOK_URL = os.environ["N8N_WEBHOOK_URL"]
+            for _ in range(50):  # esperar a que el servidor escuche
+                try:
+                    __import__("socket").create_connection(("127.0.0.1", port), timeout=0.2).close()
+                    break
+                except OSError:
+                    time.sleep(0.1)
+            for transport in ("base64", "multipart"):
+                times, peaks, wire = [], [], 0
+                for _ in range(max(1, args.repeat)):
+                    tracemalloc.start()
+                    t0 = time.perf_counter()
+                    url = n8n_client.create_banner_with_two_images(
+                        image1_bytes=base, image2_bytes=product, prompt="banner de prueba", transport=transport)
+                    times.append((time.perf_counter() - t0) * 1000)
+                    peaks.append(tracemalloc.get_traced_memory()[1])
+                    tracemalloc.stop()
+                    if expected not in url:
+                        raise SystemExit(f"{transport}: las imágenes llegaron distintas ({url})")
+                    wire = int(url.rsplit("wire=", 1)[-1])
+                times.sort()
+                print(f"{mbps:>6g}Mb {transport:>10} {wire / 1024:>9,.1f} KB "
+                      f"{100 * (wire / (len(base) + len(product)) - 1):>8.1f}% {times[len(times) // 2]:>13.0f} "
+                      f"{max(peaks) / 1024:>10,.1f} KB")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
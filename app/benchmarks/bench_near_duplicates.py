@@ -0,0 +1,73 @@
+# benchmarks/bench_near_duplicates.py
+"""
+Benchmark del pre-pase de casi-duplicados (plan_near_duplicates), 100% local.
+
+Uso (desde app/):
+    python -m benchmarks.bench_near_duplicates --n 10000 100000 300000 --threshold 0.9
+
+Genera reclamos sintéticos a partir de un conjunto de plantillas y les aplica
+ruido típico de los CSV (mayúsculas, tildes, espacios, puntuación y a veces una
+palabra extra), luego mide el tiempo del pre-pase y cuántas llamadas ahorra.
+"""
+import argparse
+import random
+import time
+
+from services.near_duplicates import plan_near_duplicates
+
+_TEMPLATES = [
+    "no me dieron un buen trato en la tienda",
+    "no me dejaron comer en la oficina",
+    "me gustó la atención del personal",
+    "el pedido llegó tarde y la caja estaba rota",
+    "el aceite vino con la tapa abierta",
+    "cobraron dos veces el mismo pedido",
+    "la entrega nunca llegó a mi dirección",
+    "el producto está vencido",
+]
+_EXTRA = ["hoy", "otra vez", "por favor", "urgente", "gracias"]
+
+
+def _noisy(rng: random.Random, base: str) -> str:
+    t = base
+    r = rng.random()
+    if r < 0.2:
+        t = t.upper()
+    elif r < 0.4:
+        t = t.replace("ó", "o").replace("é", "e")
+    if rng.random() < 0.3:
+        t = "  " + t.replace(" ", "  ", 1) + " "
+    if rng.random() < 0.3:
+        t += rng.choice([".", "!!", "..."])
+    if rng.random() < 0.2:
+        t += " " + rng.choice(_EXTRA)
+    return t
+
+
+def _synthetic(n: int, unique_frac: float, seed: int = 7) -> list[str]:
+    rng = random.Random(seed)
+    # cada plantilla se "especializa" con un número de pedido -> muchas familias distintas
+    families = [f"{rng.choice(_TEMPLATES)} pedido {k}" for k in range(max(1, int(n * unique_frac)))]
+    return [_noisy(rng, rng.choice(families)) for _ in range(n)]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--n", type=int, nargs="+", default=[10_000, 100_000])
+    ap.add_argument("--threshold", type=float, nargs="+", default=[1.0, 0.9, 0.8])
+    ap.add_argument("--unique-frac", type=float, default=0.1, help="Familias distintas / filas.")
+    args = ap.parse_args()
+
+    print(f"{'filas':>9} {'umbral':>7} {'exactos':>9} {'llamadas':>9} {'ahorradas':>10} {'segundos':>9} {'filas/s':>10}")
+    for n in args.n:
+        texts = _synthetic(n, args.unique_frac)
+        for thr in args.threshold:
+            t0 = time.perf_counter()
+            plan = plan_near_duplicates(texts, threshold=thr)
+            dt = time.perf_counter() - t0
+            print(f"{n:>9} {thr:>7.2f} {plan.exact_groups:>9} {len(plan.representatives):>9} "
+                  f"{plan.saved:>10} {dt:>9.2f} {n / dt:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
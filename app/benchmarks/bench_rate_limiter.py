@@ -0,0 +1,91 @@
+# benchmarks/bench_rate_limiter.py
+"""
+Benchmark del limitador adaptativo contra un servidor falso con cuota (sin red).
+
+Uso (desde app/):
+    python -m benchmarks.bench_rate_limiter --calls 2000 --quota-rpm 300 --workers 32 --latency-ms 150
+
+El servidor falso admite `--quota-rpm` peticiones por ventana deslizante de 60 s
+(escalable con --time-scale para que corra en segundos) y responde 429 con una pista
+"retry in Ns" al excederla. Se compara un pool fijo sin limitador (un 429 = fila
+perdida, como antes) contra el mismo pool pasando por AdaptiveLimiter.
+"""
+import argparse
+import collections
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services.rate_limiter import AdaptiveLimiter, Throttled
+
+
+class QuotaExceeded(Exception):
+    pass
+
+
+class FakeQuotaServer:
+    def __init__(self, rpm: int, window_s: float, latency_ms: float):
+        self.rpm, self.window_s, self.latency_s = rpm, window_s, latency_ms / 1000
+        self.stamps = collections.deque()
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def call(self) -> str:
+        with self._lock:
+            now = time.monotonic()
+            while self.stamps and now - self.stamps[0] > self.window_s:
+                self.stamps.popleft()
+            if len(self.stamps) >= self.rpm:
+                self.rejected += 1
+                wait = self.window_s - (now - self.stamps[0])
+                raise QuotaExceeded(f"429 Resource has been exhausted. Please retry in {wait:.2f}s.")
+            self.stamps.append(now)
+        time.sleep(self.latency_s)
+        return "ok"
+
+
+def _run(args, use_limiter: bool) -> None:
+    server = FakeQuotaServer(args.quota_rpm, 60 / args.time_scale, args.latency_ms)
+    # el cliente conoce la cuota, escalada igual que el servidor
+    limiter = AdaptiveLimiter(args.quota_rpm * args.safety, 0, window_s=60 / args.time_scale,
+                              max_in_flight=args.workers, backoff_s=0.05, max_backoff_s=2.0)
+
+    def one(_):
+        if not use_limiter:
+            try:
+                return server.call()
+            except QuotaExceeded:
+                return None
+        try:
+            return limiter.call(server.call, is_throttle=lambda e: isinstance(e, QuotaExceeded))
+        except Throttled:
+            return None
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        out = list(pool.map(one, range(args.calls)))
+    dt = time.perf_counter() - t0
+    ok = sum(o is not None for o in out)
+    s = limiter.stats()
+    name = "limitador" if use_limiter else "sin limitador"
+    print(f"{name:>14} {ok:>6} {args.calls - ok:>8} {server.rejected:>6} {dt:>9.2f} {ok / dt:>8.1f} "
+          f"{(s.limit if use_limiter else args.workers):>8.1f}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--calls", type=int, default=2000)
+    ap.add_argument("--quota-rpm", type=int, default=300, help="Cuota del servidor por ventana.")
+    ap.add_argument("--time-scale", type=float, default=20.0, help="Acelera el minuto de la cuota (60/escala s).")
+    ap.add_argument("--safety", type=float, default=1.0, help="Fracción de la cuota configurada en el cliente.")
+    ap.add_argument("--workers", type=int, default=32)
+    ap.add_argument("--latency-ms", type=float, default=150.0)
+    args = ap.parse_args()
+
+    print(f"{'modo':>14} {'ok':>6} {'perdidas':>8} {'429s':>6} {'segundos':>9} {'ok/s':>8} {'conc.':>8}")
+    _run(args, use_limiter=False)
+    _run(args, use_limiter=True)
+
+
+if __name__ == "__main__":
+    main()
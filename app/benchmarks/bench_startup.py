@@ -0,0 +1,106 @@
+# benchmarks/bench_startup.py
+"""
+Costo de arranque en frío: tiempo de importación de cada pestaña/servicio medido con
+`python -X importtime` en un proceso nuevo, y opcionalmente la primera pintura de
+main.py con streamlit.testing (AppTest). Sirve de presupuesto de regresión: con
+--budget el script termina con código 1 si algún objetivo se pasa.
+
+Uso (desde app/):
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --repeat 5 --budget tabs.tab_banner=600 first_paint=2500
+    python -m benchmarks.bench_startup --first-paint --top 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+TARGETS = [
+    "streamlit",
+    "tabs.tab_banner",
+    "tabs.tab_product",
+    "tabs.tab_feedback",
+    "services.gemini_classifier",
+]
+# Librerías que NO deberían cargarse al abrir solo el banner (primera pestaña)
+HEAVY = ("pandas", "altair", "PIL", "google.generativeai", "supabase", "duckdb")
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _importtime(module: str) -> tuple[float, dict[str, float], set[str]]:
+    """(ms totales, {import directo: ms acumulados}, todos los módulos) importando `module` en frío."""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=_APP_DIR, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "falló")
+    total_us, top, loaded = 0, {}, set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, raw = line[len("import time:"):].split("|")
+        name = raw.strip()
+        depth = (len(raw) - len(raw.lstrip()) - 1) // 2  # importtime indenta 2 espacios por nivel
+        total_us += int(self_us)
+        loaded.add(name)
+        if depth == 1:  # importado directamente por el objetivo
+            top[name] = int(cumulative_us) / 1000
+    return total_us / 1000, top, loaded
+
+def _first_paint() -> float:
+    """ms de la primera ejecución completa de main.py (con la pestaña por defecto)."""
+    code = ("import time; t0 = time.perf_counter()\n"
+            "from streamlit.testing.v1 import AppTest\n"
+            "AppTest.from_file('main.py', default_timeout=120).run()\n"
+            "print((time.perf_counter() - t0) * 1000)")
+    proc = subprocess.run([sys.executable, "-c", code], cwd=_APP_DIR, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "falló")
+    return float(proc.stdout.strip().splitlines()[-1])
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--targets", nargs="+", default=TARGETS)
+    ap.add_argument("--repeat", type=int, default=3, help="Procesos en frío por objetivo (se reporta la mediana).")
+    ap.add_argument("--top", type=int, default=5, help="Paquetes más caros a mostrar por objetivo.")
+    ap.add_argument("--first-paint", action="store_true", help="Mide también main.py con AppTest.")
+    ap.add_argument("--budget", nargs="*", default=[], metavar="OBJETIVO=MS",
+                    help="Presupuestos en ms (p. ej. tabs.tab_banner=600 first_paint=2500).")
+    args = ap.parse_args()
+    budgets = {k: float(v) for k, v in (b.split("=", 1) for b in args.budget)}
+
+    results = {}
+    print(f"{'objetivo':<30} {'ms (mediana)':>12}  paquetes más caros")
+    for target in args.targets:
+        try:
+            runs = [_importtime(target) for _ in range(max(1, args.repeat))]
+        except RuntimeError as e:
+            print(f"{target:<30} {'—':>12}  no se pudo importar: {e}")
+            continue
+        ms = statistics.median(r[0] for r in runs)
+        results[target] = ms
+        top = sorted(runs[-1][1].items(), key=lambda kv: -kv[1])[:args.top]
+        heavy = [h for h in HEAVY if h in runs[-1][2]]
+        print(f"{target:<30} {ms:>12.0f}  " + ", ".join(f"{n} {t:.0f}" for n, t in top))
+        if target == "tabs.tab_banner" and heavy:
+            print(f"{'':<30} {'':>12}  ⚠ carga {', '.join(heavy)} sin necesitarlos")
+
+    if args.first_paint:
+        try:
+            t = statistics.median(_first_paint() for _ in range(max(1, args.repeat)))
+            results["first_paint"] = t
+            print(f"{'first_paint (main.py)':<30} {t:>12.0f}")
+        except RuntimeError as e:
+            print(f"{'first_paint (main.py)':<30} {'—':>12}  {e}")
+
+    over = [f"{k}: {results[k]:.0f} ms > {v:.0f} ms" for k, v in budgets.items() if results.get(k, 0) > v]
+    if over:
+        print("Presupuesto excedido:\n  " + "\n  ".join(over))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    t0 = time.perf_counter()
+    main()
+    print(f"({time.perf_counter() - t0:.1f}s)")
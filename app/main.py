@@ -6,27 +6,19 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
-import json, requests, pandas as pd
-import streamlit as st
-from datetime import date
-
-# Importar tus pestañas
-from tabs.tab_banner import render as render_banner_tab
-from tabs.tab_product import render as render_product_tab
-from tabs.tab_feedback import render as render_feedback_tab
-
-# Importar tus servicios
-from services.n8n_client import create_banner_with_two_images
-from services.productvision_client import describe_product
-from services.supabase_client import supabase
-from services.gemini_classifier import classify_text
-
-# app/main.py (al inicio del archivo)
-from io import BytesIO
-import requests
-from PIL import Image
+import importlib
 import streamlit as st
 
+# Las pestañas (y con ellas pandas, Supabase, Gemini...) se importan recién al abrirse:
+# la primera pintura solo paga Streamlit y la pestaña visible.
+TABS = {
+    "A) Creación de imágenes promocionales": "tabs.tab_banner",
+    "B) Generación automática de descripciones": "tabs.tab_product",
+    "C) Resumen de comentarios o feedback": "tabs.tab_feedback",
+}
+# false = st.tabs clásico (renderiza las tres pestañas en cada ejecución)
+LAZY_TABS = os.getenv("APP_LAZY_TABS", "true").strip().lower() not in ("0", "false", "no")
+
 # Logo oficial que pasaste
 LOGO_URL = "https://logolook.net/wp-content/uploads/2021/01/Alicorp-Emblem.png"
 
@@ -147,6 +139,30 @@ st.markdown(f"""
             box-shadow: 0 4px 12px rgba(0,0,0,0.08); /* Sombra para el contenido de la pestaña */
         }}
         
+        /* Navegación perezosa (st.radio horizontal) con el mismo look de las pestañas */
+        div[data-testid="stRadio"] > div[role="radiogroup"] {{
+            gap: 5px;
+        }}
+        div[data-testid="stRadio"] > div[role="radiogroup"] > label {{
+            background-color: var(--alicorp-grey);
+            color: var(--text-dark);
+            border-radius: 8px 8px 0 0;
+            padding: 10px 15px;
+            margin: 0;
+            font-weight: bold;
+            transition: all 0.2s ease-in-out;
+        }}
+        div[data-testid="stRadio"] > div[role="radiogroup"] > label:hover {{
+            background-color: #d1d4d2;
+        }}
+        div[data-testid="stRadio"] > div[role="radiogroup"] > label:has(input:checked) {{
+            background-color: var(--alicorp-red);
+            color: var(--text-light);
+        }}
+        div[data-testid="stRadio"] > div[role="radiogroup"] > label > div:first-child {{
+            display: none; /* oculta el círculo del radio */
+        }}
+
         /* Asegura que el contenedor principal del contenido no tenga un padding excesivo en la parte superior */
         .block-container {{
             padding-top: 1rem;
@@ -191,16 +207,15 @@ st.markdown(f"""
 st.markdown("<div class='alicorp-hr'></div>", unsafe_allow_html=True)
 
 
-tabA, tabB, tabC = st.tabs(["A) Creación de imágenes promocionales", "B) Generación automática de descripciones", "C) Resumen de comentarios o feedback"])
-
-# ---------- TAB A ----------
-with tabA:
-    render_banner_tab() 
-
-# ---------- TAB B ----------
-with tabB:
-    render_product_tab()
+def _render_tab(label: str) -> None:
+    importlib.import_module(TABS[label]).render()  # importado una vez por proceso y luego cacheado
 
-# ---------- TAB C ----------
-with tabC:
-    render_feedback_tab()
\ No newline at end of file
+if LAZY_TABS:
+    # Navegación con el mismo aspecto de pestañas, pero solo se ejecuta la elegida
+    current = st.radio("Sección", list(TABS), horizontal=True, key="main_tab", label_visibility="collapsed")
+    with st.container(border=True):
+        _render_tab(current)
+else:
+    for label, tab in zip(TABS, st.tabs(list(TABS))):
+        with tab:
+            _render_tab(label)
@@ -0,0 +1,332 @@
+# services/banner_batch.py
+"""
+Generación de banners en lote: una imagen base × muchas imágenes de producto (carpeta o
+.zip), con prompt por producto opcional desde un CSV. Cada par va al webhook de n8n con
+concurrencia acotada y adaptativa (AdaptiveLimiter: baja ante 429/503 y respeta
+Retry-After), en un hilo aparte, así la pestaña solo lee el avance y pinta la galería.
+
+Al terminar se puede exportar un .zip con los banners + manifest.csv, o solo el manifiesto.
+"""
+import csv
+import io
+import json
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Iterable, Optional
+
+BANNER_BATCH_CONCURRENCY = int(os.getenv("BANNER_BATCH_CONCURRENCY", "4"))
+BANNER_BATCH_MAX_ITEMS = int(os.getenv("BANNER_BATCH_MAX_ITEMS", "200"))
+BANNER_BATCH_MAX_IMAGE_MB = float(os.getenv("BANNER_BATCH_MAX_IMAGE_MB", "20"))  # por imagen de producto
+BANNER_BATCH_RETRIES = int(os.getenv("BANNER_BATCH_RETRIES", "3"))   # reintentos ante 429/503 de n8n
+# Única carpeta del servidor (y sus subcarpetas) que la UI puede leer; vacío = no se ofrece
+BANNER_BATCH_DIR_ROOT = os.getenv("BANNER_BATCH_DIR_ROOT", "").strip()
+
+PENDING, RUNNING, DONE, FAILED, CANCELLED = "pending", "running", "done", "failed", "cancelled"
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".webp")
+# solo rechazos explícitos: el POST no es idempotente y tras un 502/504 n8n pudo haber generado el banner
+_RETRY_CODES = (429, 503)
+_NAME_COLS = ("archivo", "file", "filename", "imagen", "producto", "product")
+_PROMPT_COLS = ("prompt", "descripcion", "descripción")
+
+class BatchError(Exception):
+    pass
+
+@dataclass
+class BatchItem:
+    name: str
+    prompt: str
+    status: str = PENDING
+    url: Optional[str] = None
+    error: Optional[str] = None
+    latency_s: Optional[float] = None  # desde que salió hacia n8n hasta la respuesta (con reintentos)
+    attempts: int = 0
+    cached: bool = False               # resultado reutilizado de banner_cache (no llamó a n8n)
+
+def _is_image(name: str) -> bool:
+    base = os.path.basename(name)
+    return name.lower().endswith(IMAGE_EXTS) and not base.startswith(".") and "__MACOSX" not in name
+
+def _inside(path: str, root: str) -> bool:
+    return os.path.commonpath([root, path]) == root
+
+def server_folder(path: str, root: str = BANNER_BATCH_DIR_ROOT) -> str:
+    """
+    Ruta real de una carpeta de productos dentro de `root` (BANNER_BATCH_DIR_ROOT). BatchError
+    si no hay raíz configurada o si la ruta (relativa a la raíz) sale de ella, symlinks incluidos.
+    """
+    if not root:
+        raise BatchError("Leer carpetas del servidor está desactivado (BANNER_BATCH_DIR_ROOT).")
+    root = os.path.realpath(root)
+    real = os.path.realpath(os.path.join(root, path))
+    if not _inside(real, root):
+        raise BatchError(f"La carpeta debe estar dentro de {root}.")
+    if not os.path.isdir(real):
+        raise BatchError(f"No existe la carpeta: {path}")
+    return real
+
+def _too_many(n: int) -> BatchError:
+    return BatchError(f"{n} productos: el máximo por lote es {BANNER_BATCH_MAX_ITEMS} (BANNER_BATCH_MAX_ITEMS).")
+
+def _check_size(name: str, size: int) -> None:
+    if size > BANNER_BATCH_MAX_IMAGE_MB * 1024 * 1024:
+        raise BatchError(f"{name}: {size / 1024 / 1024:,.1f} MB, el máximo por imagen es "
+                         f"{BANNER_BATCH_MAX_IMAGE_MB:g} MB (BANNER_BATCH_MAX_IMAGE_MB).")
+
+def load_products(sources: Iterable) -> list[tuple[str, bytes]]:
+    """
+    Imágenes de producto a partir de archivos sueltos, .zip (archivos subidos o rutas) y/o
+    carpetas locales. Devuelve [(nombre, bytes)] ordenado por nombre, sin repetidos. Dos
+    imágenes distintas con el mismo nombre (p. ej. en carpetas distintas del .zip) son un
+    BatchError: el nombre identifica al producto en la galería y en el CSV de prompts.
+    """
+    out: dict[str, bytes] = {}
+    origin: dict[str, str] = {}
+
+    def add(path: str, data: bytes) -> None:
+        name = os.path.basename(path)
+        if name not in out:
+            out[name], origin[name] = data, path
+        elif out[name] != data:
+            raise BatchError(f"Hay dos imágenes distintas llamadas '{name}' ({origin[name]} y {path}); "
+                             "renombrar una.")
+
+    def add_zip(data) -> None:
+        with zipfile.ZipFile(data) as zf:
+            # cantidad y tamaños desde el índice, antes de descomprimir nada (zip bomb);
+            # zipfile no lee más allá del file_size declarado
+            entries = [i for i in zf.infolist() if not i.is_dir() and _is_image(i.filename)]
+            if len(out) + len(entries) > BANNER_BATCH_MAX_ITEMS:
+                raise _too_many(len(out) + len(entries))
+            for info in entries:
+                _check_size(info.filename, info.file_size)
+            for info in entries:
+                add(info.filename, zf.read(info))
+
+    for src in sources:
+        if isinstance(src, (str, os.PathLike)):
+            path = os.fspath(src)
+            if os.path.isdir(path):
+                real = os.path.realpath(path)
+                for fn in sorted(os.listdir(path)):
+                    fp = os.path.join(path, fn)
+                    # un symlink dentro de la carpeta no puede sacar archivos de ella
+                    if _is_image(fn) and os.path.isfile(fp) and _inside(os.path.realpath(fp), real):
+                        _check_size(fp, os.path.getsize(fp))
+                        with open(fp, "rb") as f:
+                            add(fp, f.read())
+            elif path.lower().endswith(".zip"):
+                add_zip(path)
+            elif _is_image(path):
+                _check_size(path, os.path.getsize(path))
+                with open(path, "rb") as f:
+                    add(path, f.read())
+            else:
+                raise BatchError(f"No es una carpeta, .zip ni imagen: {path}")
+        else:  # archivo subido (st.file_uploader)
+            name = getattr(src, "name", "archivo")
+            if name.lower().endswith(".zip"):
+                add_zip(io.BytesIO(src.getvalue()))
+            elif _is_image(name):
+                add(name, src.getvalue())
+        if len(out) > BANNER_BATCH_MAX_ITEMS:
+            raise _too_many(len(out))
+    return sorted(out.items())
+
+def load_prompts(data: bytes) -> dict[str, str]:
+    """
+    CSV de prompts por producto: una columna con el nombre del archivo (archivo/file/
+    filename/imagen/producto) y otra 'prompt'. Devuelve {nombre en minúsculas: prompt};
+    el nombre se puede dar con o sin extensión.
+    """
+    text = data.decode("utf-8-sig", errors="replace")
+    try:
+        dialect = csv.Sniffer().sniff(text[:2048], delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.DictReader(io.StringIO(text), dialect=dialect)
+    cols = {c.strip().lower(): c for c in (reader.fieldnames or [])}
+    name_col = next((cols[c] for c in _NAME_COLS if c in cols), None)
+    prompt_col = next((cols[c] for c in _PROMPT_COLS if c in cols), None)
+    if not name_col or not prompt_col:
+        raise BatchError("El CSV de prompts necesita una columna 'archivo' (o file/producto) y otra 'prompt'.")
+    return {str(r[name_col]).strip().lower(): str(r[prompt_col] or "").strip()
+            for r in reader if r.get(name_col)}
+
+def prompt_for(name: str, prompts: dict[str, str], default: str) -> str:
+    key = name.lower()
+    return prompts.get(key) or prompts.get(os.path.splitext(key)[0]) or default
+
+def _percentile(values: list[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+class BannerBatch:
+    """Un lote en curso. start() no bloquea; snapshot()/report() se pueden leer en cualquier momento."""
+
+    def __init__(self, base_image: bytes, products: list[tuple[str, bytes]], *,
+                 prompts: Optional[dict[str, str]] = None, default_prompt: str = "default",
+                 concurrency: int = BANNER_BATCH_CONCURRENCY, prepare: bool = True, transport: Optional[str] = None,
+                 force: bool = False):
+        if not base_image:
+            raise BatchError("Falta la imagen base.")
+        if not products:
+            raise BatchError("No se encontraron imágenes de producto (png/jpg/webp).")
+        self.base_image = base_image
+        self.products = dict(products)
+        self.items = [BatchItem(name, prompt_for(name, prompts or {}, default_prompt)) for name, _ in products]
+        self.concurrency = max(1, concurrency)
+        self.prepare = prepare
+        self.transport = transport
+        self.force = force  # ignora la caché de banners y regenera todo
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    # ----- ejecución -----
+    def start(self, names: Optional[set[str]] = None) -> None:
+        """Lanza (o relanza, p. ej. solo los fallidos) el lote en segundo plano."""
+        if self.running:
+            return
+        with self._lock:
+            for item in self.items:
+                if names is None or item.name in names:
+                    item.status, item.url, item.error, item.latency_s, item.attempts = PENDING, None, None, None, 0
+                    item.cached = False
+        self._cancel.clear()
+        self.started_at, self.finished_at = time.time(), None
+        self._thread = threading.Thread(target=self._run, name="banner-batch", daemon=True)
+        self._thread.start()
+
+    def cancel(self) -> None:
+        """Los ítems que ya salieron hacia n8n terminan; el resto no se envía."""
+        self._cancel.set()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self) -> None:
+        from services.banner_cache import get_cache
+        from services.image_prep import prepare_image
+        from services.n8n_client import N8NClientError, create_banner_with_two_images
+        from services.rate_limiter import AdaptiveLimiter
+
+        # sin cupo por minuto: solo concurrencia adaptativa + reintentos que respetan Retry-After
+        limiter = AdaptiveLimiter(0, 0, max_in_flight=self.concurrency, max_retries=BANNER_BATCH_RETRIES,
+                                  backoff_s=1.0, max_backoff_s=30.0)
+        base = prepare_image(self.base_image, "banner").data if self.prepare else self.base_image
+        cache = get_cache()
+
+        def one(item: BatchItem) -> None:
+            if self._cancel.is_set():
+                with self._lock:
+                    item.status = CANCELLED
+                return
+            product = self.products[item.name]
+            if self.prepare:
+                product = prepare_image(product, "banner").data
+
+            t0 = None
+
+            def call() -> str:
+                nonlocal t0
+                with self._lock:
+                    item.status, item.attempts = RUNNING, item.attempts + 1
+                t0 = t0 or time.perf_counter()
+                return create_banner_with_two_images(image1_bytes=base, image2_bytes=product,
+                                                     prompt=item.prompt, transport=self.transport)
+
+            def generate() -> str:
+                return limiter.call(call, is_throttle=lambda e: isinstance(e, N8NClientError)
+                                    and e.status_code in _RETRY_CODES)
+
+            try:
+                if cache is None:
+                    url, hit = generate(), None
+                else:  # mismo producto+prompt ya generado (o repetido en el lote): no vuelve a n8n
+                    url, hit = cache.get_or_generate(base, product, item.prompt, generate, force=self.force)
+                with self._lock:
+                    item.status, item.url, item.cached = DONE, url, hit is not None
+            except Exception as e:  # Throttled (reintentos agotados) o error de n8n/red
+                with self._lock:
+                    item.status, item.error = FAILED, str(e)
+            finally:
+                if t0 is not None:
+                    item.latency_s = time.perf_counter() - t0
+
+        pending = [i for i in self.items if i.status == PENDING]
+        # el pool puede tener más hilos que la concurrencia: el limitador decide cuántos salen
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            list(pool.map(one, pending))
+        self.finished_at = time.time()
+
+    # ----- lectura -----
+    def snapshot(self) -> list[BatchItem]:
+        with self._lock:
+            return [BatchItem(**asdict(i)) for i in self.items]
+
+    def report(self) -> dict:
+        items = self.snapshot()
+        done = [i for i in items if i.status == DONE]
+        lat = [i.latency_s for i in done if i.latency_s is not None and not i.cached]  # solo generados
+        end = self.finished_at or time.time()
+        wall = max(1e-9, end - self.started_at) if self.started_at else 0.0
+        return {
+            "items": len(items), "done": len(done), "cached": sum(i.cached for i in done),
+            "failed": sum(i.status == FAILED for i in items),
+            "cancelled": sum(i.status == CANCELLED for i in items),
+            "pending": sum(i.status in (PENDING, RUNNING) for i in items),
+            "wall_s": wall, "per_min": 60 * len(done) / wall if wall else 0.0,
+            "latency_p50_s": _percentile(lat, 0.5), "latency_p90_s": _percentile(lat, 0.9),
+            "latency_max_s": max(lat) if lat else None,
+            "concurrency": self.concurrency,
+        }
+
+    # ----- exportación -----
+    def manifest_csv(self) -> bytes:
+        out = io.StringIO()
+        w = csv.writer(out)
+        w.writerow(["archivo", "prompt", "estado", "banner_url", "latencia_s", "intentos", "cache", "error"])
+        for i in self.snapshot():
+            w.writerow([i.name, i.prompt, i.status, i.url or "",
+                        f"{i.latency_s:.2f}" if i.latency_s is not None else "", i.attempts,
+                        "sí" if i.cached else "", i.error or ""])
+        return out.getvalue().encode("utf-8-sig")  # BOM: Excel abre bien los acentos
+
+    def manifest_json(self) -> bytes:
+        return json.dumps({"report": self.report(), "items": [asdict(i) for i in self.snapshot()]},
+                          ensure_ascii=False, indent=2).encode("utf-8")
+
+    def export_zip(self, timeout: int = 60) -> bytes:
+        """ZIP con los banners descargados (banners/<producto>.<ext>) + manifest.csv/json."""
+        import requests
+
+        done = [i for i in self.snapshot() if i.status == DONE and i.url]
+
+        def fetch(item: BatchItem):
+            try:
+                r = requests.get(item.url, timeout=timeout)
+                r.raise_for_status()
+                return item, r.content, (r.headers.get("content-type") or "")
+            except requests.RequestException:
+                return item, None, ""
+
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zf:  # las imágenes ya vienen comprimidas
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                for item, content, ctype in pool.map(fetch, done):
+                    if content is None:
+                        continue
+                    ext = ".png" if "png" in ctype else ".webp" if "webp" in ctype else ".jpg"
+                    zf.writestr(f"banners/{os.path.splitext(item.name)[0]}{ext}", content)
+            zf.writestr("manifest.csv", self.manifest_csv())
+            zf.writestr("manifest.json", self.manifest_json())
+        return buf.getvalue()
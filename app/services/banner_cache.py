@@ -0,0 +1,226 @@
+# services/banner_cache.py
+"""
+Caché de banners generados, direccionada por contenido: llave = sha256 de las dos imágenes
+(los bytes que realmente se envían) + el prompt normalizado + el webhook. Un "Generar"
+repetido con lo mismo devuelve la URL guardada al instante, para cualquier sesión o
+usuario del mismo servidor, sin volver a correr el flujo de n8n.
+
+Guarda la URL y, con BANNER_CACHE_STORE_BYTES=true, también la imagen en disco
+(BANNER_CACHE_DIR), útil si las URLs del bucket caducan. Desalojo por TTL y LRU
+(filas y MB en disco). Dos pedidos idénticos simultáneos en el mismo proceso esperan a
+una sola generación.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+BANNER_CACHE_ENABLED = os.getenv("BANNER_CACHE_ENABLED", "true").strip().lower() not in ("0", "false", "no")
+BANNER_CACHE_PATH = os.getenv("BANNER_CACHE_PATH", ".cache/banner_cache.sqlite3")
+BANNER_CACHE_DIR = os.getenv("BANNER_CACHE_DIR", ".cache/banner_cache")
+BANNER_CACHE_TTL_HOURS = float(os.getenv("BANNER_CACHE_TTL_HOURS", "168"))
+BANNER_CACHE_MAX_ROWS = int(os.getenv("BANNER_CACHE_MAX_ROWS", "5000"))
+BANNER_CACHE_MAX_MB = float(os.getenv("BANNER_CACHE_MAX_MB", "500"))     # imágenes guardadas en disco
+BANNER_CACHE_STORE_BYTES = os.getenv("BANNER_CACHE_STORE_BYTES", "false").strip().lower() in ("1", "true", "yes")
+
+def normalize_prompt(prompt: str) -> str:
+    """NFC y espacios colapsados. Sin pasar a minúsculas: el texto del prompt puede terminar en el banner."""
+    return " ".join(unicodedata.normalize("NFC", str(prompt or "")).split())
+
+@dataclass
+class CachedBanner:
+    url: str
+    content: Optional[bytes]   # None si no se guardaron los bytes (o el archivo ya no está)
+    created_at: float
+    hits: int
+
+    @property
+    def age_s(self) -> float:
+        return time.time() - self.created_at
+
+class BannerCache:
+    def __init__(self, namespace: str = "", path: str = BANNER_CACHE_PATH, files_dir: str = BANNER_CACHE_DIR,
+                 ttl_hours: float = BANNER_CACHE_TTL_HOURS, max_rows: int = BANNER_CACHE_MAX_ROWS,
+                 max_mb: float = BANNER_CACHE_MAX_MB, store_bytes: bool = BANNER_CACHE_STORE_BYTES):
+        self.namespace = namespace
+        self.path, self.files_dir = path, files_dir
+        self.ttl_s = ttl_hours * 3600
+        self.max_rows, self.max_bytes = max_rows, int(max_mb * 1024 * 1024)
+        self.store_bytes = store_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._inflight: dict[str, list] = {}   # llave -> [lock, esperando]: single-flight por llave
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS banners (
+                key        TEXT PRIMARY KEY,
+                url        TEXT NOT NULL,
+                file       TEXT,
+                bytes      INTEGER NOT NULL DEFAULT 0,
+                hits       INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                last_used  REAL NOT NULL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_banners_last_used ON banners(last_used)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_banners_url ON banners(url)")
+        self._conn.commit()
+        self.evict()
+
+    def key(self, image1_bytes: bytes, image2_bytes: bytes, prompt: str) -> str:
+        h = hashlib.sha256(self.namespace.encode("utf-8"))
+        for part in (hashlib.sha256(image1_bytes or b"").digest(), hashlib.sha256(image2_bytes or b"").digest(),
+                     normalize_prompt(prompt).encode("utf-8")):
+            h.update(b"\x00" + part)
+        return h.hexdigest()
+
+    def _read_file(self, name: Optional[str]) -> Optional[bytes]:
+        if not name:
+            return None
+        try:
+            with open(os.path.join(self.files_dir, name), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def get(self, key: str, *, count: bool = True) -> Optional[CachedBanner]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, file, created_at, hits FROM banners WHERE key = ? AND created_at >= ?",
+                (key, now - self.ttl_s)).fetchone()
+            if row is None:
+                self.misses += count
+                return None
+            self._conn.execute("UPDATE banners SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += count
+        url, name, created_at, hits = row
+        return CachedBanner(url, self._read_file(name), created_at, hits + 1)
+
+    def content_for_url(self, url: str) -> Optional[bytes]:
+        """Bytes guardados de un banner por su URL (p. ej. para el botón de descarga), si los hay."""
+        with self._lock:
+            row = self._conn.execute("SELECT file FROM banners WHERE url = ? AND file IS NOT NULL LIMIT 1",
+                                     (url,)).fetchone()
+        return self._read_file(row[0]) if row else None
+
+    def put(self, key: str, url: str, content: Optional[bytes] = None) -> None:
+        """Guarda la URL; los bytes, si se pasan o si store_bytes (se descargan de `url`)."""
+        if content is None and self.store_bytes:
+            content = _download(url)
+        name = None
+        if content:
+            os.makedirs(self.files_dir, exist_ok=True)
+            name = f"{key}.img"
+            tmp = os.path.join(self.files_dir, f".{name}.{threading.get_ident()}.tmp")
+            with open(tmp, "wb") as f:
+                f.write(content)
+            os.replace(tmp, os.path.join(self.files_dir, name))  # nunca un archivo a medio escribir
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT file FROM banners WHERE key = ?", (key,)).fetchone()
+            self._conn.execute("INSERT OR REPLACE INTO banners (key, url, file, bytes, created_at, last_used) "
+                               "VALUES (?, ?, ?, ?, ?, ?)", (key, url, name, len(content or b""), now, now))
+            self._conn.commit()
+        if old and old[0] and old[0] != name:  # regenerado sin bytes: el archivo anterior ya no corresponde
+            try:
+                os.remove(os.path.join(self.files_dir, old[0]))
+            except OSError:
+                pass
+        self.evict()
+
+    def get_or_generate(self, image1_bytes: bytes, image2_bytes: bytes, prompt: str,
+                        generate: Callable[[], str], *, force: bool = False) -> tuple[str, Optional[CachedBanner]]:
+        """
+        (url, entrada cacheada o None si se generó ahora). Con force=True siempre llama a
+        generate() y reemplaza la entrada. Pedidos idénticos concurrentes esperan al primero.
+        """
+        key = self.key(image1_bytes, image2_bytes, prompt)
+        if not force:
+            hit = self.get(key)
+            if hit:
+                return hit.url, hit
+        with self._lock:
+            slot = self._inflight.setdefault(key, [threading.Lock(), 0])
+            slot[1] += 1
+        try:
+            with slot[0]:
+                if not force:
+                    hit = self.get(key, count=False)  # otro hilo pudo haberlo generado mientras esperábamos
+                    if hit:
+                        return hit.url, hit
+                url = generate()
+                self.put(key, url)
+                return url, None
+        finally:
+            with self._lock:
+                slot[1] -= 1
+                if not slot[1]:
+                    self._inflight.pop(key, None)
+
+    def evict(self) -> None:
+        """Borra vencidas por TTL, luego las menos usadas si se pasan max_rows o max_mb de archivos."""
+        doomed: list[str] = []
+        with self._lock:
+            cutoff = time.time() - self.ttl_s
+            doomed += [r[0] for r in self._conn.execute(
+                "SELECT file FROM banners WHERE created_at < ? AND file IS NOT NULL", (cutoff,))]
+            self._conn.execute("DELETE FROM banners WHERE created_at < ?", (cutoff,))
+            rows, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM banners").fetchone()
+            if rows > self.max_rows or total > self.max_bytes:
+                drop, freed = [], 0
+                for key, file, size in self._conn.execute(
+                        "SELECT key, file, bytes FROM banners ORDER BY last_used ASC").fetchall():
+                    if rows - len(drop) <= self.max_rows and total - freed <= self.max_bytes:
+                        break
+                    drop.append(key)
+                    freed += size
+                    if file:
+                        doomed.append(file)
+                self._conn.executemany("DELETE FROM banners WHERE key = ?", [(k,) for k in drop])
+            self._conn.commit()
+        for name in doomed:
+            try:
+                os.remove(os.path.join(self.files_dir, name))
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM banners").fetchone()
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "rows": rows, "mb": total / 1024 / 1024,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0, "path": self.path}
+
+def _download(url: str, timeout: int = 30) -> Optional[bytes]:
+    import requests
+
+    try:
+        r = requests.get(url, timeout=timeout)
+        r.raise_for_status()
+        return r.content
+    except requests.RequestException:
+        return None  # se guarda solo la URL
+
+_cache: Optional[BannerCache] = None
+_cache_lock = threading.Lock()
+
+def get_cache() -> Optional[BannerCache]:
+    """Caché compartida por proceso para el webhook actual (None si está desactivada)."""
+    global _cache
+    if not BANNER_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            from services.n8n_client import N8N_WEBHOOK_URL
+            _cache = BannerCache(namespace=N8N_WEBHOOK_URL or "")  # otro flujo = otros resultados
+        return _cache
@@ -0,0 +1,231 @@
+# services/banner_jobs.py
+"""
+Registro persistente (SQLite) de jobs asíncronos de banners en n8n. La pestaña solo
+registra el job_id devuelto por start_banner_job; el panel de estado llama a poll_due en
+cada refresco y solo consulta N8N_STATUS_URL para los jobs a los que les toca, con
+backoff exponencial + jitter (no cada 3 s fijos) y sin bloquear la sesión.
+
+Cada usuario (owner) puede tener varios jobs en curso a la vez, y el registro sobrevive
+a recargas del navegador y a reinicios de Streamlit.
+"""
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+BANNER_JOBS_DB_PATH = os.getenv("BANNER_JOBS_DB_PATH", ".cache/banner_jobs.sqlite3")
+BANNER_ASYNC = os.getenv("BANNER_ASYNC", "false").strip().lower() in ("1", "true", "yes")  # sin intento síncrono
+BANNER_POLL_MIN_S = float(os.getenv("BANNER_POLL_MIN_S", "2"))      # primera consulta y base del backoff
+BANNER_POLL_MAX_S = float(os.getenv("BANNER_POLL_MAX_S", "15"))     # techo entre consultas
+BANNER_JOB_TIMEOUT_S = float(os.getenv("BANNER_JOB_TIMEOUT_S", "600"))
+BANNER_POLL_MAX_ERRORS = int(os.getenv("BANNER_POLL_MAX_ERRORS", "5"))  # errores seguidos antes de rendirse
+
+PENDING, DONE, FAILED, EXPIRED = "pending", "done", "failed", "expired"
+_BACKOFF = 1.6
+_FAILED_STATUSES = ("error", "failed", "failure", "cancelled", "canceled")
+_KEEP_DAYS = 7
+_POLL_WORKERS = 4
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS banner_jobs (
+    id TEXT PRIMARY KEY,               -- job_id de n8n
+    owner TEXT NOT NULL,
+    prompt TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL,
+    remote_status TEXT,                -- último 'status' reportado por n8n (queued, processing…)
+    banner_url TEXT,
+    error TEXT,
+    polls INTEGER NOT NULL DEFAULT 0,
+    errors INTEGER NOT NULL DEFAULT 0, -- errores de consulta seguidos
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    deadline_at REAL NOT NULL,
+    next_poll_at REAL NOT NULL,
+    cache_key TEXT                     -- llave en banner_cache para guardar el resultado
+);
+CREATE INDEX IF NOT EXISTS banner_jobs_owner_idx ON banner_jobs (owner, created_at);
+CREATE INDEX IF NOT EXISTS banner_jobs_due_idx ON banner_jobs (status, next_poll_at);
+"""
+
+@dataclass
+class BannerJob:
+    id: str
+    owner: str
+    prompt: str
+    status: str
+    remote_status: Optional[str]
+    banner_url: Optional[str]
+    error: Optional[str]
+    polls: int
+    errors: int
+    created_at: float
+    updated_at: float
+    deadline_at: float
+    next_poll_at: float
+    cache_key: Optional[str] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status == PENDING
+
+_init_lock = threading.Lock()
+_initialized: set[str] = set()
+
+def _connect(db_path: str = BANNER_JOBS_DB_PATH) -> sqlite3.Connection:
+    if os.path.dirname(db_path):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    con = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    con.row_factory = sqlite3.Row
+    with _init_lock:  # el panel abre una conexión por refresco: el esquema se crea una vez
+        if db_path not in _initialized:
+            con.execute("PRAGMA journal_mode=WAL")  # varias sesiones leen/escriben a la vez
+            con.executescript(_SCHEMA)
+            try:  # registros creados antes de la caché de banners
+                con.execute("ALTER TABLE banner_jobs ADD COLUMN cache_key TEXT")
+            except sqlite3.OperationalError:
+                pass
+            _initialized.add(db_path)
+    return con
+
+def _job(row: sqlite3.Row) -> BannerJob:
+    return BannerJob(**dict(row))
+
+def next_delay(polls: int, hint: Optional[float] = None) -> float:
+    """Espera antes de la próxima consulta: exponencial con jitter ("equal jitter"), o la pista de n8n."""
+    base = min(BANNER_POLL_MAX_S, BANNER_POLL_MIN_S * _BACKOFF ** polls)
+    delay = base / 2 + random.uniform(0, base / 2)  # nunca 0, y las sesiones no consultan al unísono
+    return max(delay, hint) if hint else delay
+
+def track(job_id: str, owner: str, prompt: str = "", *, cache_key: Optional[str] = None,
+          now: Optional[float] = None) -> BannerJob:
+    """
+    Registra un job recién iniciado en n8n; la primera consulta es en ~BANNER_POLL_MIN_S.
+    Con `cache_key`, el banner se guarda en banner_cache cuando el job termina.
+    """
+    now = time.time() if now is None else now
+    with closing(_connect()) as con:
+        con.execute("DELETE FROM banner_jobs WHERE status != ? AND updated_at < ?",
+                    (PENDING, now - _KEEP_DAYS * 86400))
+        con.execute(
+            "INSERT OR REPLACE INTO banner_jobs (id, owner, prompt, status, created_at, updated_at, "
+            "deadline_at, next_poll_at, cache_key) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, owner, prompt or "", PENDING, now, now, now + BANNER_JOB_TIMEOUT_S,
+             now + next_delay(0), cache_key),
+        )
+        return _job(con.execute("SELECT * FROM banner_jobs WHERE id = ?", (job_id,)).fetchone())
+
+def get_job(job_id: str) -> Optional[BannerJob]:
+    with closing(_connect()) as con:
+        row = con.execute("SELECT * FROM banner_jobs WHERE id = ?", (job_id,)).fetchone()
+    return _job(row) if row else None
+
+def list_jobs(owner: str, limit: int = 10) -> list[BannerJob]:
+    """Jobs del usuario, más recientes primero."""
+    with closing(_connect()) as con:
+        rows = con.execute("SELECT * FROM banner_jobs WHERE owner = ? ORDER BY created_at DESC LIMIT ?",
+                           (owner, limit)).fetchall()
+    return [_job(r) for r in rows]
+
+def dismiss(job_id: str, owner: str) -> None:
+    """Quita el job del panel (no cancela nada en n8n)."""
+    with closing(_connect()) as con:
+        con.execute("DELETE FROM banner_jobs WHERE id = ? AND owner = ?", (job_id, owner))
+
+def resume(job_id: str, *, now: Optional[float] = None) -> None:
+    """Seguir esperando un job vencido o con errores de consulta: nuevo plazo y backoff desde cero."""
+    now = time.time() if now is None else now
+    with closing(_connect()) as con:
+        con.execute(
+            "UPDATE banner_jobs SET status = ?, error = NULL, polls = 0, errors = 0, updated_at = ?, "
+            "deadline_at = ?, next_poll_at = ? WHERE id = ? AND status IN (?, ?)",
+            (PENDING, now, now + BANNER_JOB_TIMEOUT_S, now, job_id, EXPIRED, FAILED),
+        )
+
+def _claim_due(con: sqlite3.Connection, owner: Optional[str], now: float) -> list[BannerJob]:
+    """Jobs a consultar ahora. Se les corre next_poll_at en la misma transacción para que
+    otra sesión/pestaña abierta del mismo usuario no los consulte dos veces."""
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        sql, args = "SELECT * FROM banner_jobs WHERE status = ? AND next_poll_at <= ?", [PENDING, now]
+        if owner is not None:
+            sql, args = sql + " AND owner = ?", args + [owner]
+        jobs = [_job(r) for r in con.execute(sql, args).fetchall()]
+        con.executemany("UPDATE banner_jobs SET next_poll_at = ? WHERE id = ?",
+                        [(now + BANNER_POLL_MAX_S, j.id) for j in jobs])
+        con.execute("COMMIT")
+        return jobs
+    except BaseException:
+        con.execute("ROLLBACK")
+        raise
+
+def _outcome(job: BannerJob, fetch: Callable, now: float, max_errors: int = BANNER_POLL_MAX_ERRORS) -> dict:
+    """Nuevos valores de la fila tras consultar el estado de `job` en n8n."""
+    from services.n8n_client import N8NClientError
+    from services.rate_limiter import retry_after
+
+    if now >= job.deadline_at:
+        return {"status": EXPIRED, "error": f"Sin resultado tras {BANNER_JOB_TIMEOUT_S:.0f} s."}
+    try:
+        remote, url = fetch(job.id)
+    except N8NClientError as e:
+        errors = job.errors + 1
+        if errors >= max_errors or e.status_code in (401, 403):  # sin permiso no va a mejorar
+            return {"status": FAILED, "errors": errors, "error": str(e)}
+        return {"errors": errors, "error": str(e), "polls": job.polls + 1,
+                "next_poll_at": now + next_delay(job.polls + 1, retry_after(e))}
+    if url:
+        return {"status": DONE, "banner_url": url, "remote_status": remote, "error": None, "errors": 0}
+    if str(remote or "").lower() in _FAILED_STATUSES:
+        return {"status": FAILED, "remote_status": remote, "error": f"n8n reportó '{remote}'."}
+    return {"remote_status": remote, "error": None, "errors": 0, "polls": job.polls + 1,
+            "next_poll_at": now + next_delay(job.polls + 1)}
+
+def poll_due(owner: Optional[str] = None, *, now: Optional[float] = None,
+             fetch: Optional[Callable] = None) -> list[BannerJob]:
+    """
+    Consulta en n8n solo los jobs pendientes cuyo turno llegó (varios en paralelo) y
+    guarda el resultado. Devuelve los jobs que cambiaron de estado (terminados/fallidos).
+    Barato si no le toca a ninguno: una lectura de SQLite.
+    """
+    max_errors = BANNER_POLL_MAX_ERRORS
+    if fetch is None:
+        from services import n8n_client
+        fetch = n8n_client.fetch_status
+        if not n8n_client.N8N_STATUS_URL:
+            max_errors = 1  # sin endpoint de estado no hay nada que reintentar
+    now = time.time() if now is None else now
+    with closing(_connect()) as con:
+        due = _claim_due(con, owner, now)
+        if not due:
+            return []
+        if len(due) == 1:
+            outcomes = [_outcome(due[0], fetch, now, max_errors)]
+        else:
+            with ThreadPoolExecutor(max_workers=min(_POLL_WORKERS, len(due))) as pool:
+                outcomes = list(pool.map(lambda j: _outcome(j, fetch, now, max_errors), due))
+        finished = []
+        for job, changes in zip(due, outcomes):
+            changes["updated_at"] = now
+            cols = ", ".join(f"{k} = ?" for k in changes)
+            con.execute(f"UPDATE banner_jobs SET {cols} WHERE id = ? AND status = ?",
+                        (*changes.values(), job.id, PENDING))
+            if changes.get("status", PENDING) != PENDING:
+                finished.append(_job(con.execute("SELECT * FROM banner_jobs WHERE id = ?", (job.id,)).fetchone()))
+    _cache_results(finished)
+    return finished
+
+def _cache_results(jobs: list[BannerJob]) -> None:
+    """Los banners de jobs terminados quedan en la caché: el mismo pedido ya no vuelve a n8n."""
+    done = [j for j in jobs if j.status == DONE and j.cache_key and j.banner_url]
+    if not done:
+        return
+    from services.banner_cache import get_cache
+
+    cache = get_cache()
+    for job in done if cache is not None else ():
+        cache.put(job.cache_key, job.banner_url)
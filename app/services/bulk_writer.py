@@ -0,0 +1,123 @@
+# services/bulk_writer.py
+"""
+Escritura masiva en `reclamos`: parte los registros en lotes, manda varios lotes a la
+vez, reintenta cada lote con backoff exponencial + jitter y reporta lo escrito y lo
+fallido por lote (un lote caído no arrastra a los demás).
+"""
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Callable, Optional, Sequence
+
+import pandas as pd
+
+from services.reclamos_schema import TABLE_NAME
+
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "500"))
+UPSERT_MAX_IN_FLIGHT = int(os.getenv("UPSERT_MAX_IN_FLIGHT", "4"))
+UPSERT_MAX_RETRIES = int(os.getenv("UPSERT_MAX_RETRIES", "4"))
+UPSERT_BACKOFF_S = float(os.getenv("UPSERT_BACKOFF_S", "0.5"))
+_MAX_BACKOFF_S = 30.0
+# SQLSTATE de Postgres que valen otro intento: conexión, recursos, serialización/deadlock, timeout
+_TRANSIENT_SQLSTATE_PREFIXES = ("08", "53")
+_TRANSIENT_SQLSTATES = ("40001", "40P01", "57014", "57P01", "57P03")
+
+@dataclass
+class WriteSummary:
+    rows_written: int = 0
+    rows_failed: int = 0
+    batches: int = 0
+    retries: int = 0
+    errors: list[str] = field(default_factory=list)
+    failed_records: list[dict] = field(default_factory=list)  # para reintentar solo lo que faltó
+
+    @property
+    def ok(self) -> bool:
+        return self.rows_failed == 0
+
+def records_from_frame(df: pd.DataFrame, drop: Sequence[str] = ("Fecha_local",)) -> list[dict]:
+    """DataFrame -> registros JSON-serializables (NA/NaT -> None, sin columnas solo locales)."""
+    df = df.drop(columns=list(drop), errors="ignore")
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+def _default_send(batch: list[dict], on_conflict: str) -> None:
+    from services.supabase_client import call_with_reconnect
+
+    call_with_reconnect(lambda sb: sb.table(TABLE_NAME).upsert(batch, on_conflict=on_conflict).execute())
+
+def _is_transient(e: Exception) -> bool:
+    """Red, timeouts, 429 y 5xx. Un 4xx, esquema o constraint fallaría igual al reintentar."""
+    if isinstance(e, (ConnectionError, TimeoutError)):
+        return True
+    try:
+        import httpx
+        if isinstance(e, httpx.TransportError):
+            return True
+    except ImportError:
+        pass
+    status = getattr(getattr(e, "response", None), "status_code", None) or getattr(e, "status_code", None)
+    code = str(getattr(e, "code", "") or "")
+    if status is None and len(code) == 3 and code.isdigit():  # postgrest-py: respuesta sin JSON -> code = HTTP
+        status = int(code)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return code.startswith(_TRANSIENT_SQLSTATE_PREFIXES) or code in _TRANSIENT_SQLSTATES
+
+def _send_with_retry(batch: list[dict], on_conflict: str, send: Callable, max_retries: int,
+                     backoff_s: float) -> tuple[int, Optional[Exception]]:
+    """Devuelve (reintentos usados, último error o None si se escribió). Solo reintenta errores transitorios."""
+    for attempt in range(max_retries + 1):
+        try:
+            send(batch, on_conflict)
+            return attempt, None
+        except Exception as e:
+            if attempt == max_retries or not _is_transient(e):
+                return attempt, e
+            delay = min(_MAX_BACKOFF_S, backoff_s * 2 ** attempt)
+            time.sleep(random.uniform(delay / 2, delay))  # jitter: los lotes en paralelo no reintentan a la vez
+    return max_retries, None  # inalcanzable
+
+def upsert_reclamos(
+    records: Sequence[dict],
+    *,
+    on_conflict: str = "Id_reclamo",
+    batch_size: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+    max_retries: Optional[int] = None,
+    backoff_s: Optional[float] = None,
+    send: Optional[Callable[[list[dict], str], None]] = None,
+    on_progress: Optional[Callable[[WriteSummary], None]] = None,
+) -> WriteSummary:
+    """
+    Upsert por lotes de `batch_size` con hasta `max_in_flight` lotes simultáneos.
+    No lanza por fallas de escritura: las cuenta en el resumen (rows_failed, errors,
+    failed_records). `on_progress` se llama desde el hilo llamador tras cada lote.
+    """
+    size = max(1, batch_size or UPSERT_BATCH_SIZE)
+    retries = UPSERT_MAX_RETRIES if max_retries is None else max_retries
+    backoff = UPSERT_BACKOFF_S if backoff_s is None else backoff_s
+    send = send or _default_send
+    summary = WriteSummary()
+    batches = [list(records[i:i + size]) for i in range(0, len(records), size)]
+    if not batches:
+        return summary
+
+    workers = max(1, min(max_in_flight or UPSERT_MAX_IN_FLIGHT, len(batches)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upsert") as pool:
+        futures = {pool.submit(_send_with_retry, b, on_conflict, send, retries, backoff): b for b in batches}
+        for fut in as_completed(futures):
+            batch = futures[fut]
+            used, err = fut.result()
+            summary.batches += 1
+            summary.retries += used
+            if err is None:
+                summary.rows_written += len(batch)
+            else:
+                summary.rows_failed += len(batch)
+                summary.failed_records.extend(batch)
+                summary.errors.append(f"Lote de {len(batch)} filas falló tras {used + 1} intentos: {err}")
+            if on_progress:
+                on_progress(summary)
+    return summary
@@ -0,0 +1,127 @@
+# services/classification_cache.py
+import os, json
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Iterable, Optional, Sequence
+
+# Caché persistente (SQLite) de clasificaciones, direccionada por contenido.
+CACHE_PATH = os.getenv("CLASSIFY_CACHE_PATH", ".cache/classify_cache.sqlite3")
+CACHE_MAX_ROWS = int(os.getenv("CLASSIFY_CACHE_MAX_ROWS", "500000"))
+CACHE_MAX_AGE_DAYS = float(os.getenv("CLASSIFY_CACHE_MAX_AGE_DAYS", "90"))
+CACHE_ENABLED = os.getenv("CLASSIFY_CACHE_ENABLED", "true").strip().lower() not in ("0", "false", "no")
+
+_SQL_CHUNK = 500  # límite prudente de parámetros por consulta en SQLite
+
+def normalize_text(texto: str) -> str:
+    """Forma canónica para la llave: NFC, minúsculas y espacios colapsados."""
+    t = unicodedata.normalize("NFC", str(texto or ""))
+    return " ".join(t.casefold().split())
+
+def _cacheable(pred: dict) -> bool:
+    return (isinstance(pred, dict)
+            and isinstance(pred.get("Sentimiento"), str)
+            and isinstance(pred.get("Clasificacion"), str)
+            and "FALLO_GEMINI" not in (pred["Sentimiento"], pred["Clasificacion"]))
+
+class ClassificationCache:
+    """
+    Llave = sha256(namespace + texto normalizado). El namespace debe cambiar cuando
+    cambia el modelo, el prompt o la configuración de generación, de modo que las
+    entradas viejas simplemente dejan de coincidir (y luego se desalojan).
+    Desalojo por antigüedad (created_at) y por tamaño (LRU sobre last_used).
+    """
+
+    def __init__(self, namespace: str, path: str = CACHE_PATH,
+                 max_rows: int = CACHE_MAX_ROWS, max_age_days: float = CACHE_MAX_AGE_DAYS):
+        self.namespace = namespace
+        self.path = path
+        self.max_rows = max_rows
+        self.max_age_s = max_age_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS clasificaciones (
+                key        TEXT PRIMARY KEY,
+                value      TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used  REAL NOT NULL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_clasif_last_used ON clasificaciones(last_used)")
+        self._conn.commit()
+        self.evict()
+
+    def key(self, texto: str) -> str:
+        return hashlib.sha256(f"{self.namespace}\x00{normalize_text(texto)}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: Sequence[str]) -> list[Optional[dict]]:
+        """Devuelve la predicción cacheada de cada texto (None si no está o expiró)."""
+        keys = [self.key(t) for t in texts]
+        found: dict[str, dict] = {}
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(keys), _SQL_CHUNK):
+                chunk = list(set(keys[i:i + _SQL_CHUNK]))
+                marks = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM clasificaciones WHERE key IN ({marks}) AND created_at >= ?",
+                    (*chunk, now - self.max_age_s),
+                ).fetchall()
+                found.update((k, json.loads(v)) for k, v in rows)
+            if found:
+                self._conn.executemany("UPDATE clasificaciones SET last_used=? WHERE key=?",
+                                       [(now, k) for k in found])
+                self._conn.commit()
+            out = [dict(found[k]) if k in found else None for k in keys]
+            hits = sum(p is not None for p in out)
+            self.hits += hits
+            self.misses += len(out) - hits
+        return out
+
+    def get(self, texto: str) -> Optional[dict]:
+        return self.get_many([texto])[0]
+
+    def put_many(self, pairs: Iterable[tuple[str, dict]]) -> int:
+        """Guarda (texto, pred). Nunca guarda FALLO_GEMINI ni respuestas incompletas."""
+        now = time.time()
+        rows = [(self.key(t), json.dumps({"Sentimiento": p["Sentimiento"], "Clasificacion": p["Clasificacion"]},
+                                         ensure_ascii=False), now, now)
+                for t, p in pairs if _cacheable(p)]
+        if not rows:
+            return 0
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO clasificaciones VALUES (?,?,?,?)", rows)
+            self._conn.commit()
+        self.evict()
+        return len(rows)
+
+    def put(self, texto: str, pred: dict) -> int:
+        return self.put_many([(texto, pred)])
+
+    def evict(self) -> None:
+        """Borra entradas vencidas y, si se excede max_rows, las menos usadas recientemente."""
+        with self._lock:
+            self._conn.execute("DELETE FROM clasificaciones WHERE created_at < ?", (time.time() - self.max_age_s,))
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM clasificaciones").fetchone()
+            if count > self.max_rows:
+                self._conn.execute(
+                    "DELETE FROM clasificaciones WHERE key IN "
+                    "(SELECT key FROM clasificaciones ORDER BY last_used ASC LIMIT ?)",
+                    (count - self.max_rows,),
+                )
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            (rows,) = self._conn.execute("SELECT COUNT(*) FROM clasificaciones").fetchone()
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "rows": rows,
+                "hit_rate": (self.hits / total) if total else 0.0, "path": self.path}
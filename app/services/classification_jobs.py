@@ -0,0 +1,354 @@
+# services/classification_jobs.py
+"""
+Cola durable (SQLite) de trabajos de clasificación de CSV. La pestaña de feedback solo
+encola; procesos worker aparte toman los trabajos, los pasan por ingest_csv y guardan un
+checkpoint por chunk, así que cerrar el navegador o reiniciar Streamlit no pierde nada:
+un trabajo cortado se retoma desde el último chunk guardado.
+
+Workers en primer plano (alternativa a los que lanza la app), desde app/:
+    python -m services.classification_jobs --workers 2
+"""
+import os, json
+import shutil
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from contextlib import closing
+from dataclasses import dataclass
+from typing import Optional
+
+from dotenv import load_dotenv
+
+# los workers corren como procesos propios: el .env tiene que estar cargado antes de leer JOBS_*
+load_dotenv()
+
+# absolutas: los workers lanzados por la app las reciben por entorno y ven la misma cola
+JOBS_DB_PATH = os.path.abspath(os.getenv("JOBS_DB_PATH", ".cache/jobs.sqlite3"))
+JOBS_DIR = os.path.abspath(os.getenv("JOBS_DIR", ".cache/jobs"))  # copias de los CSV encolados
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "1"))
+JOBS_POLL_S = float(os.getenv("JOBS_POLL_S", "2"))
+JOBS_STALE_S = float(os.getenv("JOBS_STALE_S", "120"))  # sin latido por este tiempo = worker caído
+# stdout/stderr de los workers que lanza la app (trazas de un worker que se cae al arrancar)
+JOBS_LOG_PATH = os.path.abspath(os.getenv("JOBS_LOG_PATH", os.path.join(os.path.dirname(JOBS_DB_PATH), "workers.log")))
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+ACTIVE = (QUEUED, RUNNING)
+# contadores que el worker suma en cada checkpoint (ver IngestSummary)
+_COUNTERS = ("rows_read", "rows_written", "rows_failed", "rows_write_failed", "api_calls_saved",
+             "cache_hits", "cache_misses", "local_asked", "local_answered")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    path TEXT NOT NULL,
+    status TEXT NOT NULL,
+    chunk_rows INTEGER NOT NULL,
+    chunks_done INTEGER NOT NULL DEFAULT 0,   -- checkpoint: chunks ya escritos
+    rows_read INTEGER NOT NULL DEFAULT 0,
+    rows_written INTEGER NOT NULL DEFAULT 0,
+    rows_failed INTEGER NOT NULL DEFAULT 0,
+    rows_write_failed INTEGER NOT NULL DEFAULT 0,
+    api_calls_saved INTEGER NOT NULL DEFAULT 0,
+    cache_hits INTEGER NOT NULL DEFAULT 0,
+    cache_misses INTEGER NOT NULL DEFAULT 0,
+    local_asked INTEGER NOT NULL DEFAULT 0,
+    local_answered INTEGER NOT NULL DEFAULT 0,
+    bytes_fraction REAL,
+    failure_details TEXT NOT NULL DEFAULT '[]',
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_idx ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    pid INTEGER NOT NULL,
+    heartbeat_at REAL NOT NULL
+);
+"""
+
+class JobCancelled(Exception):
+    pass
+
+@dataclass
+class Job:
+    id: str
+    filename: str
+    path: str
+    status: str
+    chunk_rows: int
+    chunks_done: int
+    rows_read: int
+    rows_written: int
+    rows_failed: int
+    rows_write_failed: int
+    api_calls_saved: int
+    cache_hits: int          # caché y fast-path de ESTE trabajo (medidos en el worker)
+    cache_misses: int
+    local_asked: int
+    local_answered: int
+    bytes_fraction: Optional[float]
+    failure_details: list[str]
+    error: Optional[str]
+    cancel_requested: bool
+    created_at: float
+    updated_at: float
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE
+
+def _connect(db_path: str = JOBS_DB_PATH) -> sqlite3.Connection:
+    if os.path.dirname(db_path):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    con = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    con.row_factory = sqlite3.Row
+    con.execute("PRAGMA journal_mode=WAL")  # la UI lee mientras los workers escriben
+    con.executescript(_SCHEMA)
+    for col in _COUNTERS[5:]:  # colas creadas antes de guardar el uso de caché/fast-path
+        try:
+            con.execute(f"ALTER TABLE jobs ADD COLUMN {col} INTEGER NOT NULL DEFAULT 0")
+        except sqlite3.OperationalError:
+            pass
+    return con
+
+def _job(row: sqlite3.Row) -> Job:
+    d = dict(row)
+    return Job(
+        id=d["id"], filename=d["filename"], path=d["path"], status=d["status"],
+        chunk_rows=d["chunk_rows"], chunks_done=d["chunks_done"], **{k: d[k] for k in _COUNTERS},
+        bytes_fraction=d["bytes_fraction"], failure_details=json.loads(d["failure_details"] or "[]"),
+        error=d["error"], cancel_requested=bool(d["cancel_requested"]),
+        created_at=d["created_at"], updated_at=d["updated_at"],
+    )
+
+def submit_csv(upload, filename: Optional[str] = None, *, chunk_rows: Optional[int] = None) -> str:
+    """
+    Copia el CSV (ruta o archivo abierto, p. ej. el de st.file_uploader) a JOBS_DIR y lo
+    encola. Devuelve el id del trabajo. El tamaño de chunk queda fijo por trabajo para
+    que el checkpoint siga valiendo si cambia INGEST_CHUNK_ROWS.
+    """
+    from services.ingest_pipeline import INGEST_CHUNK_ROWS
+
+    job_id = uuid.uuid4().hex
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    path = os.path.abspath(os.path.join(JOBS_DIR, f"{job_id}.csv"))
+    if isinstance(upload, (str, os.PathLike)):
+        shutil.copyfile(upload, path)
+        filename = filename or os.path.basename(upload)
+    else:
+        if hasattr(upload, "seek"):
+            upload.seek(0)
+        with open(path, "wb") as f:
+            shutil.copyfileobj(upload, f)
+        filename = filename or getattr(upload, "name", None) or f"{job_id}.csv"
+    now = time.time()
+    with closing(_connect()) as con:
+        con.execute(
+            "INSERT INTO jobs (id, filename, path, status, chunk_rows, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (job_id, filename, path, QUEUED, chunk_rows or INGEST_CHUNK_ROWS, now, now),
+        )
+    return job_id
+
+def get_job(job_id: str) -> Optional[Job]:
+    with closing(_connect()) as con:
+        row = con.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _job(row) if row else None
+
+def list_jobs(limit: int = 20) -> list[Job]:
+    """Trabajos más recientes primero."""
+    with closing(_connect()) as con:
+        rows = con.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+    return [_job(r) for r in rows]
+
+def cancel(job_id: str) -> None:
+    """En cola: se cancela ya. En curso: el worker se detiene al terminar el chunk actual."""
+    now = time.time()
+    with closing(_connect()) as con:
+        con.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                    (CANCELLED, now, job_id, QUEUED))
+        con.execute("UPDATE jobs SET cancel_requested = 1, updated_at = ? WHERE id = ? AND status = ?",
+                    (now, job_id, RUNNING))
+
+def resume(job_id: str) -> None:
+    """Vuelve a encolar un trabajo fallido o cancelado; sigue desde su checkpoint."""
+    with closing(_connect()) as con:
+        con.execute(
+            "UPDATE jobs SET status = ?, cancel_requested = 0, error = NULL, worker = NULL, updated_at = ? "
+            "WHERE id = ? AND status IN (?, ?)",
+            (QUEUED, time.time(), job_id, FAILED, CANCELLED),
+        )
+
+def _requeue_stale(con: sqlite3.Connection) -> None:
+    """Trabajos 'running' cuyo worker dejó de latir vuelven a la cola (se retoman del checkpoint)."""
+    con.execute(
+        "UPDATE jobs SET status = CASE WHEN cancel_requested THEN ? ELSE ? END, worker = NULL, updated_at = ? "
+        "WHERE status = ? AND COALESCE(heartbeat_at, 0) < ?",
+        (CANCELLED, QUEUED, time.time(), RUNNING, time.time() - JOBS_STALE_S),
+    )
+
+def _claim(con: sqlite3.Connection, worker: str) -> Optional[Job]:
+    con.execute("BEGIN IMMEDIATE")  # un solo worker a la vez decide qué trabajo toma
+    try:
+        _requeue_stale(con)
+        row = con.execute("SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                          (QUEUED,)).fetchone()
+        if row is None:
+            con.execute("COMMIT")
+            return None
+        now = time.time()
+        con.execute("UPDATE jobs SET status = ?, worker = ?, heartbeat_at = ?, updated_at = ? WHERE id = ?",
+                    (RUNNING, worker, now, now, row["id"]))
+        job = _job(con.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone())
+        con.execute("COMMIT")
+        return job
+    except BaseException:
+        con.execute("ROLLBACK")
+        raise
+
+def _finish(con: sqlite3.Connection, job_id: str, status: str, error: Optional[str] = None) -> None:
+    con.execute("UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, error, time.time(), job_id))
+
+def _heartbeat(job_id: str, stop: threading.Event) -> None:
+    """Late mientras el trabajo corre: un chunk lento (Gemini) no debe parecer un worker caído."""
+    with closing(_connect()) as con:
+        while not stop.wait(min(JOBS_POLL_S, JOBS_STALE_S / 4)):
+            con.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = ?",
+                        (time.time(), job_id, RUNNING))
+
+def run_job(job: Job, con: sqlite3.Connection) -> str:
+    """
+    Procesa `job` desde su checkpoint. Tras cada chunk escrito se suman los contadores y
+    se avanza `chunks_done` en la misma transacción; si el proceso muere entre la
+    escritura y el checkpoint, ese único chunk se vuelve a subir (entrega al-menos-una-vez).
+    """
+    from services.ingest_pipeline import ingest_csv
+
+    prev = dict.fromkeys(_COUNTERS + ("chunks", "details"), 0)
+    details = list(job.failure_details)
+
+    def checkpoint(s) -> None:
+        delta = {k: getattr(s, k) - prev[k] for k in _COUNTERS + ("chunks",)}
+        details.extend(s.failure_details[prev["details"]:])
+        prev.update({k: getattr(s, k) for k in delta}, details=len(s.failure_details))
+        now = time.time()
+        con.execute(
+            "UPDATE jobs SET chunks_done = chunks_done + ?, "
+            + "".join(f"{k} = {k} + ?, " for k in _COUNTERS)
+            + "bytes_fraction = ?, failure_details = ?, heartbeat_at = ?, updated_at = ? WHERE id = ?",
+            (delta["chunks"], *(delta[k] for k in _COUNTERS), s.bytes_fraction,
+             json.dumps(details[-200:], ensure_ascii=False), now, now, job.id),
+        )
+        if con.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job.id,)).fetchone()[0]:
+            raise JobCancelled()
+
+    beating = threading.Event()
+    beat = threading.Thread(target=_heartbeat, args=(job.id, beating), name="job-heartbeat", daemon=True)
+    beat.start()
+    try:
+        with open(job.path, "rb") as f:
+            ingest_csv(f, chunk_rows=job.chunk_rows, skip_chunks=job.chunks_done, on_progress=checkpoint)
+    except JobCancelled:
+        _finish(con, job.id, CANCELLED)
+        return CANCELLED
+    except Exception as e:
+        _finish(con, job.id, FAILED, f"{type(e).__name__}: {e}")
+        return FAILED
+    finally:
+        beating.set()
+        beat.join(timeout=5)
+    _finish(con, job.id, DONE)
+    return DONE
+
+def worker_loop(*, once: bool = False, poll_s: float = JOBS_POLL_S) -> None:
+    """Toma trabajos en orden de llegada hasta que se lo detenga (o hasta vaciar la cola si `once`)."""
+    worker = f"{os.uname().nodename if hasattr(os, 'uname') else 'local'}:{os.getpid()}"
+    spawn_id = os.environ.pop("JOBS_SPAWN_ID", None)  # fila provisoria que dejó ensure_workers
+    with closing(_connect()) as con:
+        while True:
+            con.execute("INSERT OR REPLACE INTO workers (id, pid, heartbeat_at) VALUES (?, ?, ?)",
+                        (worker, os.getpid(), time.time()))
+            if spawn_id:
+                con.execute("DELETE FROM workers WHERE id = ?", (spawn_id,))
+                spawn_id = None
+            job = _claim(con, worker)
+            if job is not None:
+                run_job(job, con)
+                continue
+            if once:
+                return
+            time.sleep(poll_s)
+
+def _alive_workers(con: sqlite3.Connection) -> int:
+    # un worker ocupado late en cada checkpoint (chunk), uno ocioso en cada sondeo
+    cutoff = time.time() - JOBS_STALE_S
+    con.execute("DELETE FROM workers WHERE heartbeat_at < ?", (cutoff,))
+    busy = {r[0] for r in con.execute("SELECT worker FROM jobs WHERE status = ? AND heartbeat_at >= ?",
+                                      (RUNNING, cutoff))}
+    idle = {r[0] for r in con.execute("SELECT id FROM workers")}
+    return len(busy | idle)
+
+def alive_workers() -> int:
+    """Workers que ya arrancaron y laten; no cuenta los recién lanzados que todavía no se registraron."""
+    with closing(_connect()) as con:
+        alive = _alive_workers(con)
+        return alive - con.execute("SELECT COUNT(*) FROM workers WHERE id LIKE 'spawn:%'").fetchone()[0]
+
+def ensure_workers(n: Optional[int] = None) -> int:
+    """
+    Lanza procesos worker desacoplados de Streamlit hasta tener `n` vivos (JOBS_WORKERS).
+    Sobreviven a reruns y a cerrar la pestaña. Devuelve cuántos se lanzaron.
+    """
+    want = JOBS_WORKERS if n is None else n
+    with closing(_connect()) as con:
+        con.execute("BEGIN IMMEDIATE")  # dos reruns simultáneos no cuentan los mismos huecos
+        missing = max(0, want - _alive_workers(con))
+        # se registran antes de lanzarlos para que el próximo rerun no lance otros;
+        # cada worker reemplaza su fila provisoria al arrancar
+        spawn_ids = [f"spawn:{uuid.uuid4().hex}" for _ in range(missing)]
+        now = time.time()
+        con.executemany("INSERT OR REPLACE INTO workers (id, pid, heartbeat_at) VALUES (?, ?, ?)",
+                        [(sid, 0, now) for sid in spawn_ids])
+        con.execute("COMMIT")
+    app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, "JOBS_DB_PATH": JOBS_DB_PATH, "JOBS_DIR": JOBS_DIR,
+           "PYTHONPATH": os.pathsep.join(filter(None, [app_dir, os.environ.get("PYTHONPATH")]))}
+    if spawn_ids:
+        os.makedirs(os.path.dirname(JOBS_LOG_PATH), exist_ok=True)
+    for sid in spawn_ids:
+        # mismo cwd que la app: las rutas relativas (cachés, .env) apuntan a los mismos archivos
+        with open(JOBS_LOG_PATH, "ab") as log:  # el hijo hereda su propio descriptor
+            subprocess.Popen([sys.executable, "-m", "services.classification_jobs", "--workers", "1"],
+                             env={**env, "JOBS_SPAWN_ID": sid}, stdin=subprocess.DEVNULL,
+                             stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+    return missing
+
+def main():
+    import argparse
+    import multiprocessing
+
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--workers", type=int, default=JOBS_WORKERS, help="Procesos worker a lanzar.")
+    ap.add_argument("--once", action="store_true", help="Procesa lo encolado y termina.")
+    args = ap.parse_args()
+    if args.workers <= 1:
+        worker_loop(once=args.once)
+        return
+    procs = [multiprocessing.Process(target=worker_loop, kwargs={"once": args.once}, daemon=False)
+             for _ in range(args.workers)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+
+if __name__ == "__main__":
+    main()
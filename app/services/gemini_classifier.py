@@ -1,71 +1,474 @@
 ﻿# services/gemini_classifier.py
 import os, json
+import hashlib
 import re
-import google.generativeai as genai
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Optional, Sequence
 
-# Ahora importamos GenerationConfig directamente de genai
-from google.generativeai import GenerationConfig 
-from google.api_core.exceptions import GoogleAPIError
+from services.classification_cache import ClassificationCache, CACHE_ENABLED
+from services.local_classifier import get_local_classifier
+from services.rate_limiter import Throttled, get_limiter
 
 # Usar os.getenv para GEMINI_MODEL, que será cargado desde .env
 MODEL = os.getenv("MODEL_ID", "gemini-1.5-flash") 
 
-api_key_value = os.getenv("GEMINI_API_KEY")
+# Máximo de llamadas simultáneas a Gemini en classify_many (cargas masivas de CSV)
+MAX_CONCURRENCY = int(os.getenv("CLASSIFY_MAX_CONCURRENCY", "8"))
+# Modo empaquetado: cuántos reclamos viajan en una misma petición (1 = desactivado)
+# y tope aproximado de tokens de texto por paquete.
+PACK_SIZE = int(os.getenv("CLASSIFY_PACK_SIZE", "20"))
+PACK_MAX_TOKENS = int(os.getenv("CLASSIFY_PACK_MAX_TOKENS", "3000"))
+# Nuevas peticiones para ítems con respuesta inválida antes de marcarlos FALLO_GEMINI
+PARSE_RETRIES = int(os.getenv("CLASSIFY_PARSE_RETRIES", "1"))
 
-if not api_key_value:
-    raise ValueError(
-        "La variable de entorno 'GEMINI_API_KEY' no se encontró. "
-        "Asegúrate de que esté definida en tu archivo .env o en el entorno del sistema."
-    )
+# --- CLIENTE Y MODELO (perezosos) ---
+# google.generativeai tarda en importarse y exige la clave: se configura recién en la
+# primera llamada real a Gemini, no al importar (abrir la app o un tab no la necesita).
+# Los benchmarks pueden asignar `model` directamente con un modelo falso.
+model = None
+_model_lock = threading.Lock()
+
+class GeminiConfigError(RuntimeError):
+    """Falta configuración (API key): no es un fallo del texto, así que se propaga como Throttled."""
+
+def _get_model():
+    global model
+    if model is None:
+        with _model_lock:
+            if model is None:
+                import google.generativeai as genai
+
+                api_key_value = os.getenv("GEMINI_API_KEY")
+                if not api_key_value:
+                    raise GeminiConfigError(
+                        "La variable de entorno 'GEMINI_API_KEY' no se encontró. "
+                        "Asegúrate de que esté definida en tu archivo .env o en el entorno del sistema."
+                    )
+                genai.configure(api_key=api_key_value) # Configura la clave API globalmente
+                model = genai.GenerativeModel(MODEL)   # Obtiene una instancia del modelo específico
+    return model
 
-# --- INICIALIZACIÓN CORRECTA DEL CLIENTE Y MODELO ---
-genai.configure(api_key=api_key_value) # Configura la clave API globalmente
-model = genai.GenerativeModel(MODEL)   # Obtiene una instancia del modelo específico
-# ----------------------------------------------------
+def _api_errors():
+    """Excepciones de google.api_core (importadas recién cuando hace falta clasificar un error)."""
+    from google.api_core import exceptions
+
+    return exceptions
+# ------------------------------------
 
 SYSTEM = ("Eres un analista de reclamos. Devuelve SOLO JSON con campos: "
           "{'Sentimiento':'positivo|neutral|negativo','Clasificacion':'producto|entrega|servicio|otros'}.")
 
+SYSTEM_BATCH = ("Eres un analista de reclamos. Recibirás varios textos numerados. Devuelve SOLO un arreglo JSON "
+                "con un objeto por texto, en el mismo orden: "
+                "[{'n':1,'Sentimiento':'positivo|neutral|negativo','Clasificacion':'producto|entrega|servicio|otros'}, ...].")
+
+# Única fuente de la configuración de generación (también forma parte de la llave de caché)
+GENERATION_CONFIG = {"temperature": 0}  # temperature=0 para respuestas más deterministas
+
+# Salida estructurada: Gemini responde JSON que cumple el esquema (valores acotados a los enums)
+STRUCTURED_OUTPUT = os.getenv("CLASSIFY_STRUCTURED_OUTPUT", "true").strip().lower() not in ("0", "false", "no")
+SENTIMIENTOS = ("positivo", "neutral", "negativo")
+CLASIFICACIONES = ("producto", "entrega", "servicio", "otros")
+_ITEM_PROPS = {
+    "Sentimiento": {"type": "STRING", "enum": list(SENTIMIENTOS)},
+    "Clasificacion": {"type": "STRING", "enum": list(CLASIFICACIONES)},
+}
+RESPONSE_SCHEMA = {"type": "OBJECT", "properties": _ITEM_PROPS, "required": ["Sentimiento", "Clasificacion"]}
+RESPONSE_SCHEMA_BATCH = {
+    "type": "ARRAY",
+    "items": {"type": "OBJECT", "properties": {"n": {"type": "INTEGER"}, **_ITEM_PROPS},
+              "required": ["n", "Sentimiento", "Clasificacion"]},
+}
+
+_REPAIR_HINT = ("\n\nIMPORTANTE: la respuesta anterior no era válida. Usa exactamente uno de los valores "
+                f"permitidos: Sentimiento {'|'.join(SENTIMIENTOS)}; Clasificacion {'|'.join(CLASIFICACIONES)}.")
+
+class _ParseStats:
+    """Contadores de interpretación de respuestas (por proceso) para vigilar la tasa de fallas."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.items = 0      # ítems pedidos a Gemini
+        self.fast = 0       # interpretados directo (json.loads + validación)
+        self.repaired = 0   # recuperados quitando ```json o normalizando valores
+        self.retried = 0    # ítems que necesitaron otra petición
+        self.failed = 0     # terminaron en FALLO_GEMINI
+
+    def add(self, **counts: int) -> None:
+        with self._lock:
+            for k, v in counts.items():
+                setattr(self, k, getattr(self, k) + v)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            d = {k: getattr(self, k) for k in ("items", "fast", "repaired", "retried", "failed")}
+        d["failure_rate"] = d["failed"] / d["items"] if d["items"] else 0.0
+        return d
+
+_parse_stats = _ParseStats()
+
+def parse_stats() -> dict:
+    """Ítems pedidos, interpretados directo / reparados / reintentados / fallidos y tasa de falla."""
+    return _parse_stats.snapshot()
+
+_cache: Optional[ClassificationCache] = None
+_cache_lock = threading.Lock()
+
+def get_cache() -> Optional[ClassificationCache]:
+    """Caché persistente de clasificaciones para MODEL/SYSTEM/GENERATION_CONFIG actuales (None si está desactivada)."""
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            fingerprint = json.dumps([MODEL, SYSTEM, SYSTEM_BATCH, GENERATION_CONFIG,
+                                      STRUCTURED_OUTPUT and [RESPONSE_SCHEMA, RESPONSE_SCHEMA_BATCH]],
+                                     sort_keys=True, ensure_ascii=False)
+            _cache = ClassificationCache(namespace=hashlib.sha256(fingerprint.encode("utf-8")).hexdigest())
+        return _cache
+
+def _fallo() -> dict:
+    return {"Sentimiento":"FALLO_GEMINI","Clasificacion":"FALLO_GEMINI"}
+
+_OUTPUT_TOKENS_PER_ITEM = 24  # JSON de respuesta por reclamo, para el cupo de tokens/min
+
+def _estimate_tokens(texto: str) -> int:
+    """Estimación barata (~4 caracteres por token) para armar paquetes."""
+    return len(texto or "") // 4 + 8
+
+def _is_throttle(e: BaseException) -> bool:
+    """429 / cuota agotada / sobrecarga temporal: se reintenta en lugar de marcar FALLO_GEMINI."""
+    ex = _api_errors()
+    if isinstance(e, (ex.ResourceExhausted, ex.TooManyRequests, ex.ServiceUnavailable)):
+        return True
+    return isinstance(e, ex.GoogleAPIError) and ("429" in str(e) or "quota" in str(e).lower())
+
+def _generation_config(schema: Optional[dict]):
+    from google.generativeai import GenerationConfig
+
+    if STRUCTURED_OUTPUT and schema is not None:
+        try:
+            return GenerationConfig(**GENERATION_CONFIG, response_mime_type="application/json",
+                                    response_schema=schema)
+        except TypeError:
+            pass  # google-generativeai sin response_schema: se sigue con el parseo tolerante
+    return GenerationConfig(**GENERATION_CONFIG)
+
+def _generate_raw(prompt: str, expected_items: int = 1, schema: Optional[dict] = None) -> str:
+    """
+    Llama a Gemini (a través del limitador compartido del modelo) y devuelve el texto
+    crudo de la primera candidata. Con `schema` pide salida JSON estructurada.
+    Lanza Throttled si la cuota no se liberó tras los reintentos.
+    """
+    cfg = _generation_config(schema)
+    tokens = _estimate_tokens(prompt) + _OUTPUT_TOKENS_PER_ITEM * expected_items
+
+    res = get_limiter(MODEL).call(
+        lambda: _get_model().generate_content(
+            contents=[{"role":"user","parts":[{"text": prompt}]}],
+            generation_config=cfg # El parámetro correcto es 'generation_config'
+        ),
+        tokens=tokens,
+        is_throttle=_is_throttle,
+    )
+
+    if not res.candidates or not res.candidates[0].content.parts:
+        raise ValueError("Gemini API no devolvió candidatos o el contenido está vacío.")
+    return res.candidates[0].content.parts[0].text
+
+def _json_from_raw(json_output_raw: str) -> str:
+    """Quita el bloque ```json ... ``` si Gemini lo añadió."""
+    match = re.search(r"```json\s*(.*?)\s*```", json_output_raw, re.DOTALL)
+    return match.group(1) if match else json_output_raw
+
+def _load_json(raw: str) -> tuple[object, bool]:
+    """
+    (valor, reparado). Camino rápido: json.loads directo (lo normal con salida
+    estructurada); si falla, se quita el bloque ```json y se vuelve a intentar.
+    """
+    try:
+        return json.loads(raw), False
+    except ValueError:
+        return json.loads(_json_from_raw(raw)), True
+
+def _validate(obj) -> tuple[Optional[dict], bool]:
+    """
+    (pred, reparado) si el objeto trae valores permitidos; mayúsculas/espacios se
+    corrigen (reparado=True). (None, False) si algún valor queda fuera de los enums.
+    """
+    if not isinstance(obj, dict):
+        return None, False
+    sent, clas = obj.get("Sentimiento"), obj.get("Clasificacion")
+    if not isinstance(sent, str) or not isinstance(clas, str):
+        return None, False
+    fixed = {"Sentimiento": sent.strip().lower(), "Clasificacion": clas.strip().lower()}
+    if fixed["Sentimiento"] not in SENTIMIENTOS or fixed["Clasificacion"] not in CLASIFICACIONES:
+        return None, False
+    return fixed, fixed != {"Sentimiento": sent, "Clasificacion": clas}
+
 # Modificamos la firma para poder devolver un segundo valor para el error
 def classify_text(texto: str) -> tuple[dict, str]:
     if not texto or not texto.strip():
         return {"Sentimiento":"neutral","Clasificacion":"otros"}, ""
 
+    cache = get_cache()
+    if cache is not None:
+        hit = cache.get(texto)
+        if hit is not None:
+            return hit, ""
+    local = get_local_classifier()
+    if local is not None:
+        fast = local.predict_many([texto])[0]
+        if fast is not None:
+            return fast, ""
+    try:
+        pred, error_detail = _classify_uncached(texto)
+    except (Throttled, GeminiConfigError) as e:  # uso interactivo: se informa, no se reintenta más
+        return _fallo(), f"{e}. Texto problemático: {texto[:100]}..."
+    if cache is not None:
+        cache.put(texto, pred)  # FALLO_GEMINI nunca se guarda
+    return pred, error_detail
+
+def _classify_uncached(texto: str, counted: bool = False) -> tuple[dict, str]:
+    """
+    Una petición a Gemini por texto, sin pasar por la caché (Throttled se propaga).
+    Una respuesta que no se puede interpretar o trae valores fuera del esquema se
+    vuelve a pedir hasta CLASSIFY_PARSE_RETRIES veces antes de dar FALLO_GEMINI.
+    """
+
     prompt = f"{SYSTEM}\n\nTexto:\n{texto}\n\nDevuelve solo JSON válido."
-    
-    res = None
+    if not counted:
+        _parse_stats.add(items=1)
+
     gemini_raw_response = "No se pudo obtener una respuesta raw de Gemini debido a un error previo o un error de la API." 
     error_message_detail = "" 
-    
+
+    for attempt in range(PARSE_RETRIES + 1):
+        try:
+            gemini_raw_response = _generate_raw(prompt + (_REPAIR_HINT if attempt else ""), schema=RESPONSE_SCHEMA)
+            obj, repaired_json = _load_json(gemini_raw_response)
+            pred, repaired_values = _validate(obj)
+            if pred is None:
+                raise ValueError(f"Respuesta fuera del esquema: {str(obj)[:200]}")
+        except (Throttled, GeminiConfigError):
+            raise
+        except ValueError as e:  # incluye json.JSONDecodeError: solo esto se vuelve a pedir
+            error_message_detail = f"Error específico: {e}. Texto problemático: {texto[:100]}... Respuesta RAW: {gemini_raw_response}"
+            if attempt < PARSE_RETRIES:
+                _parse_stats.add(retried=1)
+                continue
+            _parse_stats.add(failed=1)
+            return _fallo(), error_message_detail
+        except Exception as e:
+            _parse_stats.add(failed=1)
+            kind = "Error específico" if isinstance(e, _api_errors().GoogleAPIError) else "Error inesperado"
+            error_message_detail = f"{kind}: {e}. Texto problemático: {texto[:100]}... Respuesta RAW: {gemini_raw_response}"
+            return _fallo(), error_message_detail
+        if repaired_json or repaired_values:
+            _parse_stats.add(repaired=1)
+        else:
+            _parse_stats.add(fast=1)
+        return pred, ""
+    return _fallo(), error_message_detail  # inalcanzable
+
+def _map_batch_items(items: list, n: int) -> tuple[list[Optional[dict]], int]:
+    """
+    Asigna cada objeto del arreglo devuelto a su posición (por 'n' o, si el largo
+    coincide, por orden). Las posiciones sin un objeto válido quedan en None.
+    Devuelve también cuántos ítems necesitaron reparación.
+    """
+    out: list[Optional[dict]] = [None] * n
+    repaired = 0
+    positional = len(items) == n
+    for pos, obj in enumerate(items):
+        if not isinstance(obj, dict):
+            continue
+        num = obj.get("n")
+        if isinstance(num, (int, str)) and str(num).strip().isdigit():
+            idx = int(num) - 1
+        else:
+            idx = pos if positional else None
+        if idx is None or not 0 <= idx < n or out[idx] is not None:
+            continue
+        pred, fixed = _validate(obj)
+        if pred is not None:
+            out[idx] = pred
+            repaired += fixed
+    return out, repaired
+
+def _request_pack(texts: Sequence[str], repair: bool = False) -> list[Optional[dict]]:
+    """Una petición con varios textos; None en las posiciones que no se pudieron interpretar."""
+    numbered = "\n".join(f"{n}. {' '.join(str(t).split())}" for n, t in enumerate(texts, start=1))
+    prompt = (f"{SYSTEM_BATCH}\n\nTextos:\n{numbered}\n\n"
+              f"Devuelve solo un arreglo JSON válido con exactamente {len(texts)} objetos."
+              + (_REPAIR_HINT if repair else ""))
+    raw = _generate_raw(prompt, expected_items=len(texts), schema=RESPONSE_SCHEMA_BATCH)
     try:
-        cfg = GenerationConfig( 
-            temperature=0, # para respuestas más deterministas
-        )
+        items, repaired_json = _load_json(raw)
+    except ValueError:
+        return [None] * len(texts)
+    parsed, repaired = _map_batch_items(items if isinstance(items, list) else [], len(texts))
+    ok = sum(p is not None for p in parsed)
+    if repaired_json:
+        _parse_stats.add(repaired=ok)
+    else:
+        _parse_stats.add(repaired=repaired, fast=ok - repaired)
+    return parsed
 
-        res = model.generate_content(
-            contents=[{"role":"user","parts":[{"text": prompt}]}],
-            generation_config=cfg # El parámetro correcto es 'generation_config'
-        )
-        
-        if not res.candidates or not res.candidates[0].content.parts:
-            error_message_detail = "Gemini API no devolvió candidatos o el contenido está vacío."
-            return {"Sentimiento":"FALLO_GEMINI","Clasificacion":"FALLO_GEMINI"}, error_message_detail
-
-        json_output_raw = res.candidates[0].content.parts[0].text
-        
-        gemini_raw_response = json_output_raw 
-
-        match = re.search(r"```json\s*(.*?)\s*```", json_output_raw, re.DOTALL)
-        if match:
-            json_string = match.group(1)
+def classify_batch(texts: Sequence[str]) -> list[tuple[dict, str]]:
+    """
+    Clasifica varios textos en UNA sola petición (lista numerada -> arreglo JSON).
+    Solo los ítems inválidos se vuelven a pedir: primero juntos en un paquete más chico
+    y, si aún fallan, uno a uno. Un error de la API marca todo el paquete como
+    FALLO_GEMINI, salvo la cuota agotada (Throttled), que se propaga.
+    """
+    results: list[tuple[dict, str] | None] = [None] * len(texts)
+    pending = []
+    for i, txt in enumerate(texts):
+        if not txt or not str(txt).strip():
+            results[i] = ({"Sentimiento":"neutral","Clasificacion":"otros"}, "")
         else:
-            json_string = json_output_raw
-            
-        return json.loads(json_string), "" 
-        
-    except (GoogleAPIError, ValueError, json.JSONDecodeError) as e:
-        error_message_detail = f"Error específico: {e}. Texto problemático: {texto[:100]}... Respuesta RAW: {gemini_raw_response}"
-        return {"Sentimiento":"FALLO_GEMINI","Clasificacion":"FALLO_GEMINI"}, error_message_detail
-    except Exception as e:
-        error_message_detail = f"Error inesperado: {e}. Texto problemático: {texto[:100]}... Respuesta RAW: {gemini_raw_response}"
-        return {"Sentimiento":"FALLO_GEMINI","Clasificacion":"FALLO_GEMINI"}, error_message_detail
\ No newline at end of file
+            pending.append(i)
+
+    if len(pending) == 1:
+        results[pending[0]] = _classify_uncached(texts[pending[0]])
+    elif pending:
+        _parse_stats.add(items=len(pending))
+        try:
+            parsed = _request_pack([texts[i] for i in pending])
+        except (Throttled, GeminiConfigError):
+            raise
+        except Exception as e:
+            _parse_stats.add(failed=len(pending))
+            detail = f"Error en petición empaquetada ({len(pending)} textos): {e}"
+            for i in pending:
+                results[i] = (_fallo(), detail)
+            return results
+
+        bad = [n for n, p in enumerate(parsed) if p is None]
+        if len(bad) > 1 and PARSE_RETRIES:
+            _parse_stats.add(retried=len(bad))
+            try:
+                for n, p in zip(bad, _request_pack([texts[pending[n]] for n in bad], repair=True)):
+                    parsed[n] = p
+            except (Throttled, GeminiConfigError):
+                raise
+            except Exception:
+                pass  # se resuelven uno a uno abajo
+        for n, i in enumerate(pending):
+            if parsed[n] is not None:
+                results[i] = (parsed[n], "")
+            else:
+                _parse_stats.add(retried=1)
+                results[i] = _classify_uncached(texts[i], counted=True)
+    return results
+
+def _make_packs(texts: Sequence[str], pack_size: int, max_tokens: int) -> list[list[int]]:
+    """Agrupa índices consecutivos respetando tamaño máximo y presupuesto de tokens."""
+    packs, cur, cur_tokens = [], [], 0
+    for i, txt in enumerate(texts):
+        t = _estimate_tokens(str(txt))
+        if cur and (len(cur) >= pack_size or cur_tokens + t > max_tokens):
+            packs.append(cur)
+            cur, cur_tokens = [], 0
+        cur.append(i)
+        cur_tokens += t
+    if cur:
+        packs.append(cur)
+    return packs
+
+def classify_many(
+    texts: Sequence[str],
+    max_concurrency: Optional[int] = None,
+    *,
+    pack_size: Optional[int] = None,
+    max_pack_tokens: Optional[int] = None,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    classify_fn: Optional[Callable[[str], tuple[dict, str]]] = None,
+    use_cache: bool = True,
+    use_fast_path: bool = True,
+    usage: Optional[dict] = None,
+) -> list[tuple[dict, str]]:
+    """
+    Clasifica varios textos en paralelo con un pool de hilos acotado.
+    Devuelve [(pred, error_detail), ...] en el MISMO orden que `texts`.
+    Con `pack_size` > 1 cada petición lleva un paquete de textos (ver classify_batch).
+    `on_progress(hechos, total)` se invoca desde el hilo llamador a medida que
+    terminan las llamadas (seguro para actualizar st.progress).
+    `classify_fn` permite inyectar otro clasificador por texto (desactiva el empaquetado).
+    Con `use_cache` solo los textos ausentes de la caché persistente llegan a Gemini.
+    Con `use_fast_path` el clasificador local responde los casos de alta confianza.
+    `usage` (dict) acumula cache_hits / cache_misses / local_asked / local_answered de esta llamada.
+    Si la cuota de Gemini no se libera tras los reintentos del limitador lanza Throttled
+    (los paquetes ya resueltos quedan en la caché): mejor cortar que descartar filas.
+    """
+    total = len(texts)
+    results: list[tuple[dict, str] | None] = [None] * total
+    if total == 0:
+        return []
+
+    # mismo atajo que classify_text: un texto vacío nunca llega a Gemini (ni a la caché)
+    todo = []
+    for i, txt in enumerate(texts):
+        if not txt or not str(txt).strip():
+            results[i] = ({"Sentimiento":"neutral","Clasificacion":"otros"}, "")
+        else:
+            todo.append(i)
+    cache = get_cache() if use_cache and classify_fn is None else None
+    counts = {"cache_hits": 0, "cache_misses": 0, "local_asked": 0, "local_answered": 0}
+    if cache is not None and todo:
+        for i, hit in zip(todo, cache.get_many([texts[i] for i in todo])):
+            if hit is not None:
+                results[i] = (hit, "")
+        asked = len(todo)
+        todo = [i for i in todo if results[i] is None]
+        counts["cache_hits"], counts["cache_misses"] = asked - len(todo), len(todo)
+    local = get_local_classifier() if use_fast_path and classify_fn is None else None
+    if local is not None and todo:
+        for i, fast in zip(todo, local.predict_many([texts[i] for i in todo])):
+            if fast is not None:
+                results[i] = (fast, "")
+        asked = len(todo)
+        todo = [i for i in todo if results[i] is None]
+        counts["local_asked"], counts["local_answered"] = asked, asked - len(todo)
+    if usage is not None:
+        for k, v in counts.items():
+            usage[k] = usage.get(k, 0) + v
+    done = total - len(todo)
+    if on_progress and done:
+        on_progress(done, total)
+
+    size = PACK_SIZE if pack_size is None else pack_size
+    if classify_fn is None and size > 1:
+        packs = [[todo[j] for j in p] for p in _make_packs([texts[i] for i in todo], size, max_pack_tokens or PACK_MAX_TOKENS)]
+    else:
+        packs = [[i] for i in todo]
+    fn = classify_fn or _classify_uncached
+
+    def _run(idxs: list[int]) -> list[tuple[dict, str]]:
+        if len(idxs) == 1:
+            return [fn(texts[idxs[0]])]
+        return classify_batch([texts[i] for i in idxs])
+
+    workers = max(1, min(max_concurrency or MAX_CONCURRENCY, len(packs) or 1))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gemini") as pool:
+        futures = {pool.submit(_run, idxs): idxs for idxs in packs}
+        for fut in as_completed(futures):
+            idxs = futures[fut]
+            try:
+                outs = fut.result()
+            except (Throttled, GeminiConfigError):
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+            except Exception as e:  # classify_text ya captura sus errores; esto cubre classify_fn externos
+                outs = [(_fallo(), f"Error inesperado: {e}. Texto problemático: {str(texts[i])[:100]}...")
+                        for i in idxs]
+            for i, out in zip(idxs, outs):
+                results[i] = out
+            if cache is not None:
+                cache.put_many((texts[i], out[0]) for i, out in zip(idxs, outs))
+            done += len(idxs)
+            if on_progress:
+                on_progress(done, total)
+    return results
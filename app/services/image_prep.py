@@ -0,0 +1,137 @@
+# services/image_prep.py
+"""
+Preprocesado local de imágenes antes de subirlas a n8n (banner) o Cloud Run (ProductVision):
+
+- corrige la orientación EXIF y reduce a la resolución máxima de cada destino;
+- normaliza el formato: JPEG progresivo si la imagen es opaca, PNG optimizado si tiene
+  transparencia (un producto recortado debe conservar el alfa para componerse sobre el banner);
+- descarta EXIF/XMP (cámara, GPS, miniaturas); solo se conserva el perfil ICC para no alterar
+  colores. Si la salida cambia de espacio de color (CMYK o grises -> RGB), los píxeles se pasan
+  a sRGB con ese perfil y el resultado sale sin perfil (= sRGB): el de origen ya no le corresponde.
+
+Si el resultado no es más liviano que el original (y el original no trae metadatos) se
+devuelve el original tal cual. Si Pillow no está disponible o la imagen no se puede
+decodificar, también: el preprocesado nunca bloquea un envío.
+"""
+import io
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+IMAGE_PREP_ENABLED = os.getenv("IMAGE_PREP_ENABLED", "true").strip().lower() not in ("0", "false", "no")
+BANNER_IMAGE_MAX_PX = int(os.getenv("BANNER_IMAGE_MAX_PX", "2048"))    # lado mayor, imágenes del banner
+PRODUCT_IMAGE_MAX_PX = int(os.getenv("PRODUCT_IMAGE_MAX_PX", "1536"))  # lado mayor, ProductVision
+IMAGE_PREP_QUALITY = int(os.getenv("IMAGE_PREP_QUALITY", "85"))        # calidad JPEG
+
+# destino -> lado mayor permitido (0 = no redimensionar)
+TARGETS = {
+    "banner": BANNER_IMAGE_MAX_PX,
+    "product": PRODUCT_IMAGE_MAX_PX,
+}
+
+@dataclass
+class PreparedImage:
+    data: bytes
+    mime: str
+    original_bytes: int
+    size: tuple[int, int] = (0, 0)           # (ancho, alto) final
+    original_size: tuple[int, int] = (0, 0)
+    elapsed_ms: float = 0.0
+    note: str = ""                           # por qué se dejó el original, si aplica
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.original_bytes - len(self.data)
+
+    @property
+    def saved_pct(self) -> float:
+        return 100.0 * self.saved_bytes / self.original_bytes if self.original_bytes else 0.0
+
+    def summary(self) -> str:
+        """Texto corto para la UI: '743.6 KB → 201.2 KB (-73%) · 2048×1152'."""
+        text = f"{self.original_bytes / 1024:,.1f} KB"
+        if self.saved_bytes > 0:
+            text += f" → {len(self.data) / 1024:,.1f} KB (-{self.saved_pct:.0f}%)"
+        if self.size != (0, 0):
+            text += f" · {self.size[0]}×{self.size[1]}"
+        return text
+
+def sniff_mime(data: bytes, fallback: Optional[str] = None) -> str:
+    """MIME según la firma del archivo (PNG/JPEG/WebP); si no se reconoce, `fallback`."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if data[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return fallback or "image/jpeg"
+
+def _has_alpha(img) -> bool:
+    if img.mode in ("RGBA", "LA", "PA"):
+        return img.getchannel("A").getextrema()[0] < 255  # alfa totalmente opaco = no hace falta
+    return img.mode == "P" and "transparency" in img.info
+
+def _to_rgb(img, icc: Optional[bytes], mode: str):
+    """`img` en `mode` (RGB/RGBA) y el perfil ICC que le corresponde a la salida."""
+    if img.mode == mode:
+        return img, icc
+    if not icc or img.mode in ("RGB", "RGBA", "RGBX", "P", "PA"):  # mismo espacio: el perfil sigue valiendo
+        return img.convert(mode), icc
+    try:
+        from PIL import ImageCms
+
+        if img.mode in ("CMYK", "L"):  # los que LittleCMS transforma directo
+            srgb = ImageCms.profileToProfile(img, ImageCms.ImageCmsProfile(io.BytesIO(icc)),
+                                             ImageCms.createProfile("sRGB"), outputMode="RGB")
+            return srgb.convert(mode), None
+    except Exception:  # perfil dañado o que no coincide con el modo
+        pass
+    return img.convert(mode), None
+
+def prepare_image(data: bytes, target: str = "banner", *, mime: Optional[str] = None,
+                  max_px: Optional[int] = None, quality: int = IMAGE_PREP_QUALITY) -> PreparedImage:
+    """Reduce, recomprime y limpia `data` para `target` ('banner' | 'product')."""
+    t0 = time.perf_counter()
+    data = data or b""
+    original = PreparedImage(data, sniff_mime(data, mime), len(data))
+    if not IMAGE_PREP_ENABLED or not data:
+        return original
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        original.note = "Pillow no está instalado"
+        return original
+
+    limit = TARGETS.get(target, BANNER_IMAGE_MAX_PX) if max_px is None else max_px
+    try:
+        img = Image.open(io.BytesIO(data))
+        original.size = original.original_size = img.size
+        if limit and img.format == "JPEG":
+            img.draft("RGB", (limit, limit))  # el decodificador JPEG ya reduce por 1/2, 1/4, 1/8
+        has_exif = bool(img.info.get("exif") or img.getexif())
+        img = ImageOps.exif_transpose(img)
+        icc = img.info.get("icc_profile")
+        if limit and max(img.size) > limit:
+            img.thumbnail((limit, limit), Image.LANCZOS)
+
+        out = io.BytesIO()
+        if _has_alpha(img):
+            img, icc = _to_rgb(img, icc, "RGBA")
+            img.save(out, "PNG", optimize=True, icc_profile=icc)
+            out_mime = "image/png"
+        else:
+            img, icc = _to_rgb(img, icc, "RGB")
+            img.save(out, "JPEG", quality=quality, optimize=True, progressive=True, icc_profile=icc)
+            out_mime = "image/jpeg"
+    except Exception as e:  # archivo dañado/formato raro: se manda como vino
+        original.note = f"No se pudo preprocesar: {e}"
+        return original
+
+    resized = img.size != original.original_size
+    if out.tell() >= len(data) and not resized and not has_exif:
+        original.note = "El original ya era más liviano"
+        original.elapsed_ms = (time.perf_counter() - t0) * 1000
+        return original
+    return PreparedImage(out.getvalue(), out_mime, len(data), img.size, original.original_size,
+                         (time.perf_counter() - t0) * 1000)
@@ -0,0 +1,206 @@
+# services/ingest_pipeline.py
+"""
+Ingesta de CSV en streaming con memoria acotada:
+
+    lectura por chunks -> ensure_min_columns -> clasificación -> upsert
+
+Cada etapa corre en su propio hilo y se comunica por colas de tamaño fijo, así que
+en memoria solo hay unos pocos chunks a la vez y las etapas se solapan (mientras se
+clasifica el chunk N se guarda el N-1 y se lee el N+1). Cada chunk se guarda apenas
+termina: una falla al final ya no pierde el trabajo hecho.
+"""
+import os
+import queue
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, Optional
+
+import pandas as pd
+
+from services.bulk_writer import WriteSummary, records_from_frame, upsert_reclamos
+from services.gemini_classifier import classify_many
+from services.near_duplicates import plan_near_duplicates
+from services.reclamos_schema import ensure_min_columns, normalize_sent
+
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "2000"))
+INGEST_QUEUE_DEPTH = int(os.getenv("INGEST_QUEUE_DEPTH", "2"))  # chunks en espera entre etapas
+MAX_FAILURE_DETAILS = 200
+
+_DONE = object()
+_USAGE_FIELDS = ("cache_hits", "cache_misses", "local_asked", "local_answered")
+
+@dataclass
+class IngestSummary:
+    """Resumen acumulado de una ingesta (también es lo que recibe on_progress)."""
+    rows_read: int = 0
+    rows_written: int = 0
+    rows_failed: int = 0            # FALLO_GEMINI: no se guardan
+    rows_write_failed: int = 0      # clasificadas pero no escritas tras los reintentos
+    api_calls_saved: int = 0        # casi-duplicados que heredaron etiqueta
+    cache_hits: int = 0             # resueltos por la caché de clasificaciones
+    cache_misses: int = 0
+    local_asked: int = 0            # consultados al clasificador local (fast-path)
+    local_answered: int = 0         # resueltos por él sin Gemini
+    chunks: int = 0
+    bytes_fraction: Optional[float] = None  # avance aproximado del archivo (si se puede medir)
+    failure_details: list[str] = field(default_factory=list)
+
+class _Stop(Exception):
+    pass
+
+def classify_frame(df: pd.DataFrame) -> tuple[pd.DataFrame, list[str], int, dict]:
+    """
+    Clasifica `Det_reclamo` (pre-pase de casi-duplicados + classify_many) y agrega
+    Sentimiento/Clasificacion. Devuelve (df, detalles de fallas, llamadas ahorradas, uso de
+    caché/fast-path de classify_many).
+    """
+    textos = df["Det_reclamo"].tolist()
+    plan = plan_near_duplicates(textos)
+    usage: dict = {}
+    results = plan.fan_out(classify_many([textos[i] for i in plan.representatives], usage=usage))
+
+    preds, failures = [], []
+    for txt, (pred, error_detail) in zip(textos, results):
+        preds.append(pred)
+        if pred.get("Sentimiento") == "FALLO_GEMINI":
+            failures.append(f"Reclamo '{txt[:70]}...' falló: {error_detail}")
+
+    pred_df = pd.DataFrame(preds, index=df.index)
+    df = df.copy()
+    df["Sentimiento"] = pred_df["Sentimiento"].map(normalize_sent)
+    df["Clasificacion"] = pred_df["Clasificacion"].fillna("otros")
+    return df, failures, plan.saved, usage
+
+def upsert_frame(df: pd.DataFrame) -> WriteSummary:
+    """Guarda las filas clasificadas (sin Fecha_local, que es solo local) con el escritor por lotes."""
+    return upsert_reclamos(records_from_frame(df))
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> None:
+    """put bloqueante que se rinde si otra etapa falló (evita hilos colgados)."""
+    while True:
+        if stop.is_set():
+            raise _Stop()
+        try:
+            q.put(item, timeout=0.2)
+            return
+        except queue.Full:
+            continue
+
+def _get(q: queue.Queue, stop: threading.Event):
+    while True:
+        if stop.is_set():
+            raise _Stop()
+        try:
+            return q.get(timeout=0.2)
+        except queue.Empty:
+            continue
+
+def _stage(fn: Callable, q_in: Optional[queue.Queue], q_out: queue.Queue,
+           stop: threading.Event, errors: list) -> Callable[[], None]:
+    """Envuelve una etapa: consume q_in (o genera si es None), produce en q_out y propaga el fin."""
+    def run():
+        try:
+            if q_in is None:
+                for item in fn():
+                    _put(q_out, item, stop)
+            else:
+                while (item := _get(q_in, stop)) is not _DONE:
+                    _put(q_out, fn(item), stop)
+            _put(q_out, _DONE, stop)
+        except _Stop:
+            pass
+        except BaseException as e:  # la etapa que falla detiene al resto; el llamador re-lanza
+            errors.append(e)
+            stop.set()
+    return run
+
+def ingest_csv(
+    source,
+    *,
+    chunk_rows: Optional[int] = None,
+    queue_depth: Optional[int] = None,
+    skip_chunks: int = 0,
+    on_progress: Optional[Callable[[IngestSummary], None]] = None,
+    classify: Callable[[pd.DataFrame], tuple[pd.DataFrame, list[str], int]] = classify_frame,
+    write: Callable[[pd.DataFrame], WriteSummary] = upsert_frame,
+) -> IngestSummary:
+    """
+    Ingresa un CSV (ruta o archivo abierto) chunk a chunk. La escritura y `on_progress`
+    corren en el hilo llamador (seguro para actualizar Streamlit); lectura, normalización
+    y clasificación corren en hilos propios. Si una etapa falla, la excepción se re-lanza
+    aquí y lo ya guardado queda guardado (ver `IngestSummary.rows_written`).
+    `skip_chunks` retoma desde un checkpoint: saltea (sin procesar) los primeros chunks.
+    """
+    size = chunk_rows or INGEST_CHUNK_ROWS
+    depth = max(1, queue_depth or INGEST_QUEUE_DEPTH)
+    summary = IngestSummary()
+    stop = threading.Event()
+    errors: list[BaseException] = []
+    q_raw, q_norm, q_done = (queue.Queue(maxsize=depth) for _ in range(3))
+
+    total_bytes = getattr(source, "size", None)
+    if total_bytes is None and isinstance(source, (str, os.PathLike)):
+        total_bytes = os.path.getsize(source)
+
+    def read() -> Iterator[tuple[pd.DataFrame, Optional[float]]]:
+        skip = range(1, 1 + skip_chunks * size) if skip_chunks else None  # conserva el encabezado
+        with pd.read_csv(source, chunksize=size, skiprows=skip) as reader:
+            for chunk in reader:
+                pos = None
+                if total_bytes and hasattr(source, "tell"):
+                    try:
+                        pos = min(1.0, source.tell() / total_bytes)
+                    except (OSError, ValueError):
+                        pass
+                yield chunk, pos
+
+    def normalize(item):
+        chunk, pos = item
+        return ensure_min_columns(chunk), pos, len(chunk)
+
+    def classify_stage(item):
+        df, pos, n = item
+        out = classify(df)  # un `classify` inyectado puede devolver solo (df, fallas, ahorradas)
+        return (*out[:3], out[3] if len(out) > 3 else {}, pos, n)
+
+    threads = [
+        threading.Thread(target=_stage(read, None, q_raw, stop, errors), name="ingest-read", daemon=True),
+        threading.Thread(target=_stage(normalize, q_raw, q_norm, stop, errors), name="ingest-normalize", daemon=True),
+        threading.Thread(target=_stage(classify_stage, q_norm, q_done, stop, errors), name="ingest-classify", daemon=True),
+    ]
+    for t in threads:
+        t.start()
+    try:
+        while True:
+            try:
+                item = _get(q_done, stop)
+            except _Stop:
+                break
+            if item is _DONE:
+                break
+            df, failures, saved, usage, pos, n = item
+            ok = df[df["Sentimiento"] != "FALLO_GEMINI"]
+            if not ok.empty:
+                ws = write(ok)
+                summary.rows_written += ws.rows_written
+                summary.rows_write_failed += ws.rows_failed
+                failures = ws.errors + failures
+            summary.rows_read += n
+            summary.rows_failed += len(df) - len(ok)
+            summary.api_calls_saved += saved
+            for k in _USAGE_FIELDS:
+                setattr(summary, k, getattr(summary, k) + usage.get(k, 0))
+            summary.chunks += 1
+            summary.bytes_fraction = pos
+            room = MAX_FAILURE_DETAILS - len(summary.failure_details)
+            if room > 0:
+                summary.failure_details.extend(failures[:room])
+            if on_progress:
+                on_progress(summary)
+    finally:
+        stop.set()  # libera a las etapas si el llamador falló o se detuvo
+        for t in threads:
+            t.join(timeout=5)
+    if errors:
+        raise errors[0]
+    return summary
@@ -0,0 +1,317 @@
+# services/ingest_server.py
+"""
+Servicio HTTP local de ingesta en tiempo real (bot de Telegram, n8n, otros canales).
+
+Recibe reclamos de a uno y los agrupa en micro-lotes (por tamaño o ventana de tiempo);
+cada lote pasa por el mismo camino que la carga de CSV —ensure_min_columns ->
+classify_frame (casi-duplicados + paquetes a Gemini) -> upsert por lotes—, así que una
+ráfaga de N mensajes cuesta unas pocas peticiones al modelo, no N.
+
+Desde app/:
+    python -m services.ingest_server --port 8765
+
+    curl -X POST localhost:8765/reclamos -d '{"Det_reclamo": "llegó roto", "DNI": 12345678}'
+    curl -X POST 'localhost:8765/reclamos?wait=1' -d '{"Det_reclamo": "..."}'   # espera el resultado
+    curl localhost:8765/reclamos/<ticket>      # estado de un ticket
+    curl localhost:8765/stats                  # latencias p50/p90/p99, lotes, cola
+"""
+import os, json
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+from urllib.parse import parse_qs, urlparse
+
+from dotenv import load_dotenv
+
+# corre como proceso propio (no pasa por main.py): el .env tiene que estar cargado antes de leer INGEST_API_*
+load_dotenv()
+
+INGEST_API_BATCH_MAX = int(os.getenv("INGEST_API_BATCH_MAX", "50"))
+INGEST_API_BATCH_WAIT_MS = float(os.getenv("INGEST_API_BATCH_WAIT_MS", "500"))
+INGEST_API_QUEUE_MAX = int(os.getenv("INGEST_API_QUEUE_MAX", "5000"))     # más allá: 503 (backpressure)
+INGEST_API_BATCH_WORKERS = int(os.getenv("INGEST_API_BATCH_WORKERS", "2"))  # lotes procesándose a la vez
+INGEST_API_WAIT_S = float(os.getenv("INGEST_API_WAIT_S", "60"))            # tope de ?wait=1
+INGEST_API_TOKEN = os.getenv("INGEST_API_TOKEN", "")                       # si se define: Authorization: Bearer
+_MAX_TICKETS = 20000
+_MAX_LATENCIES = 10000
+_MAX_BODY = 64 * 1024
+
+QUEUED, STORED, FAILED = "queued", "stored", "failed"
+
+@dataclass
+class Ticket:
+    id: str
+    payload: dict
+    received: float                         # time.monotonic() al recibirlo
+    status: str = QUEUED
+    result: dict = field(default_factory=dict)
+    error: str = ""
+    done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def to_dict(self) -> dict:
+        return {"ticket": self.id, "status": self.status, **self.result, **({"error": self.error} if self.error else {})}
+
+# process(lote de payloads) -> [(resultado, error)] en el mismo orden; error != "" = no guardado
+BatchFn = Callable[[list[dict]], list[tuple[dict, str]]]
+
+def process_batch(payloads: list[dict]) -> list[tuple[dict, str]]:
+    """Normaliza, clasifica y guarda un micro-lote con el pipeline de la carga de CSV."""
+    import pandas as pd
+
+    from services.ingest_pipeline import classify_frame, upsert_frame
+    from services.reclamos_schema import ensure_min_columns, ksid_series
+
+    df = ensure_min_columns(pd.DataFrame(payloads))
+    # mismo DNI dos veces en el mismo segundo -> mismo Id_reclamo: el upsert del lote fallaría
+    dup = df["Id_reclamo"].duplicated(keep="first")
+    if dup.any():
+        df.loc[dup, "Id_reclamo"] = ksid_series("R", int(dup.sum())).to_numpy()
+    df, failures, *_ = classify_frame(df)
+    failures = iter(failures)  # un detalle por fila FALLO_GEMINI, en orden
+    ok = df["Sentimiento"] != "FALLO_GEMINI"
+    write_errors, not_written = "", set()
+    if ok.any():
+        ws = upsert_frame(df[ok])
+        not_written = {r.get("Id_reclamo") for r in ws.failed_records}
+        write_errors = "; ".join(ws.errors)[:500]
+
+    out = []
+    for row, is_ok in zip(df.to_dict(orient="records"), ok):
+        result = {"Id_reclamo": row["Id_reclamo"], "Id_chat": row["Id_chat"],
+                  "Sentimiento": row["Sentimiento"], "Clasificacion": row["Clasificacion"]}
+        if not is_ok:
+            out.append((result, next(failures, "Falló la clasificación con Gemini.")))
+        elif row["Id_reclamo"] in not_written:
+            out.append((result, f"No se pudo guardar en Supabase: {write_errors}"))
+        else:
+            out.append((result, ""))
+    return out
+
+def _percentile(sorted_vals: list[float], p: float) -> Optional[float]:
+    if not sorted_vals:
+        return None
+    k = min(len(sorted_vals) - 1, max(0, round(p / 100 * (len(sorted_vals) - 1))))
+    return sorted_vals[k]
+
+class MicroBatcher:
+    """
+    Cola acotada + hilo recolector: un lote se despacha al juntar `batch_max` reclamos o
+    al cumplirse `wait_ms` desde el primero. Los lotes se procesan en un pool propio, así
+    que mientras uno se clasifica el siguiente ya se está juntando. Solo se junta un lote
+    cuando hay un worker libre: con todos ocupados los mensajes esperan en la cola acotada
+    (los lotes siguientes salen más grandes y, si se llena, el servidor responde 503).
+    """
+
+    def __init__(self, process: BatchFn = process_batch, *, batch_max: int = INGEST_API_BATCH_MAX,
+                 wait_ms: float = INGEST_API_BATCH_WAIT_MS, queue_max: int = INGEST_API_QUEUE_MAX,
+                 workers: int = INGEST_API_BATCH_WORKERS):
+        self.process = process
+        self.batch_max, self.wait_s = max(1, batch_max), max(0.0, wait_ms) / 1000
+        self._q: queue.Queue = queue.Queue(maxsize=max(1, queue_max))
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="ingest-batch")
+        self._slots = threading.Semaphore(max(1, workers))
+        self._tickets: OrderedDict[str, Ticket] = OrderedDict()
+        self._latencies: deque = deque(maxlen=_MAX_LATENCIES)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.received = self.stored = self.failed = self.rejected = self.batches = 0
+        self._started = time.monotonic()
+        self._collector = threading.Thread(target=self._collect, name="ingest-collector", daemon=True)
+        self._collector.start()
+
+    def submit(self, payload: dict) -> Optional[Ticket]:
+        """Encola un reclamo; None si la cola está llena (el llamador responde 503)."""
+        ticket = Ticket(uuid.uuid4().hex, payload, time.monotonic())
+        try:
+            self._q.put_nowait(ticket)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            return None
+        with self._lock:
+            self.received += 1
+            self._tickets[ticket.id] = ticket
+            while len(self._tickets) > _MAX_TICKETS:
+                self._tickets.popitem(last=False)
+        return ticket
+
+    def get(self, ticket_id: str) -> Optional[Ticket]:
+        with self._lock:
+            return self._tickets.get(ticket_id)
+
+    def _collect(self) -> None:
+        while not self._stop.is_set():
+            if not self._slots.acquire(timeout=0.2):
+                continue
+            try:
+                first = self._q.get(timeout=0.2)
+            except queue.Empty:
+                self._slots.release()
+                continue
+            batch, deadline = [first], time.monotonic() + self.wait_s
+            while len(batch) < self.batch_max:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                try:
+                    batch.append(self._q.get(timeout=left))
+                except queue.Empty:
+                    break
+            self._pool.submit(self._run, batch)
+
+    def _run(self, batch: list[Ticket]) -> None:
+        try:
+            outs = self.process([t.payload for t in batch])
+        except Exception as e:  # p. ej. cuota de Gemini agotada: todo el lote vuelve como fallido
+            outs = [({}, f"{type(e).__name__}: {e}")] * len(batch)
+        finally:
+            self._slots.release()
+        now = time.monotonic()
+        with self._lock:
+            self.batches += 1
+            for t, (result, error) in zip(batch, outs):
+                t.result, t.error = result, error
+                t.status = FAILED if error else STORED
+                self.stored += not error
+                self.failed += bool(error)
+                self._latencies.append(now - t.received)
+        for t in batch:
+            t.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lat = sorted(self._latencies)
+            elapsed = time.monotonic() - self._started
+            out = {
+                "received": self.received, "stored": self.stored, "failed": self.failed,
+                "rejected": self.rejected, "queued": self._q.qsize(), "batches": self.batches,
+                "avg_batch": round((self.stored + self.failed) / self.batches, 2) if self.batches else 0.0,
+                "per_s": round((self.stored + self.failed) / elapsed, 2) if elapsed else 0.0,
+            }
+        for p in (50, 90, 99):
+            v = _percentile(lat, p)
+            out[f"latency_p{p}_ms"] = round(v * 1000, 1) if v is not None else None
+        return out
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Deja de juntar lotes y espera a que terminen los que están en curso."""
+        self._stop.set()
+        self._collector.join(timeout=timeout)
+        self._pool.shutdown(wait=True)
+
+def _payload(body: dict) -> dict:
+    """Valida el JSON recibido y le pone la fecha de llegada (se usa para Id_reclamo)."""
+    det = body.get("Det_reclamo") or body.get("mensaje") or body.get("text")
+    if not isinstance(det, str) or not det.strip():
+        raise ValueError("Falta 'Det_reclamo' (texto del reclamo).")
+    out = {"Det_reclamo": det.strip(), "DNI": body.get("DNI"), "Id_chat": body.get("Id_chat"),
+           "Fecha": datetime.now(timezone.utc).isoformat()}
+    if body.get("Id_reclamo"):
+        out["Id_reclamo"] = body["Id_reclamo"]
+    return out
+
+def make_handler(batcher: MicroBatcher, token: str = INGEST_API_TOKEN):
+    class Handler(BaseHTTPRequestHandler):
+        server_version = "ReclamosIngest/1.0"
+        protocol_version = "HTTP/1.1"  # keep-alive: el bot reutiliza la conexión entre mensajes
+
+        def _send(self, code: int, data: dict) -> None:
+            body = json.dumps(data, ensure_ascii=False, default=str).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _authorized(self) -> bool:
+            if token and self.headers.get("Authorization", "") != f"Bearer {token}":
+                self._send(401, {"error": "No autorizado."})
+                return False
+            return True
+
+        def do_GET(self):
+            path = urlparse(self.path).path.rstrip("/")
+            if path == "/health":
+                return self._send(200, {"ok": True})
+            if not self._authorized():
+                return
+            if path == "/stats":
+                return self._send(200, batcher.stats())
+            if path.startswith("/reclamos/"):
+                t = batcher.get(path.rsplit("/", 1)[-1])
+                return self._send(200, t.to_dict()) if t else self._send(404, {"error": "Ticket desconocido."})
+            self._send(404, {"error": "Ruta desconocida."})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path.rstrip("/") != "/reclamos":
+                return self._send(404, {"error": "Ruta desconocida."})
+            if not self._authorized():
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            if length <= 0 or length > _MAX_BODY:
+                self.close_connection = True  # el cuerpo no se leyó: la conexión no es reutilizable
+                return self._send(400, {"error": f"Cuerpo vacío o mayor a {_MAX_BODY} bytes."})
+            try:
+                body = json.loads(self.rfile.read(length))
+                payload = _payload(body if isinstance(body, dict) else {})
+            except ValueError as e:
+                return self._send(400, {"error": str(e)})
+            ticket = batcher.submit(payload)
+            if ticket is None:
+                self.send_response(503)
+                self.send_header("Retry-After", "1")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if parse_qs(url.query).get("wait", ["0"])[0] in ("1", "true"):
+                ticket.done.wait(INGEST_API_WAIT_S)
+                code = {STORED: 201, FAILED: 502}.get(ticket.status, 202)
+                return self._send(code, ticket.to_dict())
+            self._send(202, ticket.to_dict())
+
+        def log_message(self, fmt, *args):  # sin una línea por petición en ráfagas
+            pass
+
+    return Handler
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # backlog de listen(): con el default (5) las ráfagas reciben RST
+
+def serve(host: str = "127.0.0.1", port: int = 8765, batcher: Optional[MicroBatcher] = None,
+          token: Optional[str] = None) -> ThreadingHTTPServer:
+    """Crea el servidor (sin bloquear); llamar .serve_forever() o correrlo en un hilo."""
+    batcher = batcher or MicroBatcher()
+    httpd = _Server((host, port), make_handler(batcher, token=INGEST_API_TOKEN if token is None else token))
+    httpd.batcher = batcher
+    return httpd
+
+def main():
+    import argparse
+
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default=os.getenv("INGEST_API_HOST", "127.0.0.1"))
+    ap.add_argument("--port", type=int, default=int(os.getenv("INGEST_API_PORT", "8765")))
+    args = ap.parse_args()
+    httpd = serve(args.host, args.port, token=INGEST_API_TOKEN)
+    print(f"Ingesta en http://{args.host}:{args.port} (lotes de hasta {httpd.batcher.batch_max} "
+          f"o {httpd.batcher.wait_s * 1000:.0f} ms)" + (" · con token" if INGEST_API_TOKEN else ""))
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        httpd.batcher.close()
+        print(json.dumps(httpd.batcher.stats(), ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
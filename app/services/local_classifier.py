@@ -0,0 +1,268 @@
+# services/local_classifier.py
+"""
+Clasificador local (naive Bayes multinomial) entrenado con la tabla `reclamos`.
+Responde en microsegundos los casos de alta confianza; el resto sigue a Gemini.
+
+Entrenamiento periódico (cron / tarea programada), desde app/:
+    python -m services.local_classifier --train
+"""
+import os, json
+import logging
+import math
+import random
+import threading
+import time
+from collections import Counter
+from typing import Optional, Sequence
+
+from services.near_duplicates import dedup_key
+
+LOCAL_CLF_ENABLED = os.getenv("LOCAL_CLF_ENABLED", "true").strip().lower() not in ("0", "false", "no")
+LOCAL_CLF_PATH = os.getenv("LOCAL_CLF_PATH", ".cache/local_classifier.json")
+# Probabilidad mínima (en AMBAS etiquetas) para responder sin llamar a Gemini
+LOCAL_CLF_THRESHOLD = float(os.getenv("LOCAL_CLF_THRESHOLD", "0.97"))
+LOCAL_CLF_RETRAIN_HOURS = float(os.getenv("LOCAL_CLF_RETRAIN_HOURS", "24"))
+# Espera tras un intento fallido o sin datos suficientes antes de volver a bajar la tabla
+LOCAL_CLF_RETRY_MINUTES = float(os.getenv("LOCAL_CLF_RETRY_MINUTES", "30"))
+LOCAL_CLF_MIN_ROWS = int(os.getenv("LOCAL_CLF_MIN_ROWS", "200"))
+LOCAL_CLF_MAX_ROWS = int(os.getenv("LOCAL_CLF_MAX_ROWS", "50000"))
+
+TABLE_NAME = "reclamos"
+_PAGE = 1000
+_SENTIMIENTOS = ("positivo", "neutral", "negativo")
+_log = logging.getLogger(__name__)
+
+def tokens(texto: str) -> list[str]:
+    """Palabras normalizadas + bigramas (para capturar negaciones como 'no me')."""
+    words = dedup_key(texto).split()
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+class NaiveBayes:
+    """NB multinomial con suavizado de Laplace; predict devuelve (etiqueta, probabilidad)."""
+
+    def __init__(self, alpha: float = 1.0):
+        self.alpha = alpha
+        self.priors: dict[str, float] = {}
+        self.loglik: dict[str, dict[str, float]] = {}
+        self.unseen: dict[str, float] = {}
+
+    def fit(self, docs: Sequence[list[str]], labels: Sequence[str]) -> "NaiveBayes":
+        class_docs = Counter(labels)
+        counts: dict[str, Counter] = {c: Counter() for c in class_docs}
+        for toks, c in zip(docs, labels):
+            counts[c].update(toks)
+        vocab = set().union(*counts.values()) if counts else set()
+        v = len(vocab) or 1
+        n = sum(class_docs.values())
+        self.priors = {c: math.log(k / n) for c, k in class_docs.items()}
+        self.loglik, self.unseen = {}, {}
+        for c, cnt in counts.items():
+            denom = sum(cnt.values()) + self.alpha * v
+            self.loglik[c] = {t: math.log((k + self.alpha) / denom) for t, k in cnt.items()}
+            self.unseen[c] = math.log(self.alpha / denom)
+        self._vocab = vocab
+        return self
+
+    def predict(self, toks: list[str]) -> tuple[str, float]:
+        # tokens fuera del vocabulario no aportan evidencia: se ignoran
+        known = [t for t in toks if t in self._vocab]
+        scores = {c: prior + sum(self.loglik[c].get(t, self.unseen[c]) for t in known)
+                  for c, prior in self.priors.items()}
+        best = max(scores, key=scores.get)
+        if not known:
+            return best, 0.0  # solo el prior: nunca es un caso "seguro"
+        z = sum(math.exp(s - scores[best]) for s in scores.values())
+        return best, 1.0 / z
+
+    def to_dict(self) -> dict:
+        return {"alpha": self.alpha, "priors": self.priors, "loglik": self.loglik, "unseen": self.unseen}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "NaiveBayes":
+        nb = cls(d["alpha"])
+        nb.priors, nb.loglik, nb.unseen = d["priors"], d["loglik"], d["unseen"]
+        nb._vocab = set().union(*(set(v) for v in nb.loglik.values())) if nb.loglik else set()
+        return nb
+
+class LocalClassifier:
+    """Dos cabezas NB (Sentimiento, Clasificacion) + métricas del último entrenamiento."""
+
+    def __init__(self, sent: NaiveBayes, clas: NaiveBayes, metrics: Optional[dict] = None,
+                 trained_at: Optional[float] = None):
+        self.sent, self.clas = sent, clas
+        self.metrics = metrics or {}
+        self.trained_at = trained_at or time.time()
+        self.answered = 0   # textos resueltos localmente
+        self.asked = 0      # textos consultados al fast-path
+
+    @classmethod
+    def fit(cls, rows: Sequence[dict]) -> "LocalClassifier":
+        docs = [tokens(r["Det_reclamo"]) for r in rows]
+        return cls(NaiveBayes().fit(docs, [r["Sentimiento"] for r in rows]),
+                   NaiveBayes().fit(docs, [r["Clasificacion"] for r in rows]))
+
+    def predict(self, texto: str) -> tuple[dict, float]:
+        """Devuelve (pred, confianza); la confianza es la menor de las dos cabezas."""
+        toks = tokens(texto)
+        s, ps = self.sent.predict(toks)
+        c, pc = self.clas.predict(toks)
+        return {"Sentimiento": s, "Clasificacion": c}, min(ps, pc)
+
+    def predict_many(self, texts: Sequence[str], threshold: float = LOCAL_CLF_THRESHOLD) -> list[Optional[dict]]:
+        """Predicción por texto si supera `threshold`; None = incierto (va a Gemini)."""
+        out = []
+        for t in texts:
+            if not t or not str(t).strip():
+                out.append(None)
+                continue
+            pred, conf = self.predict(str(t))
+            out.append(pred if conf >= threshold else None)
+        self.asked += len(out)
+        self.answered += sum(p is not None for p in out)
+        return out
+
+    def save(self, path: str = LOCAL_CLF_PATH) -> None:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"sent": self.sent.to_dict(), "clas": self.clas.to_dict(),
+                       "metrics": self.metrics, "trained_at": self.trained_at}, f, ensure_ascii=False)
+        os.replace(tmp, path)  # escritura atómica: otros procesos nunca ven un archivo a medias
+
+    @classmethod
+    def load(cls, path: str = LOCAL_CLF_PATH) -> Optional["LocalClassifier"]:
+        try:
+            with open(path, encoding="utf-8") as f:
+                d = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return cls(NaiveBayes.from_dict(d["sent"]), NaiveBayes.from_dict(d["clas"]),
+                   d.get("metrics"), d.get("trained_at"))
+
+def evaluate(model: LocalClassifier, rows: Sequence[dict], threshold: float = LOCAL_CLF_THRESHOLD) -> dict:
+    """Cobertura del fast-path y acuerdo con las etiquetas de Gemini en `rows`."""
+    covered = agree = 0
+    for r in rows:
+        pred, conf = model.predict(r["Det_reclamo"])
+        if conf >= threshold:
+            covered += 1
+            agree += pred["Sentimiento"] == r["Sentimiento"] and pred["Clasificacion"] == r["Clasificacion"]
+    n = len(rows)
+    return {"holdout": n, "threshold": threshold,
+            "coverage": covered / n if n else 0.0,
+            "agreement": agree / covered if covered else 0.0}
+
+def _clean_rows(rows: Sequence[dict]) -> list[dict]:
+    out = []
+    for r in rows:
+        det = str(r.get("Det_reclamo") or "").strip()
+        sent = str(r.get("Sentimiento") or "").strip().lower()
+        clas = str(r.get("Clasificacion") or "").strip().lower()
+        if det and sent in _SENTIMIENTOS and clas and clas != "fallo_gemini":
+            out.append({"Det_reclamo": det, "Sentimiento": sent, "Clasificacion": clas})
+    return out
+
+def fetch_training_rows(max_rows: int = LOCAL_CLF_MAX_ROWS) -> list[dict]:
+    """Últimos `max_rows` reclamos etiquetados, paginados desde Supabase."""
+    from services.supabase_client import has_credentials, supabase  # perezoso: la inferencia no necesita Supabase
+
+    if not has_credentials():  # supabase() usaría st.error/st.stop, que fuera de un rerun no sirven
+        raise RuntimeError("faltan SUPABASE_URL / SUPABASE_SERVICE_KEY")
+    sb, rows = supabase(), []
+    while len(rows) < max_rows:
+        page = (sb.table(TABLE_NAME).select("Det_reclamo,Sentimiento,Clasificacion")
+                  .order("Fecha", desc=True)
+                  .range(len(rows), min(len(rows) + _PAGE, max_rows) - 1)
+                  .execute().data)
+        rows.extend(page)
+        if len(page) < _PAGE:
+            break
+    return rows
+
+def train(rows: Optional[Sequence[dict]] = None, *, holdout: float = 0.2,
+          threshold: float = LOCAL_CLF_THRESHOLD, path: str = LOCAL_CLF_PATH) -> Optional[LocalClassifier]:
+    """
+    Entrena con `rows` (o con Supabase), mide cobertura/acuerdo en un `holdout`
+    reservado y luego re-entrena con todo y guarda. None si no hay datos suficientes.
+    """
+    data = _clean_rows(fetch_training_rows() if rows is None else rows)
+    if len(data) < LOCAL_CLF_MIN_ROWS:
+        return None
+    shuffled = data[:]
+    random.Random(13).shuffle(shuffled)
+    cut = int(len(shuffled) * (1 - holdout))
+    metrics = evaluate(LocalClassifier.fit(shuffled[:cut]), shuffled[cut:], threshold)
+    metrics["train_rows"] = len(data)
+    model = LocalClassifier.fit(data)
+    model.metrics = metrics
+    model.save(path)
+    return model
+
+_model: Optional[LocalClassifier] = None
+_model_lock = threading.Lock()
+_retraining = threading.Event()
+_last_attempt = 0.0  # último re-entrenamiento lanzado (time.time())
+
+def _retrain_in_background() -> None:
+    global _model
+    try:
+        fresh = train()
+        if fresh is None:
+            _log.info("Clasificador local sin re-entrenar: menos de %d reclamos etiquetados; "
+                      "se reintenta en %.0f min", LOCAL_CLF_MIN_ROWS, _retry_s() / 60)
+        else:
+            with _model_lock:
+                _model = fresh
+    except Exception:
+        # se sigue con el modelo anterior (o sin modelo) hasta el próximo intento
+        _log.warning("Falló el re-entrenamiento del clasificador local; se reintenta en %.0f min",
+                     _retry_s() / 60, exc_info=True)
+    finally:
+        _retraining.clear()
+
+def _retry_s() -> float:
+    return min(LOCAL_CLF_RETRAIN_HOURS * 3600, LOCAL_CLF_RETRY_MINUTES * 60)
+
+def get_local_classifier() -> Optional[LocalClassifier]:
+    """
+    Modelo local vigente (None si está desactivado o aún no existe). Si el guardado
+    tiene más de LOCAL_CLF_RETRAIN_HOURS, dispara un re-entrenamiento en segundo
+    plano y mientras tanto sigue respondiendo con el anterior. Tras un intento sin
+    resultado espera LOCAL_CLF_RETRY_MINUTES antes de volver a bajar la tabla.
+    """
+    global _model, _last_attempt
+    if not LOCAL_CLF_ENABLED:
+        return None
+    with _model_lock:
+        if _model is None:
+            _model = LocalClassifier.load()
+        model = _model
+        now = time.time()
+        stale = model is None or now - model.trained_at > LOCAL_CLF_RETRAIN_HOURS * 3600
+        due = stale and not _retraining.is_set() and now - _last_attempt >= _retry_s()
+        if due:
+            _retraining.set()
+            _last_attempt = now
+    if due:
+        threading.Thread(target=_retrain_in_background, name="local-clf-train", daemon=True).start()
+    return model
+
+def main():
+    import argparse
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--train", action="store_true", help="Re-entrena desde Supabase y guarda el modelo.")
+    ap.add_argument("--threshold", type=float, default=LOCAL_CLF_THRESHOLD)
+    args = ap.parse_args()
+    model = train(threshold=args.threshold) if args.train else LocalClassifier.load()
+    if model is None:
+        raise SystemExit(f"Sin modelo: se necesitan al menos {LOCAL_CLF_MIN_ROWS} reclamos etiquetados.")
+    m = model.metrics
+    print(f"filas={m.get('train_rows')} umbral={m.get('threshold')} holdout={m.get('holdout')} "
+          f"cobertura={m.get('coverage', 0):.1%} acuerdo_con_gemini={m.get('agreement', 0):.1%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+# services/local_mirror.py
+"""
+Espejo local (opcional) de la tabla `reclamos` en Parquet particionado por día,
+consultado con DuckDB embebido. Sirve para análisis exploratorio sin cargar la base
+de producción; el dashboard de tab_feedback puede leer de aquí con un switch.
+
+Sincronización incremental (cron / tarea programada), desde app/:
+    python -m services.local_mirror --sync          # filas nuevas o modificadas (watermark por "Actualizado")
+    python -m services.local_mirror --sync --full   # re-descarga todo
+"""
+import os, json
+import glob
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo el lock entre hilos
+    fcntl = None
+
+import pandas as pd
+
+from services.reclamos_schema import TABLE_NAME
+
+MIRROR_DIR = os.getenv("MIRROR_DIR", ".cache/reclamos_mirror")
+MIRROR_ENABLED = os.getenv("MIRROR_ENABLED", "false").strip().lower() in ("1", "true", "yes")
+# margen hacia atrás de cada sync: un lote que confirma tarde lleva la marca de inicio de su transacción
+MIRROR_LOOKBACK_S = float(os.getenv("MIRROR_LOOKBACK_S", "300"))
+_WATERMARK_COL = "Actualizado"  # última modificación, mantenida por trigger (sql/setup.sql)
+_PAGE = 1000
+_STATE_FILE = "_state.json"
+_sync_lock = threading.Lock()  # mismo proceso; entre procesos (cron + UI), el archivo .lock
+
+class MirrorError(Exception):
+    pass
+
+def _duckdb():
+    try:
+        import duckdb
+    except ImportError as e:
+        raise MirrorError("El espejo local requiere el paquete 'duckdb' (pip install duckdb).") from e
+    return duckdb
+
+def _state_path(root: str) -> str:
+    return os.path.join(root, _STATE_FILE)
+
+def load_state(root: str = MIRROR_DIR) -> dict:
+    try:
+        with open(_state_path(root), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"watermark": None, "seen": {}, "rows": 0, "synced_at": None}
+
+def _save_state(root: str, state: dict) -> None:
+    tmp = _state_path(root) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, _state_path(root))
+
+@contextmanager
+def _locked(root: str):
+    """Excluye otros sync sobre el mismo espejo, también desde otro proceso (cron --sync y la UI)."""
+    with _sync_lock:
+        if fcntl is None:
+            yield
+            return
+        # junto a la carpeta, no adentro: --full la borra con el lock tomado
+        lock_path = os.path.abspath(root).rstrip(os.sep) + ".lock"
+        os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+        with open(lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def _fetch_since(since: Optional[str]) -> list[dict]:
+    from services.supabase_client import supabase
+
+    rows = []
+    while True:
+        q = supabase().table(TABLE_NAME).select("*")
+        if since:
+            q = q.gte(_WATERMARK_COL, since)
+        q = q.order(_WATERMARK_COL).order("Id_reclamo")
+        try:
+            page = q.range(len(rows), len(rows) + _PAGE - 1).execute().data
+        except Exception as e:
+            if str(getattr(e, "code", "") or "") == "42703":  # undefined_column
+                raise MirrorError(f'Falta la columna "{_WATERMARK_COL}" en {TABLE_NAME}: '
+                                  "ejecutar sql/setup.sql.") from e
+            raise
+        rows.extend(page)
+        if len(page) < _PAGE:
+            return rows
+
+def _write_partitions(root: str, df: pd.DataFrame) -> None:
+    """Un archivo Parquet nuevo por día presente en `df` (los existentes no se reescriben)."""
+    duckdb = _duckdb()
+    con = duckdb.connect()
+    try:
+        for dia, part in df.groupby("dia"):
+            folder = os.path.join(root, f"dia={dia}")
+            os.makedirs(folder, exist_ok=True)
+            target = os.path.join(folder, f"part-{uuid.uuid4().hex}.parquet")
+            con.register("part_df", part.drop(columns=["dia"]))
+            con.execute(f"COPY (SELECT * FROM part_df) TO '{target}' (FORMAT PARQUET)")
+            con.unregister("part_df")
+    finally:
+        con.close()
+
+def sync(root: str = MIRROR_DIR, *, full: bool = False) -> dict:
+    """
+    Trae de Supabase las filas con "Actualizado" >= watermark - MIRROR_LOOKBACK_S (todas
+    si `full`), descarta las versiones ya copiadas y agrega el resto como nuevos archivos
+    por día; la vista de consulta se queda con la última versión de cada Id_reclamo, así
+    que las reclasificaciones reemplazan a la fila anterior. Devuelve el estado
+    actualizado (watermark, filas totales, filas nuevas o modificadas).
+    """
+    with _locked(root):
+        if full and os.path.isdir(root):
+            shutil.rmtree(root)
+        os.makedirs(root, exist_ok=True)
+        state = load_state(root)
+        wm = state.get("watermark")
+        since = (pd.Timestamp(wm) - pd.Timedelta(seconds=MIRROR_LOOKBACK_S)).isoformat() if wm else None
+        # versiones ya copiadas dentro de la ventana: Id_reclamo -> "Actualizado" (un estado viejo trae una lista)
+        seen = state.get("seen") if isinstance(state.get("seen"), dict) else {}
+        rows = _fetch_since(since)
+        new = [r for r in rows if seen.get(r.get("Id_reclamo")) != r.get(_WATERMARK_COL)]
+        if new:
+            df = pd.DataFrame(new)
+            df["Fecha"] = pd.to_datetime(df["Fecha"], utc=True)
+            df["dia"] = df["Fecha"].dt.strftime("%Y-%m-%d")
+            df["_synced_at"] = pd.Timestamp.utcnow()
+            _write_partitions(root, df)
+            state["rows"] = int(_query("SELECT count(*) AS n FROM reclamos", [], root)["n"].iloc[0])
+        if rows:
+            newest = max([pd.Timestamp(r[_WATERMARK_COL]) for r in rows] + ([pd.Timestamp(wm)] if wm else []))
+            cutoff = newest - pd.Timedelta(seconds=MIRROR_LOOKBACK_S)
+            seen.update((r["Id_reclamo"], r[_WATERMARK_COL]) for r in rows)
+            state["watermark"] = newest.isoformat()
+            state["seen"] = {k: v for k, v in seen.items() if pd.Timestamp(v) >= cutoff}
+        state["new_rows"] = len(new)
+        state["synced_at"] = time.time()
+        _save_state(root, state)
+        return state
+
+def _has_data(root: str) -> bool:
+    return bool(glob.glob(os.path.join(root, "dia=*", "*.parquet")))
+
+def _query(sql: str, params: list, root: str) -> pd.DataFrame:
+    """Ejecuta `sql` sobre la vista `reclamos` (última versión de cada Id_reclamo)."""
+    duckdb = _duckdb()
+    con = duckdb.connect()
+    try:
+        pattern = os.path.join(root, "dia=*", "*.parquet").replace("'", "''")
+        con.execute(f"""
+            CREATE VIEW reclamos AS
+            SELECT * EXCLUDE (dia, _synced_at)
+            FROM read_parquet('{pattern}', hive_partitioning = true, union_by_name = true)
+            QUALIFY row_number() OVER (PARTITION BY "Id_reclamo" ORDER BY _synced_at DESC) = 1
+        """)
+        return con.execute(sql, params).df()
+    finally:
+        con.close()
+
+def _where(sentiments: Optional[list], lo: Optional[str], hi: Optional[str]) -> tuple[str, list]:
+    conds, params = ["TRUE"], []
+    if sentiments:
+        conds.append(f'"Sentimiento" IN ({",".join("?" * len(sentiments))})')
+        params += list(sentiments)
+    if lo:
+        conds.append('"Fecha" >= CAST(? AS TIMESTAMPTZ)')
+        params.append(lo)
+    if hi:
+        conds.append('"Fecha" < CAST(? AS TIMESTAMPTZ)')
+        params.append(hi)
+    return " AND ".join(conds), params
+
+def summary(sentiments: Optional[list], lo: Optional[str], hi: Optional[str],
+            root: str = MIRROR_DIR) -> pd.DataFrame:
+    """Mismo resultado que reclamos_resumen (sql/setup.sql): dia, Clasificacion, Sentimiento, total."""
+    cols = ["dia", "Clasificacion", "Sentimiento", "total"]
+    if not _has_data(root):
+        return pd.DataFrame(columns=cols)
+    where, params = _where(sentiments, lo, hi)
+    df = _query(f"""
+        SELECT CAST(timezone('UTC', "Fecha") AS DATE) AS dia, "Clasificacion", "Sentimiento", count(*) AS total
+        FROM reclamos WHERE {where}
+        GROUP BY 1, 2, 3 ORDER BY 1
+    """, params, root)
+    df["dia"] = pd.to_datetime(df["dia"]).dt.date
+    df["total"] = df["total"].astype(int)
+    return df[cols]
+
+def page(sentiments: Optional[list], lo: Optional[str], hi: Optional[str], columns: list[str],
+         text: str = "", cursor: Optional[tuple] = None, size: int = 50,
+         root: str = MIRROR_DIR) -> list[dict]:
+    """Página por keyset (Fecha, Id_reclamo) descendente, igual que la tabla en Supabase (size+1 filas)."""
+    if not _has_data(root):
+        return []
+    where, params = _where(sentiments, lo, hi)
+    if text:
+        where += ' AND "Det_reclamo" ILIKE ?'
+        params.append(f"%{text}%")
+    if cursor:
+        where += (' AND ("Fecha" < CAST(? AS TIMESTAMPTZ)'
+                  ' OR ("Fecha" = CAST(? AS TIMESTAMPTZ) AND "Id_reclamo" < ?))')
+        params += [str(cursor[0]), str(cursor[0]), cursor[1]]
+    select = ", ".join(f'"{c}"' for c in columns)
+    df = _query(f"""
+        SELECT {select} FROM reclamos WHERE {where}
+        ORDER BY "Fecha" DESC, "Id_reclamo" DESC LIMIT {int(size) + 1}
+    """, params, root)
+    if "Fecha" in df.columns:
+        df["Fecha"] = pd.to_datetime(df["Fecha"], utc=True).map(lambda ts: ts.isoformat())
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+def main():
+    import argparse
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sync", action="store_true", help="Sincroniza filas nuevas desde Supabase.")
+    ap.add_argument("--full", action="store_true", help="Borra el espejo y lo re-descarga completo.")
+    ap.add_argument("--dir", default=MIRROR_DIR)
+    args = ap.parse_args()
+    t0 = time.perf_counter()
+    state = sync(args.dir, full=args.full) if args.sync else load_state(args.dir)
+    print(f"espejo={args.dir} filas={state.get('rows', 0)} nuevas={state.get('new_rows', 0)} "
+          f"watermark={state.get('watermark')} ({time.perf_counter() - t0:.1f}s)")
+
+if __name__ == "__main__":
+    main()
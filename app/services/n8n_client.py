@@ -2,14 +2,25 @@
 import base64
 import json
 import re
+import uuid
 from typing import Optional, Tuple
 import requests
 
+from services.image_prep import sniff_mime
+
 N8N_WEBHOOK_URL = os.getenv("N8N_WEBHOOK_URL")          # Webhook principal (POST)
 N8N_STATUS_URL  = os.getenv("N8N_STATUS_URL", "").strip()  # Endpoint GET/POST status?job_id=... (opcional)
+# Cómo viajan las imágenes al webhook:
+#   "base64"    -> campos de texto image1_base64/image2_base64 (flujo actual)
+#   "multipart" -> archivos binarios base_image/product_image (contrato de informacion_apis/Comentarios.md)
+N8N_TRANSPORT = os.getenv("N8N_TRANSPORT", "base64").strip().lower()
+_TRANSPORTS = ("base64", "multipart")
 
 class N8NClientError(Exception):
-    pass
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code   # HTTP devuelto por n8n, si hubo respuesta
+        self.retry_after = retry_after   # segundos pedidos por n8n (Retry-After), si los indicó
 
 _URL_RE = re.compile(r"https?://[^\s\"'<>]+", re.IGNORECASE)
 _UUID_RE = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[1-5][0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}", re.I)
@@ -17,6 +28,81 @@ _UUID_RE = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[1-5][0-9a-f]{3}-[89ab][0-9a-f]{
 def _b64(b: bytes) -> str:
     return base64.b64encode(b or b"").decode("utf-8")
 
+def _http_error(resp, message: str) -> N8NClientError:
+    """N8NClientError con el código HTTP y la espera pedida por n8n (Retry-After), si la hay."""
+    try:
+        hint = float(resp.headers.get("retry-after") or "")
+    except ValueError:
+        hint = None
+    return N8NClientError(message, resp.status_code, hint)
+
+class _MultipartBody:
+    """
+    Cuerpo multipart/form-data que se lee a trozos directamente de los bytes originales
+    (memoryview): no hay copia en base64 ni un cuerpo completo armado en memoria.
+    Tiene __len__, así que requests manda Content-Length en lugar de chunked.
+    """
+
+    def __init__(self, fields: dict, files: dict):
+        self.boundary = uuid.uuid4().hex
+        b = self.boundary
+        parts: list = []
+        for name, value in fields.items():
+            parts.append(f'--{b}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'.encode("utf-8"))
+            parts.append(str(value).encode("utf-8"))
+            parts.append(b"\r\n")
+        for name, (filename, data, mime) in files.items():
+            parts.append((f'--{b}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                          f"Content-Type: {mime}\r\n\r\n").encode("utf-8"))
+            parts.append(memoryview(data))
+            parts.append(b"\r\n")
+        parts.append(f"--{b}--\r\n".encode("utf-8"))
+        self._parts = parts
+        self._len = sum(len(p) for p in parts)
+        self._i = self._off = 0
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self) -> int:
+        return self._len
+
+    def read(self, n: int = -1) -> bytes:
+        if n is None or n < 0:
+            n = self._len
+        out = []
+        while n > 0 and self._i < len(self._parts):
+            part = self._parts[self._i]
+            chunk = part[self._off:self._off + n]
+            out.append(chunk)
+            n -= len(chunk)
+            self._off += len(chunk)
+            if self._off >= len(part):
+                self._i, self._off = self._i + 1, 0
+        return b"".join(out)
+
+def _file_part(name: str, data: bytes) -> tuple:
+    mime = sniff_mime(data)
+    return f"{name}.{mime.rsplit('/', 1)[-1].replace('jpeg', 'jpg')}", data, mime
+
+def _banner_request(image1_bytes: bytes, image2_bytes: bytes, prompt: str,
+                    transport: Optional[str] = None) -> dict:
+    """kwargs para requests.post según el transporte configurado (N8N_TRANSPORT o `transport`)."""
+    transport = (transport or N8N_TRANSPORT).strip().lower()
+    if transport not in _TRANSPORTS:
+        raise N8NClientError(f"N8N_TRANSPORT inválido: {transport!r} (usa {' o '.join(_TRANSPORTS)}).")
+    if transport == "multipart":
+        body = _MultipartBody({"prompt": (prompt or "").strip()},
+                              {"base_image": _file_part("base_image", image1_bytes),
+                               "product_image": _file_part("product_image", image2_bytes)})
+        return {"data": body, "headers": {"Content-Type": body.content_type}}
+    return {"files": {
+        "image1_base64": (None, _b64(image1_bytes)),
+        "image2_base64": (None, _b64(image2_bytes)),
+        "prompt":        (None, (prompt or "").strip()),
+    }}
+
 def _looks_like_json(text: str) -> bool:
     t = (text or "").strip()
     return (t.startswith("{") and t.endswith("}")) or (t.startswith("[") and t.endswith("]"))
@@ -66,24 +152,21 @@ def _extract_job_id(obj_or_text) -> Optional[str]:
     return None
 
 # ---------- 1) Modo síncrono: espera banner_url (requiere que el flujo termine) ----------
-def create_banner_with_two_images(*, image1_bytes: bytes, image2_bytes: bytes, prompt: str, timeout: int = 220) -> str:
+def create_banner_with_two_images(*, image1_bytes: bytes, image2_bytes: bytes, prompt: str, timeout: int = 220,
+                                  transport: Optional[str] = None) -> str:
     if not N8N_WEBHOOK_URL:
         raise N8NClientError("Falta N8N_WEBHOOK_URL en entorno.")
     if not image1_bytes or not image2_bytes:
         raise N8NClientError("Ambas imágenes son obligatorias.")
 
-    files = {
-        "image1_base64": (None, _b64(image1_bytes)),
-        "image2_base64": (None, _b64(image2_bytes)),
-        "prompt":        (None, (prompt or "").strip()),
-    }
+    body = _banner_request(image1_bytes, image2_bytes, prompt, transport)
     try:
-        resp = requests.post(N8N_WEBHOOK_URL, files=files, timeout=timeout)
+        resp = requests.post(N8N_WEBHOOK_URL, timeout=timeout, **body)
         ct = (resp.headers.get("content-type") or "").lower()
         text = resp.text
         resp.raise_for_status()
     except requests.HTTPError:
-        raise N8NClientError(f"HTTP {resp.status_code} desde n8n. Cuerpo: {text[:400]}")
+        raise _http_error(resp, f"HTTP {resp.status_code} desde n8n. Cuerpo: {text[:400]}")
     except requests.RequestException as e:
         raise N8NClientError(f"Error de red llamando a n8n: {e}") from e
 
@@ -106,22 +189,21 @@ def create_banner_with_two_images(*, image1_bytes: bytes, image2_bytes: bytes, p
     return url
 
 # ---------- 2) Modo asíncrono: devuelve job_id rápidamente ----------
-def start_banner_job(*, image1_bytes: bytes, image2_bytes: bytes, prompt: str, timeout: int = 120) -> str:
+def start_banner_job(*, image1_bytes: bytes, image2_bytes: bytes, prompt: str, timeout: int = 120,
+                     transport: Optional[str] = None) -> str:
     """
     Usa el mismo Webhook pero asumiendo que tu flujo responde de inmediato con {job_id: "..."}.
     """
     if not N8N_WEBHOOK_URL:
         raise N8NClientError("Falta N8N_WEBHOOK_URL en entorno.")
-    files = {
-        "image1_base64": (None, _b64(image1_bytes)),
-        "image2_base64": (None, _b64(image2_bytes)),
-        "prompt":        (None, (prompt or "").strip()),
-    }
+    body = _banner_request(image1_bytes, image2_bytes, prompt, transport)
     try:
-        resp = requests.post(N8N_WEBHOOK_URL, files=files, timeout=timeout)
+        resp = requests.post(N8N_WEBHOOK_URL, timeout=timeout, **body)
         text = resp.text
         ct = (resp.headers.get("content-type") or "").lower()
         resp.raise_for_status()
+    except requests.HTTPError:
+        raise _http_error(resp, f"Error iniciando job en n8n: HTTP {resp.status_code}. Cuerpo: {text[:400]}")
     except requests.RequestException as e:
         raise N8NClientError(f"Error iniciando job en n8n: {e}") from e
 
@@ -140,20 +222,32 @@ def start_banner_job(*, image1_bytes: bytes, image2_bytes: bytes, prompt: str, t
     return job_id
 
 # ---------- 3) Consultar estado (endpoint en n8n o lo que configures) ----------
+_DONE_STATUSES = ("done", "ok", "success", "completed", "finished")
+
 def fetch_status(job_id: str, timeout: int = 10) -> Tuple[Optional[str], Optional[str]]:
     """
-    Devuelve (status, banner_url) si N8N_STATUS_URL está configurado y responde.
+    Devuelve (status, banner_url) consultando N8N_STATUS_URL.
     Espera un JSON tipo: {"status":"queued|processing|done|error", "banner_url":"https://..."}.
+    Lanza N8NClientError si no está configurado o la consulta falla (con status_code y
+    retry_after cuando n8n los da): quien hace el polling decide si reintenta.
     """
     if not N8N_STATUS_URL:
-        return None, None
+        raise N8NClientError("Falta N8N_STATUS_URL: no se puede consultar el estado del job.")
     try:
-        
         r = requests.get(N8N_STATUS_URL, params={"job_id": job_id}, timeout=timeout)
         r.raise_for_status()
+    except requests.HTTPError as e:
+        raise _http_error(r, f"HTTP {r.status_code} consultando el job {job_id}: {r.text[:200]}") from e
+    except requests.RequestException as e:
+        raise N8NClientError(f"Error de red consultando el job {job_id}: {e}") from e
+
+    try:
         data = r.json() if "json" in (r.headers.get("content-type") or "") else {}
-        status = (data or {}).get("status")
-        url = (data or {}).get("banner_url")
-        return status, url
-    except Exception:
-        return None, None
+    except ValueError:
+        data = {}
+    data = data if isinstance(data, dict) else {}
+    status = data.get("status")
+    url = data.get("banner_url")
+    if not url and str(status or "").lower() in _DONE_STATUSES:
+        url = _extract_url_from_json(data)  # otras claves conocidas (url_final, image_url…)
+    return status, url
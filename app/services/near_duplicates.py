@@ -0,0 +1,164 @@
+# services/near_duplicates.py
+import os
+import re
+import unicodedata
+import zlib
+from array import array
+from dataclasses import dataclass, field
+from typing import Sequence
+
+# Pre-pase local de casi-duplicados: solo un representante por grupo llega a Gemini.
+# Jaccard mínimo entre shingles para considerar dos reclamos "iguales" (<= 0 desactiva el pre-pase).
+DEDUP_THRESHOLD = float(os.getenv("CLASSIFY_DEDUP_THRESHOLD", "0.9"))
+
+SHINGLE_SIZE = 4       # shingles de 4 caracteres sobre el texto normalizado
+_NUM_BINS = 32         # largo de la firma (one-permutation hashing)
+_BANDS = 8             # LSH: 8 bandas x 4 filas -> candidatos desde Jaccard ~0.6
+_ROWS = _NUM_BINS // _BANDS
+_EMPTY = 0xFFFFFFFF
+_PUNCT_RE = re.compile(r"[^\w\s]+")
+# Palabras que invierten o fijan la polaridad: "me gustó" y "no me gustó" comparten casi todos
+# los shingles, así que dos textos solo se agrupan si tienen exactamente las mismas (sin tildes)
+_POLARITY_WORDS = frozenset({
+    "no", "ni", "nunca", "jamas", "tampoco", "sin", "nada", "nadie", "ningun", "ninguno", "ninguna",
+    "si", "bien", "mal", "bueno", "buena", "malo", "mala", "mejor", "peor", "excelente", "pesimo", "pesima",
+})
+
+def dedup_key(texto: str) -> str:
+    """Forma canónica para agrupar: sin tildes, minúsculas, sin puntuación y espacios colapsados."""
+    t = str(texto or "")
+    if not t.isascii():
+        t = "".join(ch for ch in unicodedata.normalize("NFKD", t) if not unicodedata.combining(ch))
+    t = t.casefold()
+    return " ".join(_PUNCT_RE.sub(" ", t).split())
+
+def _polarity(key: str) -> tuple[str, ...]:
+    return tuple(sorted(w for w in key.split() if w in _POLARITY_WORDS))
+
+def _shingle_hashes(key: str) -> set[int]:
+    if len(key) <= SHINGLE_SIZE:
+        return {zlib.crc32(key.encode("utf-8"))}
+    data = key.encode("utf-8")
+    return {zlib.crc32(data[i:i + SHINGLE_SIZE]) for i in range(len(data) - SHINGLE_SIZE + 1)}
+
+def _jaccard(a: set[int], b: set[int]) -> float:
+    if not a and not b:
+        return 1.0
+    inter = len(a & b) if len(a) <= len(b) else len(b & a)
+    return inter / (len(a) + len(b) - inter)
+
+def _signature(hashes: set[int]) -> array:
+    """
+    MinHash de una sola permutación (un hash por shingle, mínimo por bin) con
+    densificación por rotación para bins vacíos: O(#shingles) por texto.
+    """
+    sig = array("I", [_EMPTY]) * _NUM_BINS
+    for h in hashes:
+        h = (h * 0x9E3779B1) & 0xFFFFFFFF  # mezcla multiplicativa: crc32 solo no reparte bien
+        b, v = h % _NUM_BINS, h // _NUM_BINS
+        if v < sig[b]:
+            sig[b] = v
+    if _EMPTY in sig:
+        filled = [i for i in range(_NUM_BINS) if sig[i] != _EMPTY]
+        if filled:
+            dense = array("I", sig)
+            for i in range(_NUM_BINS):
+                if sig[i] == _EMPTY:
+                    j = next((f for f in filled if f > i), filled[0])
+                    dist = (j - i) % _NUM_BINS
+                    dense[i] = (sig[j] + dist * 0x01000193) & 0x7FFFFFFF
+            sig = dense
+    return sig
+
+class _UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, x: int) -> int:
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a: int, b: int) -> None:
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # el menor índice queda como raíz -> representante = primera aparición
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+@dataclass
+class DedupPlan:
+    """Resultado del pre-pase: qué textos clasificar y a quién copiarle cada etiqueta."""
+    rep_of: list[int]                       # para cada texto, índice de su representante
+    representatives: list[int] = field(default_factory=list)
+    exact_groups: int = 0                   # grupos idénticos tras normalizar
+    threshold: float = DEDUP_THRESHOLD
+
+    @property
+    def total(self) -> int:
+        return len(self.rep_of)
+
+    @property
+    def saved(self) -> int:
+        """Llamadas a la API que se evitan (textos que heredan la etiqueta)."""
+        return self.total - len(self.representatives)
+
+    def fan_out(self, rep_results: Sequence) -> list:
+        """Expande los resultados de `representatives` (mismo orden) a todos los textos."""
+        by_rep = dict(zip(self.representatives, rep_results))
+        return [by_rep[r] for r in self.rep_of]
+
+def plan_near_duplicates(texts: Sequence[str], threshold: float | None = None) -> DedupPlan:
+    """
+    Agrupa reclamos casi idénticos (tildes, mayúsculas, espacios, una o dos palabras), siempre
+    que tengan las mismas palabras de negación/polaridad ("no", "nunca", "sin", "mal"...).
+    1) Agrupación exacta por `dedup_key`.
+    2) Sobre las llaves únicas: firmas MinHash + LSH por bandas; cada candidato se compara
+       (Jaccard exacto de shingles) solo contra el primer texto de su cubeta, así el costo
+       es lineal aun con cubetas grandes.
+    El representante de cada grupo es su primera aparición en `texts`.
+    """
+    thr = DEDUP_THRESHOLD if threshold is None else threshold
+    n = len(texts)
+    if thr <= 0:
+        return DedupPlan(rep_of=list(range(n)), representatives=list(range(n)), threshold=thr)
+
+    first_by_key: dict[str, int] = {}
+    key_of = []
+    for i, t in enumerate(texts):
+        k = dedup_key(t)
+        first_by_key.setdefault(k, i)
+        key_of.append(k)
+    uniq = list(first_by_key.items())          # [(key, primer índice)] en orden de aparición
+    uf = _UnionFind(len(uniq))
+
+    if thr < 1 and len(uniq) > 1:
+        hashes = [_shingle_hashes(k) for k, _ in uniq]
+        polarity = [_polarity(k) for k, _ in uniq]
+        leaders: list[dict[bytes, int]] = [dict() for _ in range(_BANDS)]
+        for u, hs in enumerate(hashes):
+            if not uniq[u][0]:
+                continue  # los vacíos no se mezclan con nada (ya se agruparon entre sí)
+            sig = _signature(hs)
+            tested = set()
+            for band in range(_BANDS):
+                bucket = sig[band * _ROWS:(band + 1) * _ROWS].tobytes()
+                lead = leaders[band].setdefault(bucket, u)
+                if lead == u or lead in tested:
+                    continue
+                tested.add(lead)
+                other = hashes[lead]
+                # cota superior barata: Jaccard <= |menor| / |mayor|
+                if min(len(other), len(hs)) < thr * max(len(other), len(hs)):
+                    continue
+                if polarity[lead] != polarity[u]:
+                    continue  # una negación de diferencia cambia la etiqueta aunque el texto sea casi igual
+                if uf.find(lead) != uf.find(u) and _jaccard(other, hs) >= thr:
+                    uf.union(lead, u)
+
+    pos_of_key = {k: u for u, (k, _) in enumerate(uniq)}
+    root_first = [uniq[uf.find(u)][1] for u in range(len(uniq))]
+    rep_of = [root_first[pos_of_key[k]] for k in key_of]
+    representatives = sorted(set(rep_of))
+    return DedupPlan(rep_of=rep_of, representatives=representatives,
+                     exact_groups=len(uniq), threshold=thr)
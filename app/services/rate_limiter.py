@@ -0,0 +1,234 @@
+# services/rate_limiter.py
+"""
+Limitador adaptativo del lado cliente para APIs con cuota (Gemini):
+
+- cubetas de peticiones/min y tokens/min (se espera antes de mandar, no después de un 429);
+- AIMD sobre la concurrencia (+1/limite por éxito) y sobre el ritmo admitido por las
+  cubetas (por si la cuota real es menor que la configurada): x0.5 y x0.7 ante
+  throttling, una vez por ventana;
+- reintentos con backoff exponencial + jitter que respetan la pista del servidor
+  ("retry in 17s", Retry-After) y pausan a todos los hilos mientras dure.
+
+Los límites se configuran por MODEL_ID:
+    GEMINI_RATE_LIMITS="gemini-1.5-flash=2000:4000000,gemini-2.5-pro=150:2000000"   # rpm:tpm
+y si el modelo no aparece, GEMINI_RPM / GEMINI_TPM (0 = sin tope).
+"""
+import os
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional, TypeVar
+
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "60"))
+GEMINI_TPM = float(os.getenv("GEMINI_TPM", "250000"))
+GEMINI_RATE_LIMITS = os.getenv("GEMINI_RATE_LIMITS", "")
+GEMINI_MAX_IN_FLIGHT = int(os.getenv("GEMINI_MAX_IN_FLIGHT", "32"))   # techo de la concurrencia AIMD
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "8"))
+GEMINI_BACKOFF_S = float(os.getenv("GEMINI_BACKOFF_S", "1"))
+GEMINI_MAX_BACKOFF_S = float(os.getenv("GEMINI_MAX_BACKOFF_S", "60"))
+# Ráfaga permitida tras un rato ocioso, como fracción del cupo por minuto: con 1.0 se
+# podría mandar el doble de la cuota dentro de un mismo minuto y provocar 429s.
+GEMINI_BURST = float(os.getenv("GEMINI_BURST", "0.1"))
+
+_MIN_RATE_FACTOR = 0.05
+_RATE_DECREASE = 0.7  # el ritmo se recorta menos que la concurrencia: suele estar cerca de la cuota
+_RATE_STEP = 0.1  # recuperación del ritmo por ventana sin throttling (aumento aditivo)
+
+T = TypeVar("T")
+
+_HINT_RES = (
+    re.compile(r"retry in ([\d.]+)\s*s", re.IGNORECASE),
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE),
+    re.compile(r"retry[- ]after[\"':\s]+([\d.]+)", re.IGNORECASE),
+)
+
+class Throttled(Exception):
+    """Se agotaron los reintentos ante throttling/cuota; el llamador decide (no es un fallo del texto)."""
+
+    def __init__(self, message: str, last_error: Optional[Exception] = None):
+        super().__init__(message)
+        self.last_error = last_error
+
+def limits_for(model: str, spec: str = GEMINI_RATE_LIMITS) -> tuple[float, float]:
+    """(rpm, tpm) para `model` según GEMINI_RATE_LIMITS; si no figura, GEMINI_RPM / GEMINI_TPM."""
+    for item in filter(None, (s.strip() for s in spec.split(","))):
+        name, _, vals = item.partition("=")
+        if name.strip() == model:
+            rpm, _, tpm = vals.partition(":")
+            return float(rpm or GEMINI_RPM), float(tpm or GEMINI_TPM)
+    return GEMINI_RPM, GEMINI_TPM
+
+def retry_after(e: BaseException) -> Optional[float]:
+    """Segundos sugeridos por el servidor (atributo, encabezado Retry-After o texto del error)."""
+    hint = getattr(e, "retry_after", None)
+    if isinstance(hint, (int, float)):
+        return float(hint)
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    text = f"{e} {getattr(e, 'details', '')}"
+    for rx in _HINT_RES:
+        m = rx.search(text)
+        if m:
+            return float(m.group(1))
+    return None
+
+class _Bucket:
+    """`per_window` unidades por ventana, rellenadas en continuo, con ráfaga acotada (0 = ilimitada)."""
+
+    def __init__(self, per_window: float, window_s: float = 60.0, burst: float = GEMINI_BURST):
+        self.capacity = max(1.0, per_window * burst) if per_window > 0 else 0.0
+        self.level = self.capacity
+        self.base_rate = self.rate = per_window / window_s
+        self.stamp = time.monotonic()
+
+    def scale(self, factor: float) -> None:
+        self.rate = self.base_rate * factor
+
+    def wait_for(self, n: float, now: float) -> float:
+        """Segundos hasta poder consumir `n` (0 = ya se puede)."""
+        if self.capacity <= 0:
+            return 0.0
+        self.level = min(self.capacity, self.level + (now - self.stamp) * self.rate)
+        self.stamp = now
+        n = min(n, self.capacity)  # una petición más grande que la cubeta igual debe poder pasar
+        return 0.0 if self.level >= n else (n - self.level) / self.rate
+
+    def take(self, n: float) -> None:
+        if self.capacity > 0:
+            self.level -= min(n, self.capacity)
+
+@dataclass
+class LimiterStats:
+    calls: int = 0
+    throttled: int = 0      # respuestas 429/cuota observadas
+    retries: int = 0
+    gave_up: int = 0        # llamadas que agotaron los reintentos
+    waited_s: float = 0.0   # tiempo total esperando cupo
+    limit: float = 0.0      # concurrencia AIMD actual
+    rate_factor: float = 1.0  # fracción del ritmo configurado que se admite ahora
+    in_flight: int = 0
+
+class AdaptiveLimiter:
+    def __init__(self, rpm: float, tpm: float, *, max_in_flight: int = GEMINI_MAX_IN_FLIGHT,
+                 min_in_flight: int = 1, max_retries: int = GEMINI_MAX_RETRIES,
+                 backoff_s: float = GEMINI_BACKOFF_S, max_backoff_s: float = GEMINI_MAX_BACKOFF_S,
+                 decrease: float = 0.5, window_s: float = 60.0, burst: float = GEMINI_BURST):
+        self.requests, self.tokens = _Bucket(rpm, window_s, burst), _Bucket(tpm, window_s, burst)
+        self.max_in_flight, self.min_in_flight = max(1, max_in_flight), max(1, min_in_flight)
+        self.max_retries, self.backoff_s, self.max_backoff_s = max_retries, backoff_s, max_backoff_s
+        self.decrease = decrease
+        self._limit = float(self.max_in_flight)
+        self._rate_factor = 1.0
+        self._window_s = window_s
+        self._last_ok = time.monotonic()
+        self._in_flight = 0
+        self._paused_until = 0.0     # pausa global por una pista del servidor
+        self._next_decrease = 0.0    # una sola reducción por ventana de throttling
+        self._cond = threading.Condition()
+        self._stats = LimiterStats()
+
+    def _acquire(self, tokens: float) -> None:
+        t0 = time.monotonic()
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                wait = self._paused_until - now
+                if wait <= 0 and self._in_flight >= int(self._limit):
+                    wait = None  # hasta que alguien libere un lugar
+                elif wait <= 0:
+                    wait = max(self.requests.wait_for(1, now), self.tokens.wait_for(tokens, now))
+                    if wait <= 0:
+                        self.requests.take(1)
+                        self.tokens.take(tokens)
+                        self._in_flight += 1
+                        self._stats.waited_s += now - t0
+                        return
+                self._cond.wait(wait)
+
+    def _release(self, throttled: bool, pause_s: Optional[float] = None) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                self._stats.throttled += 1
+                if now >= self._next_decrease:
+                    self._limit = max(float(self.min_in_flight), self._limit * self.decrease)
+                    self._set_rate(max(_MIN_RATE_FACTOR, self._rate_factor * _RATE_DECREASE))
+                    self._next_decrease = now + max(1.0, pause_s or self.backoff_s)
+                if pause_s:
+                    self._paused_until = max(self._paused_until, now + pause_s)
+            else:
+                self._limit = min(float(self.max_in_flight), self._limit + 1.0 / self._limit)
+                if self._rate_factor < 1.0:
+                    step = _RATE_STEP * (now - max(self._last_ok, self._next_decrease)) / self._window_s
+                    self._set_rate(min(1.0, self._rate_factor + max(0.0, step)))
+                self._last_ok = now
+            self._cond.notify_all()
+
+    def _set_rate(self, factor: float) -> None:
+        self._rate_factor = factor
+        self.requests.scale(factor)
+        self.tokens.scale(factor)
+
+    def _backoff(self, attempt: int, hint: Optional[float]) -> float:
+        if hint is not None:
+            return hint + random.uniform(0, min(1.0, 0.1 * hint + 0.1))  # no volver todos en el mismo instante
+        return random.uniform(0, min(self.max_backoff_s, self.backoff_s * 2 ** attempt))  # "full jitter"
+
+    def call(self, fn: Callable[[], T], *, tokens: float = 0,
+             is_throttle: Callable[[BaseException], bool] = lambda e: False) -> T:
+        """
+        Ejecuta fn() respetando cupo y concurrencia. Los errores de throttling se reintentan
+        (hasta max_retries) y al agotarse lanzan Throttled; cualquier otro error se propaga tal cual.
+        """
+        for attempt in range(self.max_retries + 1):
+            self._acquire(tokens)
+            with self._cond:
+                self._stats.calls += 1
+            try:
+                result = fn()
+            except BaseException as e:
+                if not is_throttle(e):
+                    self._release(False)
+                    raise
+                hint = retry_after(e)
+                self._release(True, hint)
+                if attempt == self.max_retries:
+                    with self._cond:
+                        self._stats.gave_up += 1
+                    raise Throttled(f"Cuota de la API agotada tras {attempt + 1} intentos: {e}", e) from e
+                with self._cond:
+                    self._stats.retries += 1
+                if hint is None:
+                    time.sleep(self._backoff(attempt, None))
+                else:
+                    # la pausa global ya frena a todos; este hilo además agrega su jitter
+                    time.sleep(self._backoff(attempt, hint) - hint)
+                continue
+            self._release(False)
+            return result
+        raise AssertionError("inalcanzable")
+
+    def stats(self) -> LimiterStats:
+        with self._cond:
+            s = LimiterStats(**vars(self._stats))
+            s.limit, s.in_flight, s.rate_factor = self._limit, self._in_flight, self._rate_factor
+            return s
+
+_limiters: dict[str, AdaptiveLimiter] = {}
+_limiters_lock = threading.Lock()
+
+def get_limiter(model: str) -> AdaptiveLimiter:
+    """Un limitador compartido por modelo y proceso (todas las llamadas comparten la misma cuota)."""
+    with _limiters_lock:
+        if model not in _limiters:
+            rpm, tpm = limits_for(model)
+            _limiters[model] = AdaptiveLimiter(rpm, tpm)
+        return _limiters[model]
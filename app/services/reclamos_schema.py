@@ -0,0 +1,172 @@
+# services/reclamos_schema.py
+import secrets, time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+TABLE_NAME = "reclamos"  # nombre real de tu tabla en Supabase
+
+_HEX_DIGITS = np.frombuffer(b"0123456789abcdef", dtype="S1")
+_NIBBLE_SHIFTS = np.arange(28, -4, -4, dtype=np.uint64)  # 8 dígitos hex de 32 bits, el más significativo primero
+
+# ---------- IDs/fechas y normalizaciones ----------
+def ksid(prefix: str) -> str:
+    """Generates a K-Sortable Unique ID (KSUID-like) with a given prefix."""
+    epoch_ms = int(time.time() * 1000)
+    rand8 = secrets.token_hex(4)
+    return f"{prefix}-{epoch_ms:013d}-{rand8}"
+
+def now_utc_iso(x=None) -> str:
+    """Returns the current UTC time as an ISO 8601 string, or converts a given timestamp."""
+    ts = pd.Timestamp.utcnow() if x is None else pd.to_datetime(x, errors="coerce")
+    if ts is pd.NaT: ts = pd.Timestamp.utcnow()
+    if ts.tzinfo is None: ts = ts.tz_localize("UTC")
+    else: ts = ts.tz_convert("UTC")
+    return ts.isoformat()
+
+def format_datetime_for_id(dt_obj: datetime) -> str:
+    """Formats a datetime object to 'YYYY-MM-DD_HH:MM:SS' string for Id_reclamo."""
+    if dt_obj.tzinfo is None:
+        dt_obj = dt_obj.replace(tzinfo=timezone.utc)
+    else:
+        dt_obj = dt_obj.astimezone(timezone.utc)
+    return dt_obj.strftime("%Y-%m-%d_%H:%M:%S")
+
+def generate_reclamo_id(dni_val: int | None, fecha_dt: datetime) -> str:
+    """
+    Generates Id_reclamo using DNI and formatted date (DNI_YYYY-MM-DD_HH:MM:SS).
+    Falls back to ksid if DNI is missing or invalid.
+    """
+    if dni_val is not None and pd.notna(dni_val):
+        formatted_fecha = format_datetime_for_id(fecha_dt)
+        return f"{dni_val}_{formatted_fecha}"
+    else:
+        return ksid("R")
+
+def normalize_sent(value: str) -> str:
+    """Normalizes sentiment strings to 'positivo', 'neutral', or 'negativo'.
+       Also handles "FALLO_GEMINI" to keep it for internal error checking."""
+    s = (value or "").strip().lower()
+    if s == "fallo_gemini": # Keep "FALLO_GEMINI" as is for error checking
+        return "FALLO_GEMINI"
+    mapping = {
+        "malo": "negativo", "mala": "negativo", "negativo": "negativo",
+        "bueno": "positivo", "buena": "positivo", "positivo": "positivo",
+        "neutral": "neutral", "neutro": "neutral",
+    }
+    return mapping.get(s, "neutral")
+
+def _prepare_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Renames common column variations, adds missing critical columns and builds Fecha_local."""
+    colmap = {
+        "id_reclamo":"Id_reclamo", "id":"Id_reclamo", "reclamo_id":"Id_reclamo",
+        "id_chat":"Id_chat", "chat_id":"Id_chat",
+        "dni":"DNI", "id_cliente":"DNI", "customer_id":"DNI", "documento":"DNI", # Map to 'DNI' (capital)
+        "det_reclamo":"Det_reclamo", "descripcion":"Det_reclamo", "comment":"Det_reclamo", "feedback":"Det_reclamo", "mensaje":"Det_reclamo" # Map to 'Det_reclamo' (capital D)
+    }
+    
+    df_columns_lower = {col.lower(): col for col in df.columns}
+    rename_dict = {}
+    for lower_k, mapped_v in colmap.items():
+        if lower_k in df_columns_lower and df_columns_lower[lower_k] != mapped_v:
+            rename_dict[df_columns_lower[lower_k]] = mapped_v
+    df = df.rename(columns=rename_dict).copy()
+
+    # Ensure all critical columns are present, add with NA if not
+    for c in ["Id_reclamo","Id_chat","DNI","Det_reclamo"]:
+        if c not in df.columns:
+            df[c] = pd.NA
+
+    # Handle 'Fecha_local' for internal Id_reclamo generation
+    # If a 'Fecha' or 'fecha' column existed in the CSV, use it to populate 'Fecha_local'.
+    # Otherwise, initialize 'Fecha_local' with NA.
+    if "Fecha" not in df.columns and "fecha" not in df_columns_lower:
+        df["Fecha_local"] = pd.NA
+    else:
+        if "Fecha" not in df.columns:
+            if "fecha" in df_columns_lower:
+                df['Fecha_local'] = pd.to_datetime(df[df_columns_lower['fecha']], errors="coerce", utc=True)
+            else:
+                df["Fecha_local"] = pd.NA
+        else:
+            df['Fecha_local'] = pd.to_datetime(df["Fecha"], errors="coerce", utc=True)
+        # Drop the original 'Fecha' or 'fecha' column(s) if they were loaded from CSV
+        if "Fecha" in df.columns:
+            df.drop(columns=["Fecha"], inplace=True)
+        if "fecha" in df_columns_lower:
+            df.drop(columns=[df_columns_lower['fecha']], inplace=True)
+
+    df["DNI"] = pd.to_numeric(df["DNI"], errors="coerce").astype("Int64")
+    df["Det_reclamo"] = df["Det_reclamo"].astype(str).fillna("").str.strip()
+    return df
+
+def ksid_series(prefix: str, n: int) -> pd.Series:
+    """
+    Vectorized ksid: n IDs '{prefix}-{epoch_ms:013d}-{hex8}' from one timestamp. The hex8 part is
+    a random 32-bit start plus the row position (mod 2**32), so IDs within a call never repeat.
+    """
+    if n <= 0:
+        return pd.Series([], dtype=object)
+    epoch_ms = int(time.time() * 1000)
+    seq = (np.arange(n, dtype=np.uint64) + np.uint64(secrets.randbits(32))) % np.uint64(1 << 32)
+    digits = _HEX_DIGITS[(seq[:, None] >> _NIBBLE_SHIFTS) & np.uint64(0xF)]
+    hex8 = pd.Series(digits.view("S8").ravel().astype(str), dtype=object)
+    return f"{prefix}-{epoch_ms:013d}-" + hex8
+
+def ensure_min_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Ensures required columns exist, renames common variations, and auto-generates
+    Id_reclamo, Fecha (local only), Id_chat if they are missing or empty.
+    The 'Fecha' column will be used for Id_reclamo generation but NOT sent to Supabase.
+    This function ensures internal DF columns are 'DNI' and 'Det_reclamo' (capitalized).
+    IDs and timestamps are built column-wise; formats match ensure_min_columns_rowwise.
+    """
+    df = _prepare_columns(df)
+
+    miss_chat = df["Id_chat"].isna() | (df["Id_chat"].astype(str).str.strip() == "")
+    df["Id_chat"] = df["Id_chat"].astype(object)
+    df.loc[miss_chat, "Id_chat"] = ksid_series("CHAT", int(miss_chat.sum())).to_numpy()
+
+    # Fecha_local queda como datetime64[ns, UTC]; los faltantes toman un único "ahora"
+    fecha = pd.to_datetime(df["Fecha_local"], errors="coerce", utc=True)
+    df["Fecha_local"] = fecha.fillna(pd.Timestamp.utcnow())
+
+    miss_rec = df["Id_reclamo"].isna() | (df["Id_reclamo"].astype(str).str.strip() == "")
+    df["Id_reclamo"] = df["Id_reclamo"].astype(object)
+    with_dni = miss_rec & df["DNI"].notna()
+    if with_dni.any():
+        df.loc[with_dni, "Id_reclamo"] = (
+            df.loc[with_dni, "DNI"].astype(str) + "_"
+            + df.loc[with_dni, "Fecha_local"].dt.strftime("%Y-%m-%d_%H:%M:%S")
+        ).to_numpy()
+    without_dni = miss_rec & ~with_dni
+    df.loc[without_dni, "Id_reclamo"] = ksid_series("R", int(without_dni.sum())).to_numpy()
+
+    return df
+
+def ensure_min_columns_rowwise(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Previous row-by-row implementation of ensure_min_columns (one ksid / utcnow /
+    generate_reclamo_id call per row). Kept as the reference for equivalence checks
+    and benchmarks/bench_ensure_min_columns.py.
+    """
+    df = _prepare_columns(df)
+
+    miss_chat = df["Id_chat"].isna() | (df["Id_chat"].astype(str).str.strip() == "")
+    df.loc[miss_chat, "Id_chat"] = [ksid("CHAT") for _ in range(miss_chat.sum())]
+
+    miss_fecha_local = df["Fecha_local"].isna()
+    df.loc[miss_fecha_local, "Fecha_local"] = [pd.Timestamp.utcnow().to_pydatetime() for _ in range(miss_fecha_local.sum())]
+
+    miss_rec = df["Id_reclamo"].isna() | (df["Id_reclamo"].astype(str).str.strip() == "")
+    
+    df.loc[miss_rec, "Id_reclamo"] = [
+        generate_reclamo_id(
+            int(dni_val) if pd.notna(dni_val) else None,
+            fecha_dt
+        )
+        for dni_val, fecha_dt in zip(df.loc[miss_rec, "DNI"], df.loc[miss_rec, "Fecha_local"])
+    ]
+
+    return df
@@ -1,19 +1,109 @@
 ﻿# services/supabase_client.py
 import os
+import threading
+from typing import Callable, Optional, TypeVar
+
 import streamlit as st # Necesario si quieres usar st.secrets para despliegue
 from supabase import create_client, Client
 
-def supabase() -> Client:
-    """Initializes and returns a Supabase client instance."""
+# Un solo cliente por proceso: reutiliza conexiones HTTP (keep-alive) entre consultas,
+# upserts y ticks de auto-actualización en lugar de un handshake TLS por llamada.
+SUPABASE_POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", "20"))
+SUPABASE_TIMEOUT_S = float(os.getenv("SUPABASE_TIMEOUT_S", "30"))
+SUPABASE_KEEPALIVE_S = float(os.getenv("SUPABASE_KEEPALIVE_S", "60"))
+
+_client: Optional[Client] = None
+_http = None  # httpx.Client compartido, si la versión de supabase-py permite inyectarlo
+_lock = threading.Lock()
+
+T = TypeVar("T")
+
+def has_credentials() -> bool:
+    """True si SUPABASE_URL y SUPABASE_SERVICE_KEY están definidas (para hilos/procesos sin UI)."""
+    return bool(os.getenv("SUPABASE_URL") and os.getenv("SUPABASE_SERVICE_KEY"))
+
+def _credentials() -> tuple[str, str]:
     url = os.getenv("SUPABASE_URL")
     # Usar SUPABASE_SERVICE_KEY como has indicado en tu .env
-    key = os.getenv("SUPABASE_SERVICE_KEY") 
-    
+    key = os.getenv("SUPABASE_SERVICE_KEY")
+
     if not url or not key:
         st.error(
             "Error de configuración: Las variables de entorno 'SUPABASE_URL' y 'SUPABASE_SERVICE_KEY' "
             "deben estar definidas. Verifica tu archivo .env o Streamlit secrets."
         )
         st.stop()
-       
-    return create_client(url, key)
\ No newline at end of file
+    return url, key
+
+def _build(url: str, key: str):
+    """Crea el cliente con un transporte httpx con pool y keep-alive (o las opciones que soporte la versión instalada)."""
+    try:
+        import httpx
+        from supabase.lib.client_options import SyncClientOptions
+
+        http = httpx.Client(
+            limits=httpx.Limits(max_connections=SUPABASE_POOL_SIZE,
+                                max_keepalive_connections=SUPABASE_POOL_SIZE,
+                                keepalive_expiry=SUPABASE_KEEPALIVE_S),
+            timeout=SUPABASE_TIMEOUT_S,
+        )
+        try:
+            options = SyncClientOptions(httpx_client=http, postgrest_client_timeout=SUPABASE_TIMEOUT_S)
+            return create_client(url, key, options=options), http
+        except TypeError:
+            http.close()  # supabase-py sin httpx_client: el cliente compartido igual mantiene su propio pool
+    except ImportError:
+        pass
+    from supabase.lib.client_options import ClientOptions
+
+    return create_client(url, key, options=ClientOptions(postgrest_client_timeout=SUPABASE_TIMEOUT_S)), None
+
+def supabase() -> Client:
+    """Returns the process-wide Supabase client, creating it on first use (thread-safe)."""
+    global _client, _http
+    if _client is not None:
+        return _client
+    url, key = _credentials()
+    with _lock:
+        if _client is None:
+            _client, _http = _build(url, key)
+        return _client
+
+def reset_supabase() -> None:
+    """Descarta el cliente actual (p. ej. tras errores de red); el próximo supabase() crea uno nuevo."""
+    global _client, _http
+    with _lock:
+        http, _client, _http = _http, None, None
+    if http is not None:
+        try:
+            http.close()
+        except Exception:
+            pass
+
+def _is_connection_error(e: Exception) -> bool:
+    try:
+        import httpx
+        if isinstance(e, httpx.TransportError):
+            return True
+    except ImportError:
+        pass
+    return isinstance(e, (ConnectionError, TimeoutError))
+
+def call_with_reconnect(fn: Callable[[Client], T]) -> T:
+    """Ejecuta fn(cliente); ante un error de conexión reemplaza el cliente y reintenta una vez."""
+    try:
+        return fn(supabase())
+    except Exception as e:
+        if not _is_connection_error(e):
+            raise
+        reset_supabase()
+        return fn(supabase())
+
+def check_health(table: str = "reclamos") -> bool:
+    """Consulta mínima contra `table`; si falla, reemplaza el cliente y vuelve a probar."""
+    try:
+        call_with_reconnect(lambda sb: sb.table(table).select("*", count="exact").limit(0).execute())
+        return True
+    except Exception:
+        reset_supabase()
+        return False
@@ -1,7 +1,11 @@
-import time, io, requests, streamlit as st
+import io, os, time, uuid, requests, streamlit as st
 from services.n8n_client import (
-    create_banner_with_two_images, start_banner_job, fetch_status, N8NClientError
+    create_banner_with_two_images, start_banner_job, N8NClientError
 )
+from services.image_prep import prepare_image
+from services import banner_jobs
+from services.banner_cache import get_cache
+from tabs import tab_banner_batch
 
 def _file_card(title: str, b: bytes, key_prefix: str):
     """Mini-card: thumb + nombre + tamaño + botón Cambiar."""
@@ -9,14 +13,108 @@ def _file_card(title: str, b: bytes, key_prefix: str):
     with col1:
         st.image(io.BytesIO(b), use_container_width=True)
     with col2:
-        kb = len(b)/1024
+        prep = st.session_state.get(f"{key_prefix}_prep")
         st.caption(title)
-        st.caption(f"{kb:,.1f} KB")
+        st.caption(prep.summary() if prep else f"{len(b)/1024:,.1f} KB")
         if st.button("Cambiar", key=f"{key_prefix}_change"):
             # borramos del estado para que reaparezca el uploader
             st.session_state.pop(f"{key_prefix}_bytes", None)
+            st.session_state.pop(f"{key_prefix}_prep", None)
             st.rerun()
 
+def _store_upload(up, key_prefix: str):
+    """Guarda la imagen ya reducida/limpia: se sube (y se previsualiza) la versión liviana."""
+    prep = prepare_image(up.getvalue(), "banner", mime=getattr(up, "type", None))
+    st.session_state[f"{key_prefix}_bytes"] = prep.data
+    st.session_state[f"{key_prefix}_prep"] = prep
+
+def _ago(seconds: float) -> str:
+    if seconds < 90:
+        return f"{seconds:.0f} s"
+    if seconds < 5400:
+        return f"{seconds / 60:.0f} min"
+    return f"{seconds / 3600:.1f} h" if seconds < 172800 else f"{seconds / 86400:.0f} días"
+
+# ---------- Jobs asíncronos (registro persistente + polling con backoff) ----------
+_OWNER_PARAM = "uid"                    # en la URL: el mismo usuario recupera sus jobs al recargar
+_JOBS_STATE_KEY = "banner_jobs_seen"    # último estado visto por job, para avisar al terminar
+_JOBS_SHOWN = 8
+_JOBS_REFRESH_S = float(os.getenv("BANNER_UI_REFRESH_S", "2"))
+_JOB_LABELS = {
+    banner_jobs.PENDING: "⏳ En curso", banner_jobs.DONE: "✅ Listo",
+    banner_jobs.FAILED: "❌ Falló", banner_jobs.EXPIRED: "⌛ Sin respuesta",
+}
+
+def _owner() -> str:
+    if "banner_owner" not in st.session_state:
+        st.session_state["banner_owner"] = st.query_params.get(_OWNER_PARAM) or uuid.uuid4().hex[:16]
+    if st.query_params.get(_OWNER_PARAM) != st.session_state["banner_owner"]:
+        st.query_params[_OWNER_PARAM] = st.session_state["banner_owner"]
+    return st.session_state["banner_owner"]
+
+def _notify_finished(jobs: list) -> bool:
+    """Toast una vez por job que terminó desde el último refresco; True si alguno terminó."""
+    seen = st.session_state.setdefault(_JOBS_STATE_KEY, {})
+    finished = False
+    for job in jobs:
+        before = seen.get(job.id)
+        seen[job.id] = job.status
+        if before != banner_jobs.PENDING or job.active:
+            continue
+        finished = True
+        if job.status == banner_jobs.DONE:
+            st.toast(f"✅ Banner listo (job {job.id[:8]}).")
+            if job.id == st.session_state.get("last_job_id") or not st.session_state.get("banner_result_url"):
+                st.session_state["banner_result_url"] = job.banner_url
+        else:
+            st.toast(f"❌ Job {job.id[:8]}: {job.error}")
+    return finished
+
+def _render_job(job) -> None:
+    elapsed = (job.updated_at if not job.active else time.time()) - job.created_at
+    detail = [f"{elapsed:,.0f} s"]
+    if job.remote_status:
+        detail.append(f"n8n: {job.remote_status}")
+    if job.active:
+        detail.append(f"próxima consulta en {max(0.0, job.next_poll_at - time.time()):.0f} s")
+    if job.error:
+        detail.append(job.error)
+    c1, c2, c3 = st.columns([5, 2, 1], vertical_alignment="center")
+    c1.markdown(f"{_JOB_LABELS.get(job.status, job.status)} · `{job.id[:8]}`")
+    c1.caption(" · ".join(detail))
+    if job.status == banner_jobs.DONE:
+        if c2.button("Ver", key=f"bjob_show_{job.id}", use_container_width=True):
+            st.session_state["banner_result_url"] = job.banner_url
+            st.rerun()
+    elif job.status in (banner_jobs.FAILED, banner_jobs.EXPIRED):
+        if c2.button("Reintentar", key=f"bjob_resume_{job.id}", use_container_width=True,
+                     help="Sigue consultando el estado del mismo job."):
+            banner_jobs.resume(job.id)
+            st.rerun()
+    if not job.active and c3.button("✕", key=f"bjob_dismiss_{job.id}", help="Quitar de la lista"):
+        banner_jobs.dismiss(job.id, _owner())
+        st.rerun()
+
+def _jobs_panel() -> None:
+    """Consulta en n8n solo los jobs a los que les toca (backoff + jitter) y muestra su estado."""
+    owner = _owner()
+    try:
+        banner_jobs.poll_due(owner)
+    except Exception as e:  # un fallo del registro no debe tumbar la pestaña
+        st.caption(f"No se pudo actualizar el estado de los jobs: {e}")
+    jobs = banner_jobs.list_jobs(owner, _JOBS_SHOWN)
+    st.markdown("---")
+    st.markdown("#### Jobs en n8n")
+    for job in jobs:
+        _render_job(job)
+    if _notify_finished(jobs):
+        # se redibuja toda la pestaña (resultado nuevo); sin jobs en curso el panel deja de refrescarse
+        st.rerun()
+
+# st.fragment (Streamlit >= 1.37) refresca solo este panel mientras haya jobs en curso
+_fragment = getattr(st, "fragment", None)
+_jobs_panel_live = _fragment(run_every=_JOBS_REFRESH_S)(_jobs_panel) if _fragment else _jobs_panel
+
 def render():
     # ===== estilos suaves =====
     st.markdown("""
@@ -44,6 +142,11 @@ def render():
     </style>
     """, unsafe_allow_html=True)
 
+    if st.radio("Modo", ["Un banner", "Lote"], horizontal=True, key="banner_mode",
+                label_visibility="collapsed") == "Lote":
+        tab_banner_batch.render()
+        return
+
     # ===== estado =====
     st.session_state.setdefault("banner_result_url", None)
     st.session_state.setdefault("last_job_id", None)
@@ -67,7 +170,7 @@ def render():
                 up1 = st.file_uploader(" ", type=["png","jpg","jpeg"], label_visibility="collapsed", key="upl1",
                                        help="Haz clic o suelta el archivo aquí (hasta ~200MB).")
                 if up1 is not None:
-                    st.session_state["img1_bytes"] = up1.getvalue()
+                    _store_upload(up1, "img1")
                     st.rerun()
 
         # -------- Imagen 2
@@ -78,7 +181,7 @@ def render():
             else:
                 up2 = st.file_uploader(" ", type=["png","jpg","jpeg"], label_visibility="collapsed", key="upl2")
                 if up2 is not None:
-                    st.session_state["img2_bytes"] = up2.getvalue()
+                    _store_upload(up2, "img2")
                     st.rerun()
         st.markdown("</div>", unsafe_allow_html=True)
 
@@ -91,9 +194,11 @@ def render():
             cA, cB = st.columns([1,1])
             gen = cA.form_submit_button("Generar", use_container_width=True)
             clr = cB.form_submit_button("Limpiar", use_container_width=True)
+            force = st.checkbox("Forzar regeneración", value=False,
+                                help="Ignora un banner ya generado con estas mismas imágenes y prompt.")
 
         if clr:
-            for k in ("img1_bytes","img2_bytes","banner_result_url","last_job_id"):
+            for k in ("img1_bytes","img2_bytes","img1_prep","img2_prep","banner_result_url","last_job_id"):
                 st.session_state.pop(k, None)
             st.rerun()
 
@@ -103,33 +208,37 @@ def render():
             if not img1 or not img2:
                 st.warning("Sube **ambas** imágenes.")
             else:
-                # 1) intento síncrono
-                try:
-                    with st.spinner("Generando banner…"):
-                        url = create_banner_with_two_images(
-                            image1_bytes=img1, image2_bytes=img2, prompt=prompt
-                        )
-                    st.session_state["banner_result_url"] = url
-                    st.success("¡Listo! Banner generado.")
-                except N8NClientError:
-                    # 2) fallback asíncrono (si tu webhook devuelve job_id rápido)
-                    st.info("El flujo parece demorar. Probando modo asíncrono…")
+                # 0) mismo par de imágenes + prompt ya generado (por cualquier sesión): se reutiliza
+                cache = get_cache()
+                key = cache.key(img1, img2, prompt) if cache else None
+                hit = cache.get(key) if cache and not force else None
+                if hit:
+                    st.session_state["banner_result_url"] = hit.url
+                    st.success(f"Banner reutilizado (generado hace {_ago(hit.age_s)}). "
+                               "Marca «Forzar regeneración» para pedir uno nuevo.")
+                else:
+                    # 1) intento síncrono (salvo BANNER_ASYNC: cada clic es un job y se pueden lanzar varios)
                     try:
-                        job_id = start_banner_job(image1_bytes=img1, image2_bytes=img2, prompt=prompt)
-                        st.session_state["last_job_id"] = job_id
-                        with st.spinner(f"Procesando job {job_id}…"):
-                            url = None; t0 = time.time()
-                            while time.time() - t0 < 120:
-                                status, got_url = fetch_status(job_id)
-                                if got_url: url = got_url; break
-                                time.sleep(3)
-                        if url:
-                            st.session_state["banner_result_url"] = url
-                            st.success("¡Listo! Banner generado (async).")
-                        else:
-                            st.warning("No llegó la URL dentro del tiempo de espera. Revisa el estado más tarde.")
-                    except Exception as ee:
-                        st.error(f"Error en modo asíncrono: {ee}")
+                        if banner_jobs.BANNER_ASYNC:
+                            raise N8NClientError("modo asíncrono")
+                        with st.spinner("Generando banner…"):
+                            url = create_banner_with_two_images(
+                                image1_bytes=img1, image2_bytes=img2, prompt=prompt
+                            )
+                        if cache:
+                            cache.put(key, url)
+                        st.session_state["banner_result_url"] = url
+                        st.success("¡Listo! Banner generado.")
+                    except N8NClientError:
+                        # 2) asíncrono: se registra el job y el panel lo sigue sin bloquear la sesión
+                        try:
+                            job_id = start_banner_job(image1_bytes=img1, image2_bytes=img2, prompt=prompt)
+                            banner_jobs.track(job_id, _owner(), prompt, cache_key=key)
+                            st.session_state["last_job_id"] = job_id
+                            st.session_state.setdefault(_JOBS_STATE_KEY, {})[job_id] = banner_jobs.PENDING
+                            st.toast(f"⏳ Job {job_id[:8]} en curso: el banner aparecerá al terminar.")
+                        except Exception as ee:
+                            st.error(f"Error en modo asíncrono: {ee}")
 
         st.markdown("</div>", unsafe_allow_html=True)
 
@@ -157,7 +266,8 @@ def render():
         if url:
             st.image(url, use_container_width=True, caption="Banner generado")
             try:
-                content = requests.get(url, timeout=30).content
+                cache = get_cache()
+                content = (cache and cache.content_for_url(url)) or requests.get(url, timeout=30).content
                 st.download_button("⬇️ Descargar banner", data=content,
                                    file_name="banner.jpg", mime="image/jpeg",
                                    use_container_width=True)
@@ -166,4 +276,8 @@ def render():
         else:
             st.markdown('<div class="result-ph">La imagen generada aparecerá aquí</div>', unsafe_allow_html=True)
 
+        jobs = banner_jobs.list_jobs(_owner(), _JOBS_SHOWN)
+        if jobs:
+            (_jobs_panel_live if any(j.active for j in jobs) else _jobs_panel)()
+
         st.markdown("</div>", unsafe_allow_html=True)
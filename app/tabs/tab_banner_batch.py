@@ -0,0 +1,139 @@
+# app/tabs/tab_banner_batch.py
+"""Modo lote de la pestaña de banners: una base × muchos productos, galería en vivo y exportación."""
+import io, os, streamlit as st
+from services import banner_batch
+from services.banner_batch import BannerBatch, BatchError
+
+_BATCH_KEY = "banner_batch"
+_ZIP_KEY = "banner_batch_zip"
+_GALLERY_COLS = 4
+_REFRESH_S = float(os.getenv("BANNER_UI_REFRESH_S", "2"))
+_LABELS = {
+    banner_batch.PENDING: "⏳ En espera", banner_batch.RUNNING: "⚙️ Generando",
+    banner_batch.FAILED: "❌ Falló", banner_batch.CANCELLED: "⏹️ Cancelado",
+}
+
+def _inputs() -> None:
+    c1, c2 = st.columns(2, vertical_alignment="top")
+    with c1:
+        st.caption("Imagen base (banner)")
+        base = st.file_uploader(" ", type=["png", "jpg", "jpeg"], key="batch_base", label_visibility="collapsed")
+        if base is not None:
+            st.image(io.BytesIO(base.getvalue()), use_container_width=True)
+    with c2:
+        st.caption("Productos: varias imágenes y/o un .zip")
+        ups = st.file_uploader(" ", type=["png", "jpg", "jpeg", "webp", "zip"], accept_multiple_files=True,
+                               key="batch_products", label_visibility="collapsed")
+        folder = ""
+        if banner_batch.BANNER_BATCH_DIR_ROOT:
+            folder = st.text_input(f"…o una carpeta dentro de {banner_batch.BANNER_BATCH_DIR_ROOT}",
+                                   placeholder="product_images", key="batch_folder")
+        prompts_csv = st.file_uploader("Prompts por producto (CSV opcional: archivo, prompt)", type=["csv"],
+                                       key="batch_prompts")
+
+    default_prompt = st.text_area("Prompt por defecto (productos sin fila en el CSV)", value="default",
+                                  height=80, key="batch_default_prompt")
+    concurrency = st.slider("Banners en paralelo", 1, 16, banner_batch.BANNER_BATCH_CONCURRENCY,
+                            help="Tope de llamadas simultáneas al webhook; baja solo si n8n responde 429/503.")
+    force = st.checkbox("Forzar regeneración", key="batch_force",
+                        help="Ignora los banners ya generados con la misma base, producto y prompt.")
+
+    if st.button("Generar lote", type="primary", use_container_width=True, disabled=base is None):
+        try:
+            sources = list(ups or []) + ([banner_batch.server_folder(folder.strip())] if folder.strip() else [])
+            products = banner_batch.load_products(sources)
+            prompts = banner_batch.load_prompts(prompts_csv.getvalue()) if prompts_csv is not None else {}
+            batch = BannerBatch(base.getvalue(), products, prompts=prompts,
+                                default_prompt=default_prompt.strip() or "default", concurrency=concurrency,
+                                force=force)
+        except (BatchError, OSError, ValueError) as e:  # ValueError: zip dañado
+            st.error(str(e))
+            return
+        batch.start()
+        st.session_state[_BATCH_KEY] = batch
+        st.session_state.pop(_ZIP_KEY, None)
+        st.rerun()
+
+def _report(batch: BannerBatch) -> None:
+    r = batch.report()
+    m = st.columns(5)
+    m[0].metric("Listos", f"{r['done']}/{r['items']}")
+    m[1].metric("Fallidos", r["failed"])
+    m[2].metric("Banners/min", f"{r['per_min']:.1f}")
+    m[3].metric("Latencia p50", f"{r['latency_p50_s']:.1f} s" if r["latency_p50_s"] is not None else "—")
+    m[4].metric("Latencia p90", f"{r['latency_p90_s']:.1f} s" if r["latency_p90_s"] is not None else "—")
+    st.caption(f"{r['wall_s']:.1f} s en total · concurrencia máx. {r['concurrency']}"
+               + (f" · {r['cached']} reutilizados de caché" if r["cached"] else "")
+               + (f" · latencia máx. {r['latency_max_s']:.1f} s" if r["latency_max_s"] is not None else ""))
+
+def _gallery(batch: BannerBatch) -> None:
+    items = batch.snapshot()
+    done = sum(i.status == banner_batch.DONE for i in items)
+    st.progress(done / len(items), text=f"{done} de {len(items)} banners")
+    for start in range(0, len(items), _GALLERY_COLS):
+        cols = st.columns(_GALLERY_COLS)
+        for col, item in zip(cols, items[start:start + _GALLERY_COLS]):
+            with col:
+                if item.status == banner_batch.DONE:
+                    st.image(item.url, caption=item.name, use_container_width=True)
+                else:
+                    st.markdown(f'<div class="result-ph" style="min-height:120px">{_LABELS[item.status]}</div>',
+                                unsafe_allow_html=True)
+                    st.caption(item.name + (f" · {item.error}" if item.error else ""))
+
+def _results() -> None:
+    """Galería + métricas; mientras el lote corre se refresca solo (fragment) sin rerun de la app."""
+    batch = st.session_state.get(_BATCH_KEY)
+    if batch is None:
+        return
+    running = batch.running
+    if running and st.button("Cancelar lote", key="batch_cancel"):
+        batch.cancel()
+    _report(batch)
+    _gallery(batch)
+    if running:
+        return
+    if st.session_state.get("batch_was_running"):
+        st.session_state["batch_was_running"] = False
+        st.rerun()  # terminó: redibuja la pestaña completa (exportación) y el panel deja de refrescarse
+
+_fragment = getattr(st, "fragment", None)
+_results_live = _fragment(run_every=_REFRESH_S)(_results) if _fragment else _results
+
+def _export(batch: BannerBatch) -> None:
+    failed = {i.name for i in batch.snapshot() if i.status in (banner_batch.FAILED, banner_batch.CANCELLED)}
+    c1, c2, c3 = st.columns(3)
+    c1.download_button("⬇️ Manifiesto (CSV)", data=batch.manifest_csv(), file_name="banners_manifest.csv",
+                       mime="text/csv", use_container_width=True)
+    if _ZIP_KEY in st.session_state:
+        c2.download_button("⬇️ Descargar ZIP", data=st.session_state[_ZIP_KEY], file_name="banners.zip",
+                           mime="application/zip", use_container_width=True)
+    elif c2.button("Preparar ZIP con banners", use_container_width=True):
+        with st.spinner("Descargando banners…"):
+            st.session_state[_ZIP_KEY] = batch.export_zip()
+        st.rerun()
+    if failed and c3.button(f"Reintentar {len(failed)} fallidos", use_container_width=True):
+        batch.start(failed)
+        st.session_state.pop(_ZIP_KEY, None)
+        st.rerun()
+
+def render():
+    st.markdown('<div class="card">', unsafe_allow_html=True)
+    st.markdown("<h3>Lote: una base × muchos productos</h3>", unsafe_allow_html=True)
+    batch = st.session_state.get(_BATCH_KEY)
+    if batch is None or not batch.running:
+        _inputs()
+    st.markdown("</div>", unsafe_allow_html=True)
+
+    batch = st.session_state.get(_BATCH_KEY)
+    if batch is None:
+        return
+    st.markdown('<div class="card">', unsafe_allow_html=True)
+    st.markdown("<h3>Resultados</h3>", unsafe_allow_html=True)
+    if batch.running:
+        st.session_state["batch_was_running"] = True
+        _results_live()
+    else:
+        _results()
+        _export(batch)
+    st.markdown("</div>", unsafe_allow_html=True)
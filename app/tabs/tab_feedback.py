@@ -1,16 +1,18 @@
 # tabs/tab_feedback.py
-import secrets, time
+import os
 from datetime import datetime, timedelta, timezone
 
-import altair as alt
 import pandas as pd
 import streamlit as st
 from streamlit_autorefresh import st_autorefresh
 
-from services.supabase_client import supabase
+from services.supabase_client import supabase, reset_supabase
 from services.gemini_classifier import classify_text # Esto importará la versión correcta del servicio
-
-TABLE_NAME = "reclamos"  # nombre real de tu tabla en Supabase
+from services.reclamos_schema import (
+    TABLE_NAME, ksid, now_utc_iso, generate_reclamo_id, normalize_sent
+)
+from services.bulk_writer import upsert_reclamos
+from services import classification_jobs, local_mirror
 
 # ---------- Estilos ----------
 def _style():
@@ -34,132 +36,353 @@ def _style():
     </style>
     """, unsafe_allow_html=True)
 
-# ---------- IDs/fechas y normalizaciones ----------
-def ksid(prefix: str) -> str:
-    """Generates a K-Sortable Unique ID (KSUID-like) with a given prefix."""
-    epoch_ms = int(time.time() * 1000)
-    rand8 = secrets.token_hex(4)
-    return f"{prefix}-{epoch_ms:013d}-{rand8}"
-
-def now_utc_iso(x=None) -> str:
-    """Returns the current UTC time as an ISO 8601 string, or converts a given timestamp."""
-    ts = pd.Timestamp.utcnow() if x is None else pd.to_datetime(x, errors="coerce")
-    if ts is pd.NaT: ts = pd.Timestamp.utcnow()
-    if ts.tzinfo is None: ts = ts.tz_localize("UTC")
-    else: ts = ts.tz_convert("UTC")
-    return ts.isoformat()
-
-def format_datetime_for_id(dt_obj: datetime) -> str:
-    """Formats a datetime object to 'YYYY-MM-DD_HH:MM:SS' string for Id_reclamo."""
-    if dt_obj.tzinfo is None:
-        dt_obj = dt_obj.replace(tzinfo=timezone.utc)
-    else:
-        dt_obj = dt_obj.astimezone(timezone.utc)
-    return dt_obj.strftime("%Y-%m-%d_%H:%M:%S")
-
-def generate_reclamo_id(dni_val: int | None, fecha_dt: datetime) -> str:
+# ---------- Supabase query ----------
+TABLE_COLUMNS = ["Fecha","Det_reclamo","Sentimiento","Clasificacion","DNI","Id_chat","Id_reclamo"]
+
+def _date_bounds(d_from: datetime.date = None, d_to: datetime.date = None) -> tuple[str | None, str | None]:
+    """[desde, hasta) en ISO UTC; 'hasta' incluye el día completo."""
+    lo = now_utc_iso(d_from) if d_from else None
+    hi = (pd.to_datetime(d_to) + pd.Timedelta(days=1)).isoformat() if d_to else None
+    return lo, hi
+
+def _fetch_summary(sentiments: list, d_from: datetime.date = None, d_to: datetime.date = None,
+                   until: str | None = None) -> pd.DataFrame:
     """
-    Generates Id_reclamo using DNI and formatted date (DNI_YYYY-MM-DD_HH:MM:SS).
-    Falls back to ksid if DNI is missing or invalid.
+    Conteos por (dia, Clasificacion, Sentimiento) calculados en Postgres
+    (función reclamos_resumen de sql/setup.sql). Columnas: dia, Clasificacion, Sentimiento, total.
+    `until` (exclusivo) reemplaza el límite superior del filtro de fechas.
     """
-    if dni_val is not None and pd.notna(dni_val):
-        formatted_fecha = format_datetime_for_id(fecha_dt)
-        return f"{dni_val}_{formatted_fecha}"
-    else:
-        return ksid("R")
-
-def normalize_sent(value: str) -> str:
-    """Normalizes sentiment strings to 'positivo', 'neutral', or 'negativo'.
-       Also handles "FALLO_GEMINI" to keep it for internal error checking."""
-    s = (value or "").strip().lower()
-    if s == "fallo_gemini": # Keep "FALLO_GEMINI" as is for error checking
-        return "FALLO_GEMINI"
-    mapping = {
-        "malo": "negativo", "mala": "negativo", "negativo": "negativo",
-        "bueno": "positivo", "buena": "positivo", "positivo": "positivo",
-        "neutral": "neutral", "neutro": "neutral",
-    }
-    return mapping.get(s, "neutral")
-
-def ensure_min_columns(df: pd.DataFrame) -> pd.DataFrame:
+    lo, hi = _date_bounds(d_from, d_to)
+    hi = until or hi
+    data = supabase().rpc("reclamos_resumen", {
+        "p_sentimientos": sentiments or None, "p_desde": lo, "p_hasta": hi,
+    }).execute().data
+    agg = pd.DataFrame(data or [], columns=["dia","Clasificacion","Sentimiento","total"])
+    agg["dia"] = pd.to_datetime(agg["dia"]).dt.date
+    agg["total"] = agg["total"].astype(int)
+    return agg
+
+# ---------- Refresco incremental (watermark) ----------
+_DASH_CACHE_KEY = "feedback_dashboard_cache"
+_MAX_CACHED_FILTERS = 4
+_PAGE = 1000  # filas por página (tope por defecto de PostgREST)
+_SUMMARY_KEYS = ["dia","Clasificacion","Sentimiento"]
+ROLLUP_TABLE = "reclamos_diario"  # rollup mantenido por triggers (sql/setup.sql)
+ROLLUP_ENABLED = os.getenv("FEEDBACK_ROLLUP_ENABLED", "true").strip().lower() not in ("0", "false", "no")
+# margen hacia atrás del refresco incremental: lotes que confirman tarde con una Fecha vieja
+WATERMARK_LOOKBACK_S = float(os.getenv("FEEDBACK_WATERMARK_LOOKBACK_S", "300"))
+
+def _filtered(q, sentiments: list, lo: str | None, hi: str | None):
+    if sentiments:
+        q = q.in_("Sentimiento", sentiments)
+    if lo:
+        q = q.gte("Fecha", lo)
+    if hi:
+        q = q.lt("Fecha", hi)
+    return q
+
+def _latest_fecha(sentiments: list, lo: str | None, hi: str | None) -> str | None:
+    """Fecha más reciente dentro de los filtros (None si no hay filas)."""
+    q = _filtered(supabase().table(TABLE_NAME).select("Fecha"), sentiments, lo, hi)
+    data = q.order("Fecha", desc=True).limit(1).execute().data
+    return data[0]["Fecha"] if data else None
+
+def _lookback(fecha, lo: str | None) -> str:
+    """Inicio de la ventana que se vuelve a leer: `fecha` menos el margen, sin salir del filtro."""
+    since = pd.Timestamp(fecha) - pd.Timedelta(seconds=WATERMARK_LOOKBACK_S)
+    if lo and since < pd.Timestamp(lo):
+        since = pd.Timestamp(lo)
+    return since.isoformat()
+
+def _fetch_since(sentiments: list, lo: str | None, hi: str | None, since: str | None) -> list:
+    """Filas (solo columnas de agregación) con Fecha >= since, paginadas en orden ascendente."""
+    rows = []
+    while True:
+        q = supabase().table(TABLE_NAME).select("Id_reclamo,Fecha,Clasificacion,Sentimiento")
+        q = _filtered(q, sentiments, since or lo, hi)
+        page = q.order("Fecha").order("Id_reclamo").range(len(rows), len(rows) + _PAGE - 1).execute().data
+        rows.extend(page)
+        if len(page) < _PAGE:
+            return rows
+
+def _fetch_rollup(sentiments: list, d_from: datetime.date = None, d_to: datetime.date = None) -> pd.DataFrame:
     """
-    Ensures required columns exist, renames common variations, and auto-generates
-    Id_reclamo, Fecha (local only), Id_chat if they are missing or empty.
-    The 'Fecha' column will be used for Id_reclamo generation but NOT sent to Supabase.
-    This function ensures internal DF columns are 'DNI' and 'Det_reclamo' (capitalized).
+    Agregados desde el rollup diario: una fila por (dia, Clasificacion, Sentimiento)
+    del rango, sin tocar `reclamos`. Siempre al día (incluye reclasificaciones).
     """
-    colmap = {
-        "id_reclamo":"Id_reclamo", "id":"Id_reclamo", "reclamo_id":"Id_reclamo",
-        "id_chat":"Id_chat", "chat_id":"Id_chat",
-        "dni":"DNI", "id_cliente":"DNI", "customer_id":"DNI", "documento":"DNI", # Map to 'DNI' (capital)
-        "det_reclamo":"Det_reclamo", "descripcion":"Det_reclamo", "comment":"Det_reclamo", "feedback":"Det_reclamo", "mensaje":"Det_reclamo" # Map to 'Det_reclamo' (capital D)
-    }
-    
-    df_columns_lower = {col.lower(): col for col in df.columns}
-    rename_dict = {}
-    for lower_k, mapped_v in colmap.items():
-        if lower_k in df_columns_lower and df_columns_lower[lower_k] != mapped_v:
-            rename_dict[df_columns_lower[lower_k]] = mapped_v
-    df = df.rename(columns=rename_dict).copy()
-
-    # Ensure all critical columns are present, add with NA if not
-    for c in ["Id_reclamo","Id_chat","DNI","Det_reclamo"]:
-        if c not in df.columns:
-            df[c] = pd.NA
-
-    # Handle 'Fecha_local' for internal Id_reclamo generation
-    # If a 'Fecha' or 'fecha' column existed in the CSV, use it to populate 'Fecha_local'.
-    # Otherwise, initialize 'Fecha_local' with NA.
-    if "Fecha" not in df.columns and "fecha" not in df_columns_lower:
-        df["Fecha_local"] = pd.NA
-    else:
-        if "Fecha" not in df.columns:
-            if "fecha" in df_columns_lower:
-                df['Fecha_local'] = pd.to_datetime(df[df_columns_lower['fecha']], errors="coerce", utc=True)
-            else:
-                df["Fecha_local"] = pd.NA
-        else:
-            df['Fecha_local'] = pd.to_datetime(df["Fecha"], errors="coerce", utc=True)
-        # Drop the original 'Fecha' or 'fecha' column(s) if they were loaded from CSV
-        if "Fecha" in df.columns:
-            df.drop(columns=["Fecha"], inplace=True)
-        if "fecha" in df_columns_lower:
-            df.drop(columns=[df_columns_lower['fecha']], inplace=True)
-
-    df["DNI"] = pd.to_numeric(df["DNI"], errors="coerce").astype("Int64")
-    df["Det_reclamo"] = df["Det_reclamo"].astype(str).fillna("").str.strip()
-
-    miss_chat = df["Id_chat"].isna() | (df["Id_chat"].astype(str).str.strip() == "")
-    df.loc[miss_chat, "Id_chat"] = [ksid("CHAT") for _ in range(miss_chat.sum())]
-
-    miss_fecha_local = df["Fecha_local"].isna()
-    df.loc[miss_fecha_local, "Fecha_local"] = [pd.Timestamp.utcnow().to_pydatetime() for _ in range(miss_fecha_local.sum())]
-
-    miss_rec = df["Id_reclamo"].isna() | (df["Id_reclamo"].astype(str).str.strip() == "")
-    
-    df.loc[miss_rec, "Id_reclamo"] = [
-        generate_reclamo_id(
-            int(dni_val) if pd.notna(dni_val) else None,
-            fecha_dt
-        )
-        for dni_val, fecha_dt in zip(df.loc[miss_rec, "DNI"], df.loc[miss_rec, "Fecha_local"])
-    ]
-
-    return df
-
-# ---------- Supabase query ----------
-def _fetch_rows(sentiments: list, d_from: datetime.date = None, d_to: datetime.date = None) -> list:
-    """Fetches reclamo data from Supabase based on sentiment and date filters."""
-    sb = supabase()
-    q = sb.table(TABLE_NAME).select("*")
+    q = supabase().table(ROLLUP_TABLE).select("dia,Clasificacion,Sentimiento,total").gt("total", 0)
     if sentiments:
         q = q.in_("Sentimiento", sentiments)
     if d_from:
-        q = q.gte("Fecha", now_utc_iso(d_from))
+        q = q.gte("dia", str(d_from))
     if d_to:
-        d_to_inc = (pd.to_datetime(d_to) + pd.Timedelta(days=1)).isoformat()
-        q = q.lt("Fecha", d_to_inc)
-    return q.order("Fecha", desc=True).execute().data
+        q = q.lte("dia", str(d_to))
+    rows = []
+    while True:
+        page = q.order("dia").range(len(rows), len(rows) + _PAGE - 1).execute().data
+        rows.extend(page)
+        if len(page) < _PAGE:
+            break
+    agg = pd.DataFrame(rows, columns=_SUMMARY_KEYS + ["total"])
+    agg["dia"] = pd.to_datetime(agg["dia"]).dt.date
+    agg["total"] = agg["total"].astype(int)
+    return agg
+
+def _dashboard_summary(sentiments: list, d_from: datetime.date = None, d_to: datetime.date = None) -> pd.DataFrame:
+    """
+    Agregados del dashboard cacheados por juego de filtros en la sesión. La primera vez
+    se piden a Postgres hasta el corte (última Fecha menos FEEDBACK_WATERMARK_LOOKBACK_S);
+    en cada rerun se vuelven a traer las filas con Fecha >= corte, se descartan las ya
+    contadas (por Id_reclamo) y se suman al cubo. Fecha es now() al empezar la
+    transacción, así que un lote que confirma tarde aparece con Fecha anterior a filas ya
+    vistas: la ventana lo cuenta igual si llega dentro de ese margen.
+    Cambiar filtros = carga completa para ese juego de filtros.
+    Se usa cuando el rollup está desactivado (FEEDBACK_ROLLUP_ENABLED=false).
+    """
+    cache = st.session_state.setdefault(_DASH_CACHE_KEY, {})
+    key = (tuple(sorted(sentiments or [])), str(d_from), str(d_to))
+    lo, hi = _date_bounds(d_from, d_to)
+    entry = cache.get(key)
+    if entry is None:
+        wm = _latest_fecha(sentiments, lo, hi)
+        since = _lookback(wm, lo) if wm else None
+        agg = (_fetch_summary(sentiments, d_from, d_to, until=since) if wm
+               else pd.DataFrame(columns=_SUMMARY_KEYS + ["total"]))
+        entry = {"agg": agg, "since": since, "seen": {}}
+        while len(cache) >= _MAX_CACHED_FILTERS:
+            cache.pop(next(iter(cache)))
+        cache[key] = entry
+
+    rows = _fetch_since(sentiments, lo, hi, entry["since"])
+    if not rows:
+        return entry["agg"]
+    nd = pd.DataFrame(rows)
+    nd["Fecha"] = pd.to_datetime(nd["Fecha"], utc=True)
+    new = nd[~nd["Id_reclamo"].isin(entry["seen"])]
+    if not new.empty:
+        new = new.assign(dia=new["Fecha"].dt.date)
+        inc = new.groupby(_SUMMARY_KEYS, as_index=False).size().rename(columns={"size": "total"})
+        entry["agg"] = (pd.concat([entry["agg"], inc], ignore_index=True)
+                          .groupby(_SUMMARY_KEYS, as_index=False)["total"].sum())
+    since = max(filter(None, [_lookback(nd["Fecha"].max(), lo), entry["since"]]), key=pd.Timestamp)
+    entry["since"] = since
+    # solo hace falta recordar lo que la próxima ventana vuelve a traer
+    entry["seen"] = {**entry["seen"], **dict(zip(nd["Id_reclamo"], nd["Fecha"]))}
+    entry["seen"] = {k: f for k, f in entry["seen"].items() if f >= pd.Timestamp(since)}
+    return entry["agg"]
+
+# ---------- Gráficos (resolución adaptativa) ----------
+# Hasta ~3 meses se grafica por día, hasta ~2 años por semana y más allá por mes,
+# para que el spec de Vega (datos embebidos) no crezca con el rango elegido.
+_MAX_DAYS_DAILY = 92
+_MAX_DAYS_WEEKLY = 731
+_RESOLUTION_LABELS = {"D": "día", "W": "semana", "M": "mes"}
+
+def _chart_resolution(d_from: datetime.date, d_to: datetime.date, agg: pd.DataFrame) -> str:
+    """'D', 'W' o 'M' según el largo del rango (el de los datos si falta un extremo)."""
+    lo = d_from or (agg["dia"].min() if not agg.empty else None)
+    hi = d_to or (agg["dia"].max() if not agg.empty else None)
+    days = (pd.Timestamp(hi) - pd.Timestamp(lo)).days + 1 if lo and hi else 0
+    if days <= _MAX_DAYS_DAILY:
+        return "D"
+    return "W" if days <= _MAX_DAYS_WEEKLY else "M"
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _chart_specs(agg: pd.DataFrame, resolution: str) -> dict:
+    """
+    Specs Vega-Lite de los cuatro gráficos a partir del cubo de agregados. Cacheado por
+    (cubo, resolución): los reruns con los mismos datos no re-agregan ni re-arman specs.
+    """
+    import altair as alt  # diferido: solo se carga si hay datos que graficar
+
+    label = _RESOLUTION_LABELS[resolution]
+    by_time = agg.copy()
+    by_time["periodo"] = pd.to_datetime(by_time["dia"])
+    if resolution != "D":
+        by_time["periodo"] = by_time["periodo"].dt.to_period(resolution).dt.start_time
+    by_time["periodo"] = by_time["periodo"].dt.strftime("%Y-%m-%d")
+
+    sent_counts = agg.groupby("Sentimiento", as_index=False)["total"].sum().rename(columns={"total": "count"})
+    pie = alt.Chart(sent_counts).mark_arc(innerRadius=40).encode(
+        theta=alt.Theta("count", stack=True),
+        color=alt.Color("Sentimiento", legend=alt.Legend(title="Sentimiento")),
+        order=alt.Order("count", sort="descending"),
+        tooltip=["Sentimiento","count"]
+    ).properties(title="Comentarios por Sentimiento")
+
+    trend = by_time.groupby("periodo", as_index=False)["total"].sum().rename(columns={"total": "Id_reclamo"})
+    area = alt.Chart(trend).mark_area(opacity=0.6, line=True).encode(
+        x=alt.X("periodo:T", title=f"Fecha (por {label})"),
+        y=alt.Y("Id_reclamo:Q", title="Cantidad de Reclamos"),
+        tooltip=[alt.Tooltip("periodo:T", title="Fecha"), alt.Tooltip("Id_reclamo:Q", title="Cantidad")]
+    ).properties(title=f"Tendencia de Reclamos (por {label})")
+
+    cls_sent = agg.groupby(["Clasificacion","Sentimiento"], as_index=False)["total"].sum().rename(columns={"total": "Count"})
+    stacked = alt.Chart(cls_sent).mark_bar().encode(
+        x=alt.X("Clasificacion:N", sort="-y", title="Clasificación"),
+        y=alt.Y("Count:Q", title="Cantidad"),
+        color=alt.Color("Sentimiento:N", legend=alt.Legend(title="Sentimiento")),
+        tooltip=["Clasificacion","Sentimiento","Count"]
+    ).properties(title="Distribución de Clasificaciones por Sentimiento").interactive()
+
+    heat_data = by_time.groupby(["periodo","Clasificacion"], as_index=False)["total"].sum().rename(columns={"total": "Count"})
+    heat = alt.Chart(heat_data).mark_rect().encode(
+        x=alt.X("periodo:T", title=f"Fecha (por {label})"),
+        y=alt.Y("Clasificacion:N", title="Clasificación"),
+        color=alt.Color("Count:Q", title="Cantidad", scale=alt.Scale(range="heatmap")),
+        tooltip=[alt.Tooltip("periodo:T", title="Fecha"), "Clasificacion:N", alt.Tooltip("Count:Q", title="Cantidad")]
+    ).properties(title=f"Cantidad de Reclamos por {label.capitalize()} y Clasificación").interactive()
+
+    return {"pie": pie.to_dict(), "area": area.to_dict(), "stacked": stacked.to_dict(), "heat": heat.to_dict()}
+
+# ---------- Tabla de reclamos (paginación por keyset) ----------
+_TABLE_STATE_KEY = "feedback_table_state"
+_PAGE_SIZES = [25, 50, 100, 250]
+
+def _quote(v) -> str:
+    """Valor entre comillas para filtros or=(...) de PostgREST."""
+    return '"' + str(v).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def _fetch_page(sentiments: list, d_from: datetime.date, d_to: datetime.date, text: str,
+                cursor: tuple | None, size: int, use_mirror: bool = False) -> list:
+    """
+    Una página ordenada por (Fecha, Id_reclamo) descendente que empieza después de
+    `cursor` = (Fecha, Id_reclamo) de la última fila de la página anterior. Pide size+1
+    filas para saber si hay página siguiente. Solo proyecta TABLE_COLUMNS.
+    """
+    lo, hi = _date_bounds(d_from, d_to)
+    if use_mirror:
+        return local_mirror.page(sentiments, lo, hi, TABLE_COLUMNS, text=text, cursor=cursor, size=size)
+    q = _filtered(supabase().table(TABLE_NAME).select(",".join(TABLE_COLUMNS)), sentiments, lo, hi)
+    if text:
+        q = q.ilike("Det_reclamo", f"*{text}*")
+    if cursor:
+        fecha, rid = (_quote(v) for v in cursor)
+        q = q.or_(f"Fecha.lt.{fecha},and(Fecha.eq.{fecha},Id_reclamo.lt.{rid})")
+    return (q.order("Fecha", desc=True).order("Id_reclamo", desc=True)
+             .limit(size + 1).execute().data)
+
+def _render_table(sentiments: list, d_from: datetime.date, d_to: datetime.date, use_mirror: bool = False) -> None:
+    """Tabla paginada: el costo de abrirla no depende del tamaño de la tabla."""
+    t1, t2 = st.columns([3, 1])
+    text = t1.text_input("Buscar en Det_reclamo", key="feedback_table_text", placeholder="Texto a buscar (opcional)")
+    size = t2.selectbox("Filas por página", _PAGE_SIZES, index=1, key="feedback_table_size")
+    # caracteres con significado en la sintaxis de filtros de PostgREST
+    text = "".join(ch for ch in (text or "").strip() if ch not in ",()*%\\\"")
+
+    key = (tuple(sorted(sentiments or [])), str(d_from), str(d_to), text, size, use_mirror)
+    state = st.session_state.get(_TABLE_STATE_KEY)
+    if not state or state["key"] != key:
+        state = {"key": key, "cursors": [None]}  # cursores de inicio de cada página visitada
+        st.session_state[_TABLE_STATE_KEY] = state
+
+    rows = _fetch_page(sentiments, d_from, d_to, text, state["cursors"][-1], size, use_mirror)
+    has_next = len(rows) > size
+    rows = rows[:size]
+
+    n1, n2, n3 = st.columns([1, 2, 1])
+    if n1.button("← Anterior", key="feedback_table_prev", disabled=len(state["cursors"]) == 1, use_container_width=True):
+        state["cursors"].pop()
+        st.rerun()
+    n2.caption(f"Página {len(state['cursors'])} · {len(rows)} filas")
+    if n3.button("Siguiente →", key="feedback_table_next", disabled=not has_next, use_container_width=True):
+        state["cursors"].append((rows[-1]["Fecha"], rows[-1]["Id_reclamo"]))
+        st.rerun()
+
+    dv = pd.DataFrame(rows, columns=TABLE_COLUMNS)
+    dv["Fecha"] = pd.to_datetime(dv["Fecha"], utc=True)
+    st.dataframe(dv, use_container_width=True, hide_index=True)
+
+# ---------- Trabajos de clasificación (cola durable) ----------
+_JOBS_STATE_KEY = "feedback_jobs_seen"  # último estado visto por trabajo, para avisar al terminar
+_JOBS_SHOWN = 10
+_JOBS_REFRESH_S = float(os.getenv("JOBS_UI_REFRESH_S", "2"))
+_JOB_LABELS = {
+    classification_jobs.QUEUED: "⏳ En cola", classification_jobs.RUNNING: "⚙️ Procesando",
+    classification_jobs.DONE: "✅ Terminado", classification_jobs.FAILED: "❌ Falló",
+    classification_jobs.CANCELLED: "⏹️ Cancelado",
+}
+
+def _notify_finished(jobs: list) -> bool:
+    """Toast una sola vez por trabajo que terminó desde el último refresco; True si guardó filas."""
+    seen = st.session_state.setdefault(_JOBS_STATE_KEY, {})
+    wrote = False
+    for job in jobs:
+        before = seen.get(job.id)
+        seen[job.id] = job.status
+        if before not in classification_jobs.ACTIVE or job.active:
+            continue
+        if job.status == classification_jobs.DONE:
+            st.toast(f"✅ '{job.filename}': {job.rows_written} reclamos insertados/actualizados.")
+            if job.api_calls_saved:
+                st.toast(f"🧩 {job.api_calls_saved} de {job.rows_read} reclamos eran casi-duplicados: "
+                         f"se ahorraron {job.api_calls_saved} llamadas a Gemini.")
+            if job.cache_hits + job.cache_misses:
+                st.toast(f"🗄️ Caché de clasificaciones: {job.cache_hits} aciertos / {job.cache_misses} fallos.")
+            if job.local_asked:
+                st.toast(f"⚡ Clasificador local: {job.local_answered} de {job.local_asked} reclamos "
+                         "resueltos sin Gemini.")
+        elif job.status == classification_jobs.FAILED:
+            st.toast(f"❌ '{job.filename}' se detuvo: {job.error}")
+        wrote = wrote or job.rows_written > 0
+    return wrote
+
+def _render_job(job) -> None:
+    pct = job.bytes_fraction or 0
+    if job.status == classification_jobs.DONE:
+        pct = 1.0
+    st.progress(int(pct * 100), text=f"{_JOB_LABELS.get(job.status, job.status)} · **{job.filename}** · "
+                f"{job.rows_read} leídos, {job.rows_written} guardados")
+    c1, c2 = st.columns([4, 1])
+    notes = []
+    if job.rows_failed:
+        notes.append(f"{job.rows_failed} sin clasificar por Gemini ({job.rows_failed / max(1, job.rows_read):.1%})")
+    if job.rows_write_failed:
+        notes.append(f"{job.rows_write_failed} no guardados")
+    if job.cancel_requested and job.status == classification_jobs.RUNNING:
+        notes.append("cancelando al terminar el chunk actual…")
+    if job.error:
+        notes.append(job.error)
+    c1.caption(" · ".join(notes) or f"checkpoint: chunk {job.chunks_done}")
+    if job.active:
+        if c2.button("Cancelar", key=f"job_cancel_{job.id}", use_container_width=True,
+                     disabled=job.cancel_requested):
+            classification_jobs.cancel(job.id)
+            st.rerun()
+    elif job.status in (classification_jobs.FAILED, classification_jobs.CANCELLED):
+        if c2.button("Reanudar", key=f"job_resume_{job.id}", use_container_width=True):
+            classification_jobs.resume(job.id)
+            classification_jobs.ensure_workers()
+            st.rerun()
+    if job.failure_details:
+        with st.expander(f"Mostrar detalles de {len(job.failure_details)} reclamos fallidos"):
+            for detail in job.failure_details:
+                st.error(detail)
+
+def _jobs_panel() -> None:
+    """Estado de los últimos trabajos; se refresca solo sin recargar el resto de la pestaña."""
+    jobs = classification_jobs.list_jobs(_JOBS_SHOWN)
+    if not jobs:
+        return
+    st.markdown("#### Trabajos de clasificación")
+    if any(j.active for j in jobs):
+        classification_jobs.ensure_workers()  # p. ej. tras reiniciar el servidor con trabajos pendientes
+        if classification_jobs.alive_workers() == 0:
+            # recién lanzados o caídos al arrancar: la traza queda en el log de workers
+            st.warning("⚠️ Ningún worker está procesando la cola todavía. Si el aviso no desaparece, "
+                       f"revisar `{classification_jobs.JOBS_LOG_PATH}`.")
+    for job in jobs:
+        _render_job(job)
+    if _notify_finished(jobs):
+        # hay reclamos nuevos: refresca también el dashboard, no solo este panel
+        if _fragment:
+            st.rerun(scope="app")
+        else:
+            st.rerun()
+
+# st.fragment (Streamlit >= 1.37) refresca solo este panel; sin él, se ve al recargar / auto-actualizar
+_fragment = getattr(st, "fragment", None)
+_jobs_panel_live = _fragment(run_every=_JOBS_REFRESH_S)(_jobs_panel) if _fragment else _jobs_panel
 
 # ---------- UI ----------
 def render():
@@ -200,7 +423,7 @@ def render():
     )
     
     b1, b2 = st.columns(2) 
-    subir  = b1.button("Cargar y clasificar en Supabase", type="primary", use_container_width=True, disabled=csv_file is None)
+    subir  = b1.button("Encolar y clasificar en Supabase", type="primary", use_container_width=True, disabled=csv_file is None)
     limpiar = b2.button("Limpiar selección", use_container_width=True)
     
     if limpiar:
@@ -208,65 +431,20 @@ def render():
         st.rerun()
 
     if csv_file is not None and subir:
-        with st.spinner("Cargando y clasificando datos con Gemini... Esto puede tardar unos minutos para archivos grandes."):
-            try:
-                df = pd.read_csv(csv_file)
-                df = ensure_min_columns(df) 
-
-                if "Det_reclamo" not in df.columns or df["Det_reclamo"].isnull().all():
-                    st.error("La columna 'Det_reclamo' es requerida y no se encontró o está completamente vacía en tu CSV. "
-                             "Asegúrate de que tu CSV contenga una columna con el detalle de los reclamos.")
-                    st.stop()
-
-                bar = st.progress(0, text="Clasificando reclamos...")
-                preds = []
-                failed_classifications_details = [] 
-                total_reclamos = len(df)
-                for i, txt in enumerate(df["Det_reclamo"].tolist()):
-                    pred_result, error_detail = classify_text(txt) 
-                    preds.append(pred_result)
-                    if pred_result.get("Sentimiento") == "FALLO_GEMINI":
-                        failed_classifications_details.append(f"Reclamo '{txt[:70]}...' falló: {error_detail}")
-                    bar.progress(int((i + 1) * 100 / total_reclamos), text=f"Clasificando reclamo {i+1} de {total_reclamos}...")
-                bar.empty()
-
-                pred_df = pd.DataFrame(preds)
-                df["Sentimiento"]  = pred_df["Sentimiento"].map(normalize_sent) 
-                df["Clasificacion"] = pred_df["Clasificacion"].fillna("otros")
-                
-                df_successful = df[df["Sentimiento"] != "FALLO_GEMINI"].copy()
-
-                if df_successful.empty:
-                    st.warning("No se pudieron clasificar ni guardar reclamos exitosamente. Revisa los detalles de los errores a continuación.")
-                    if failed_classifications_details:
-                        st.subheader("Detalles de las clasificaciones fallidas:")
-                        for detail in failed_classifications_details:
-                            st.error(detail) 
-                else:
-                    df_to_supabase = df_successful.copy()
-                    
-                    if 'Fecha_local' in df_to_supabase.columns:
-                        df_to_supabase.drop(columns=['Fecha_local'], inplace=True)
-                    
-                    supabase().table(TABLE_NAME).upsert(
-                        df_to_supabase.to_dict(orient="records"),
-                        on_conflict="Id_reclamo"
-                    ).execute()
-                    st.toast(f"✅ ¡Éxito! Insertados/actualizados {len(df_to_supabase)} reclamos.")
-                    
-                    failed_count = len(df) - len(df_successful)
-                    if failed_count > 0:
-                        st.error(f"❌ Fallaron {failed_count} clasificaciones de Gemini y no fueron guardadas.")
-                        if failed_classifications_details:
-                            st.subheader("Detalles de las clasificaciones fallidas:")
-                            with st.expander(f"Mostrar detalles de {failed_count} reclamos fallidos"):
-                                for detail in failed_classifications_details:
-                                    st.error(detail) 
-                    
-                    st.rerun()
-            except Exception as e:
-                st.error(f"❌ Error procesando/guardando CSV: {e}")
-                st.exception(e)
+        try:
+            # La clasificación corre en workers aparte (cola durable): la UI no se bloquea
+            # y un corte a mitad de camino se retoma desde el último chunk guardado.
+            job_id = classification_jobs.submit_csv(csv_file, csv_file.name)
+            classification_jobs.ensure_workers()
+            st.session_state.setdefault(_JOBS_STATE_KEY, {})[job_id] = classification_jobs.QUEUED
+            st.session_state['csv_uploader_key'] += 1
+            st.toast(f"📥 '{csv_file.name}' encolado para clasificar.")
+            st.rerun()
+        except Exception as e:
+            st.error(f"❌ No se pudo encolar el CSV: {e}")
+            st.exception(e)
+
+    _jobs_panel_live()
 
     st.markdown("</div>", unsafe_allow_html=True)
 
@@ -316,7 +494,10 @@ def render():
                         "Sentimiento": normalize_sent(pred.get("Sentimiento")),
                         "Clasificacion": pred.get("Clasificacion", "otros"),
                     }
-                    supabase().table(TABLE_NAME).upsert(row, on_conflict="Id_reclamo").execute()
+                    written = upsert_reclamos([row])
+                    if not written.ok:
+                        st.error(f"❌ Error guardando reclamo: {written.errors[0]}")
+                        st.stop()
                     st.toast("✅ ¡Reclamo guardado correctamente!")
                     st.rerun()
                 except Exception as e:
@@ -327,76 +508,60 @@ def render():
     # Dashboard
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.markdown("<h3>Dashboard</h3>", unsafe_allow_html=True)
+    use_mirror = False
+    if local_mirror.MIRROR_ENABLED:
+        s1, s2 = st.columns([3, 1])
+        use_mirror = s1.toggle("Leer del espejo local (DuckDB/Parquet)", value=False, key="feedback_use_mirror",
+                               help="Consulta la copia local sincronizada en lugar de Supabase.")
+        if s2.button("Sincronizar espejo", key="feedback_mirror_sync", use_container_width=True):
+            try:
+                with st.spinner("Sincronizando espejo local..."):
+                    mstate = local_mirror.sync()
+                st.toast(f"🪞 Espejo local: {mstate['new_rows']} filas nuevas o modificadas ({mstate['rows']} en total).")
+            except local_mirror.MirrorError as e:
+                st.error(str(e))
+    if st.button("↻ Recargar todo", key="feedback_full_reload", help="Descarta el caché incremental y recalcula los agregados."):
+        st.session_state.pop(_DASH_CACHE_KEY, None)
     try:
-        rows = _fetch_rows(senti_filter, d_from, d_to)
-        if rows:
-            dv = pd.DataFrame(rows)
-            
-            if 'Fecha' in dv.columns:
-                dv["Fecha"] = pd.to_datetime(dv["Fecha"], utc=True)
-                dv["dia"] = dv["Fecha"].dt.date
-            else:
-                dv["Fecha"] = pd.Timestamp.utcnow() 
-                dv["dia"] = dv["Fecha"].dt.date
-                st.warning("La columna 'Fecha' no se encontró en los datos de Supabase. Mostrando fecha actual.")
-
+        if use_mirror:
+            agg = local_mirror.summary(senti_filter, *_date_bounds(d_from, d_to))
+        elif ROLLUP_ENABLED:
+            agg = _fetch_rollup(senti_filter, d_from, d_to)
+        else:
+            agg = _dashboard_summary(senti_filter, d_from, d_to)
+        if not agg.empty:
             # Métricas
+            by_sent = agg.groupby("Sentimiento")["total"].sum()
             m1, m2, m3 = st.columns(3)
-            m1.metric("Total comentarios", len(dv))
-            m2.metric("Positivos", int((dv["Sentimiento"] == "positivo").sum()))
-            m3.metric("Negativos", int((dv["Sentimiento"] == "negativo").sum()))
+            m1.metric("Total comentarios", int(agg["total"].sum()))
+            m2.metric("Positivos", int(by_sent.get("positivo", 0)))
+            m3.metric("Negativos", int(by_sent.get("negativo", 0)))
 
             st.markdown("---")
+            resolution = _chart_resolution(d_from, d_to, agg)
+            specs = _chart_specs(agg, resolution)
+            label = _RESOLUTION_LABELS[resolution]
+
             st.subheader("Distribución de Sentimientos")
-            sent_counts = dv["Sentimiento"].value_counts().reset_index()
-            sent_counts.columns = ["Sentimiento", "count"]
-            pie = alt.Chart(sent_counts).mark_arc(innerRadius=40).encode(
-                theta=alt.Theta("count", stack=True),
-                color=alt.Color("Sentimiento", legend=alt.Legend(title="Sentimiento")),
-                order=alt.Order("count", sort="descending"),
-                tooltip=["Sentimiento","count"]
-            ).properties(title="Comentarios por Sentimiento")
-            st.altair_chart(pie, use_container_width=True)
-
-            st.subheader("Tendencia Diaria de Reclamos")
-            daily = dv.groupby("dia", as_index=False)["Id_reclamo"].count()
-            area = alt.Chart(daily).mark_area(opacity=0.6, line=True).encode(
-                x=alt.X("dia:T", title="Fecha"), 
-                y=alt.Y("Id_reclamo:Q", title="Cantidad de Reclamos"), 
-                tooltip=[alt.Tooltip("dia:T", title="Fecha"), alt.Tooltip("Id_reclamo:Q", title="Cantidad")]
-            ).properties(title="Tendencia Diaria de Reclamos")
-            st.altair_chart(area, use_container_width=True)
+            st.vega_lite_chart(specs["pie"], use_container_width=True)
+
+            st.subheader(f"Tendencia de Reclamos por {label}")
+            st.vega_lite_chart(specs["area"], use_container_width=True)
 
             st.subheader("Clasificación por Sentimiento")
-            cls_sent = dv.groupby(["Clasificacion","Sentimiento"], as_index=False).size().rename(columns={'size': 'Count'})
-            stacked = alt.Chart(cls_sent).mark_bar().encode(
-                x=alt.X("Clasificacion:N", sort="-y", title="Clasificación"),
-                y=alt.Y("Count:Q", title="Cantidad"),
-                color=alt.Color("Sentimiento:N", legend=alt.Legend(title="Sentimiento")),
-                tooltip=["Clasificacion","Sentimiento","Count"]
-            ).properties(title="Distribución de Clasificaciones por Sentimiento").interactive()
-            st.altair_chart(stacked, use_container_width=True)
-
-            st.subheader("Mapa de Calor: Reclamos por Día y Clasificación")
-            heat_data = dv.groupby(["dia","Clasificacion"], as_index=False).size().rename(columns={'size': 'Count'})
-            heat = alt.Chart(heat_data).mark_rect().encode(
-                x=alt.X("dia:T", title="Fecha"), 
-                y=alt.Y("Clasificacion:N", title="Clasificación"),
-                color=alt.Color("Count:Q", title="Cantidad", scale=alt.Scale(range="heatmap")),
-                tooltip=[alt.Tooltip("dia:T", title="Fecha"), "Clasificacion:N", alt.Tooltip("Count:Q", title="Cantidad")]
-            ).properties(title="Cantidad de Reclamos por Día y Clasificación").interactive()
-            st.altair_chart(heat, use_container_width=True)
+            st.vega_lite_chart(specs["stacked"], use_container_width=True)
+
+            st.subheader(f"Mapa de Calor: Reclamos por {label.capitalize()} y Clasificación")
+            st.vega_lite_chart(specs["heat"], use_container_width=True)
 
             st.markdown("### Tabla de Reclamos")
-            st.dataframe(
-                dv[["Fecha","Det_reclamo","Sentimiento","Clasificacion","DNI","Id_chat","Id_reclamo"]]
-                  .sort_values("Fecha", ascending=False),
-                use_container_width=True,
-                hide_index=True
-            )
+            # Las filas completas solo se descargan si se pide la tabla
+            if st.toggle("Mostrar tabla de reclamos", value=False, key="feedback_show_table"):
+                _render_table(senti_filter, d_from, d_to, use_mirror)
         else:
             st.info("Sin datos para los filtros actuales. Prueba a cargar un CSV o ajusta los filtros de fecha/sentimiento.")
     except Exception as e:
+        reset_supabase()  # el próximo rerun usa un cliente nuevo si la conexión quedó rota
         st.error(f"❌ Error consultando Supabase o generando gráficos: {e}")
         st.exception(e)
     st.markdown("</div>", unsafe_allow_html=True)
\ No newline at end of file
@@ -1,6 +1,7 @@
 # app/tabs/tab_product.py
 import io, json, time, requests, streamlit as st
 from services.productvision_client import describe_product_base64, ProductVisionError
+from services.image_prep import prepare_image
 
 def _strip_status_layer(data):
     """Quita 'status' de la respuesta y devuelve el contenido útil.
@@ -22,11 +23,12 @@ def _file_card(title: str, b: bytes, key_prefix: str):
     with c1:
         st.image(io.BytesIO(b), use_container_width=True)
     with c2:
-        kb = len(b) / 1024
+        prep = st.session_state.get(f"{key_prefix}_prep")
         st.caption(title)
-        st.caption(f"{kb:,.1f} KB")
+        st.caption(prep.summary() if prep else f"{len(b) / 1024:,.1f} KB")
         if st.button("Cambiar", key=f"{key_prefix}_change"):
             st.session_state.pop(f"{key_prefix}_bytes", None)
+            st.session_state.pop(f"{key_prefix}_prep", None)
             st.rerun()
 
 def render():
@@ -73,8 +75,11 @@ def render():
                                   help="Haz clic o suelta el archivo aquí (hasta ~200MB).")
             st.markdown('</div>', unsafe_allow_html=True)
             if up is not None:
-                st.session_state["pv_img_bytes"] = up.getvalue()
-                st.session_state["pv_img_mime"]  = getattr(up, "type", "image/jpeg")
+                # se reduce/limpia antes de guardarla: Cloud Run recibe la versión liviana
+                prep = prepare_image(up.getvalue(), "product", mime=getattr(up, "type", None))
+                st.session_state["pv_img_bytes"] = prep.data
+                st.session_state["pv_img_mime"]  = prep.mime
+                st.session_state["pv_img_prep"]  = prep
                 st.rerun()
 
         # Prompt obligatorio
@@ -91,7 +96,7 @@ def render():
         clr = cB.button("Limpiar", use_container_width=True)
 
         if clr:
-            for k in ("pv_img_bytes","pv_img_mime","pv_json"):
+            for k in ("pv_img_bytes","pv_img_mime","pv_img_prep","pv_json"):
                 st.session_state.pop(k, None)
             st.rerun()
 
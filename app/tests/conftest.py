@@ -0,0 +1,22 @@
+# tests/conftest.py
+import importlib.util
+import os
+import sys
+import types
+
+# los módulos de la app se importan como `services.*` / `tabs.*` (igual que con `streamlit run app/main.py`)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def _stub(name: str, **attrs) -> None:
+    """Módulo mínimo para dependencias que los tests no ejercitan (sin red ni credenciales)."""
+    if importlib.util.find_spec(name.split(".")[0]) is not None:
+        return
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+
+def _no_client(*args, **kwargs):
+    raise RuntimeError("supabase no está instalado: los tests no deben llamar a la base")
+
+_stub("supabase", create_client=_no_client, Client=object)
+_stub("streamlit_autorefresh", st_autorefresh=lambda *args, **kwargs: 0)
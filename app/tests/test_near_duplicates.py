@@ -0,0 +1,16 @@
+# tests/test_near_duplicates.py
+from services.near_duplicates import plan_near_duplicates
+
+def test_negation_is_not_grouped_with_its_affirmation():
+    texts = ["me gustó la atención en tienda", "no me gustó la atención en tienda",
+             "Me gusto la atencion en tienda!", "NO me gusto la atencion en tienda"]
+    plan = plan_near_duplicates(texts, threshold=0.9)
+
+    assert plan.rep_of == [0, 1, 0, 1]
+    assert plan.fan_out(["positivo", "negativo"]) == ["positivo", "negativo", "positivo", "negativo"]
+
+def test_near_duplicates_with_same_polarity_are_grouped():
+    texts = ["el pedido llegó roto y nadie me respondió por el chat de soporte",
+             "el pedido llego roto y nadie me respondio por el chat de soporte.",
+             "el pedido llegó roto y nadie me respondió por el chat del soporte"]
+    assert plan_near_duplicates(texts, threshold=0.8).rep_of == [0, 0, 0]
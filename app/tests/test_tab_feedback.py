@@ -0,0 +1,67 @@
+# tests/test_tab_feedback.py
+"""Smoke test: el dashboard de feedback se dibuja completo con datos (gráficos incluidos)."""
+import pytest
+
+pytest.importorskip("altair")
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+def _app():
+    import pandas as pd
+    from tabs import tab_feedback
+
+    agg = pd.DataFrame({
+        "dia": pd.to_datetime(["2026-10-01", "2026-10-01", "2026-10-02", "2026-10-03"]).date,
+        "Clasificacion": ["facturacion", "entrega", "facturacion", "otros"],
+        "Sentimiento": ["negativo", "neutral", "positivo", "negativo"],
+        "total": [3, 1, 2, 5],
+    })
+    # sin Supabase ni cola de trabajos: solo el camino de render del dashboard
+    tab_feedback.ROLLUP_ENABLED = False
+    tab_feedback._dashboard_summary = lambda *args, **kwargs: agg
+    tab_feedback._jobs_panel_live = lambda: None
+    tab_feedback.render()
+
+def test_dashboard_renders_with_data():
+    at = AppTest.from_function(_app, default_timeout=30).run()
+
+    assert not at.exception
+    assert not at.error, [e.value for e in at.error]  # render() atrapa y muestra los errores de gráficos
+    assert at.metric[0].value == "11"
+    assert len(at.get("vega_lite_chart")) == 4
+
+def test_dashboard_counts_rows_committed_late(monkeypatch):
+    import importlib
+    import types
+    import pandas as pd
+    from tabs import tab_feedback
+
+    tab_feedback = importlib.reload(tab_feedback)  # el smoke test reemplaza _dashboard_summary en el módulo
+
+    t = lambda hhmm: pd.Timestamp(f"2026-10-17T10:{hhmm}:00+00:00")
+    table = [("a", t("00")), ("b", t("05"))]
+
+    def since(ts):
+        return [{"Id_reclamo": i, "Fecha": f.isoformat(), "Clasificacion": "otros", "Sentimiento": "negativo"}
+                for i, f in table if ts is None or f >= pd.Timestamp(ts)]
+
+    def summary(*args, until=None, **kwargs):
+        d = pd.DataFrame([r for r in since(None) if pd.Timestamp(r["Fecha"]) < pd.Timestamp(until)],
+                         columns=["Id_reclamo", "Fecha", "Clasificacion", "Sentimiento"])
+        d["dia"] = pd.to_datetime(d["Fecha"]).dt.date
+        return d.groupby(tab_feedback._SUMMARY_KEYS, as_index=False).size().rename(columns={"size": "total"})
+
+    monkeypatch.setattr(tab_feedback, "st", types.SimpleNamespace(session_state={}))
+    monkeypatch.setattr(tab_feedback, "WATERMARK_LOOKBACK_S", 120)
+    monkeypatch.setattr(tab_feedback, "_latest_fecha", lambda *a: max(f for _, f in table).isoformat())
+    monkeypatch.setattr(tab_feedback, "_fetch_summary", summary)
+    monkeypatch.setattr(tab_feedback, "_fetch_since", lambda s, lo, hi, ts: since(ts))
+    total = lambda: int(tab_feedback._dashboard_summary(["negativo"])["total"].sum())
+
+    assert total() == 2
+    table.append(("c", t("06")))
+    assert total() == 3
+    # lote paralelo que confirma después de "c" con una Fecha (inicio de su transacción) anterior
+    table.append(("tarde", t("04")))
+    assert total() == 4
+    assert total() == 4  # la ventana lo vuelve a traer pero no lo cuenta dos veces
@@ -0,0 +1,19 @@
+-- Recalcula public.reclamos_diario desde cero a partir de public.reclamos.
+-- Ejecutar una vez después de crear el rollup (sql/setup.sql) o si se sospecha
+-- que quedó desalineado. El LOCK evita que entren escrituras durante el recálculo
+-- (los triggers seguirán manteniéndolo después).
+BEGIN;
+LOCK TABLE public.reclamos IN SHARE MODE;
+LOCK TABLE public.reclamos_diario IN EXCLUSIVE MODE;
+
+TRUNCATE public.reclamos_diario;
+
+INSERT INTO public.reclamos_diario (dia, "Clasificacion", "Sentimiento", total)
+SELECT ("Fecha" AT TIME ZONE 'UTC')::date,
+       COALESCE("Clasificacion"::text, ''),
+       COALESCE("Sentimiento"::text, ''),
+       count(*)
+FROM public.reclamos
+GROUP BY 1, 2, 3;
+
+COMMIT;
@@ -1,2 +1,135 @@
 ﻿ALTER TABLE public.tu_tabla
 ADD CONSTRAINT tu_tabla_id_reclamo_key UNIQUE ("Id_reclamo");
+
+
+-- Índice para los filtros por rango de fechas del dashboard
+CREATE INDEX IF NOT EXISTS reclamos_fecha_idx ON public.reclamos ("Fecha" DESC);
+
+-- Agregados del dashboard (tab_feedback): una fila por (día UTC, Clasificacion, Sentimiento).
+-- Métricas, torta, tendencia diaria, barras y mapa de calor salen de este resultado,
+-- así que el dashboard ya no descarga filas completas.
+-- Uso desde supabase-py: sb.rpc("reclamos_resumen", {"p_sentimientos": [...], "p_desde": "...", "p_hasta": "..."})
+CREATE OR REPLACE FUNCTION public.reclamos_resumen(
+  p_sentimientos text[]      DEFAULT NULL,
+  p_desde        timestamptz DEFAULT NULL,
+  p_hasta        timestamptz DEFAULT NULL   -- exclusivo
+)
+RETURNS TABLE (dia date, "Clasificacion" text, "Sentimiento" text, total bigint)
+LANGUAGE sql STABLE
+AS $$
+  SELECT (r."Fecha" AT TIME ZONE 'UTC')::date AS dia,
+         r."Clasificacion"::text,
+         r."Sentimiento"::text,
+         count(*) AS total
+  FROM public.reclamos r
+  WHERE (p_sentimientos IS NULL OR r."Sentimiento" = ANY (p_sentimientos))
+    AND (p_desde IS NULL OR r."Fecha" >= p_desde)
+    AND (p_hasta IS NULL OR r."Fecha" <  p_hasta)
+  GROUP BY 1, 2, 3
+  ORDER BY 1;
+$$;
+
+-- Paginación por keyset de la "Tabla de Reclamos": orden (Fecha, Id_reclamo) descendente
+CREATE INDEX IF NOT EXISTS reclamos_fecha_id_idx ON public.reclamos ("Fecha" DESC, "Id_reclamo" DESC);
+
+-- (Opcional) acelera el filtro de texto (ILIKE '%...%') sobre Det_reclamo
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS reclamos_det_trgm_idx ON public.reclamos USING gin ("Det_reclamo" gin_trgm_ops);
+
+-- Rollup diario mantenido por triggers: una fila por (día UTC, Clasificacion, Sentimiento).
+-- El dashboard lee de aquí, así que su costo depende de los días del rango y no de la
+-- cantidad de reclamos. Para poblarlo con la historia existente: sql/backfill_reclamos_diario.sql
+CREATE TABLE IF NOT EXISTS public.reclamos_diario (
+  dia             date   NOT NULL,
+  "Clasificacion" text   NOT NULL,
+  "Sentimiento"   text   NOT NULL,
+  total           bigint NOT NULL DEFAULT 0,
+  PRIMARY KEY (dia, "Clasificacion", "Sentimiento")
+);
+
+-- Aplica deltas agregados (un upsert por grupo, no por fila)
+CREATE OR REPLACE FUNCTION public.reclamos_diario_aplicar(p_deltas jsonb)
+RETURNS void
+LANGUAGE sql
+AS $$
+  INSERT INTO public.reclamos_diario AS d (dia, "Clasificacion", "Sentimiento", total)
+  SELECT (x->>'dia')::date, x->>'c', x->>'s', (x->>'n')::bigint
+  FROM jsonb_array_elements(p_deltas) AS x
+  WHERE (x->>'n')::bigint <> 0
+  ORDER BY 1, 2, 3  -- orden fijo de bloqueo: evita deadlocks entre lotes concurrentes
+  ON CONFLICT (dia, "Clasificacion", "Sentimiento")
+  DO UPDATE SET total = d.total + EXCLUDED.total;
+$$;
+
+-- Triggers por sentencia con tablas de transición: un upsert masivo de N filas genera
+-- a lo sumo un delta por grupo. INSERT ... ON CONFLICT DO UPDATE dispara ambos
+-- (insert para las filas nuevas, update para las reclasificadas por Id_reclamo).
+CREATE OR REPLACE FUNCTION public.reclamos_diario_trg()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  deltas jsonb;
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    SELECT jsonb_agg(jsonb_build_object('dia', dia, 'c', c, 's', s, 'n', n)) INTO deltas FROM (
+      SELECT (r."Fecha" AT TIME ZONE 'UTC')::date AS dia, COALESCE(r."Clasificacion"::text, '') AS c,
+             COALESCE(r."Sentimiento"::text, '') AS s, count(*) AS n
+      FROM nuevas r GROUP BY 1, 2, 3) g;
+  ELSIF TG_OP = 'DELETE' THEN
+    SELECT jsonb_agg(jsonb_build_object('dia', dia, 'c', c, 's', s, 'n', -n)) INTO deltas FROM (
+      SELECT (r."Fecha" AT TIME ZONE 'UTC')::date AS dia, COALESCE(r."Clasificacion"::text, '') AS c,
+             COALESCE(r."Sentimiento"::text, '') AS s, count(*) AS n
+      FROM viejas r GROUP BY 1, 2, 3) g;
+  ELSE  -- UPDATE: resta la versión vieja y suma la nueva de cada fila
+    SELECT jsonb_agg(jsonb_build_object('dia', dia, 'c', c, 's', s, 'n', n)) INTO deltas FROM (
+      SELECT dia, c, s, sum(n) AS n FROM (
+        SELECT (r."Fecha" AT TIME ZONE 'UTC')::date AS dia, COALESCE(r."Clasificacion"::text, '') AS c,
+               COALESCE(r."Sentimiento"::text, '') AS s, 1 AS n FROM nuevas r
+        UNION ALL
+        SELECT (r."Fecha" AT TIME ZONE 'UTC')::date, COALESCE(r."Clasificacion"::text, ''),
+               COALESCE(r."Sentimiento"::text, ''), -1 FROM viejas r
+      ) u GROUP BY 1, 2, 3) g;
+  END IF;
+  IF deltas IS NOT NULL THEN
+    PERFORM public.reclamos_diario_aplicar(deltas);
+  END IF;
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS reclamos_diario_ins ON public.reclamos;
+CREATE TRIGGER reclamos_diario_ins AFTER INSERT ON public.reclamos
+  REFERENCING NEW TABLE AS nuevas
+  FOR EACH STATEMENT EXECUTE FUNCTION public.reclamos_diario_trg();
+
+DROP TRIGGER IF EXISTS reclamos_diario_upd ON public.reclamos;
+CREATE TRIGGER reclamos_diario_upd AFTER UPDATE ON public.reclamos
+  REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+  FOR EACH STATEMENT EXECUTE FUNCTION public.reclamos_diario_trg();
+
+DROP TRIGGER IF EXISTS reclamos_diario_del ON public.reclamos;
+CREATE TRIGGER reclamos_diario_del AFTER DELETE ON public.reclamos
+  REFERENCING OLD TABLE AS viejas
+  FOR EACH STATEMENT EXECUTE FUNCTION public.reclamos_diario_trg();
+
+-- Última modificación de cada fila, para la sincronización incremental del espejo local
+-- (services/local_mirror.py): un upsert que reclasifica una fila existente la vuelve a
+-- marcar, así el espejo la trae sin --full. Al agregarla, las filas existentes quedan con
+-- la hora de la migración (el primer sync posterior re-descarga todo una vez).
+ALTER TABLE public.reclamos ADD COLUMN IF NOT EXISTS "Actualizado" timestamptz NOT NULL DEFAULT now();
+CREATE INDEX IF NOT EXISTS reclamos_actualizado_idx ON public.reclamos ("Actualizado", "Id_reclamo");
+
+CREATE OR REPLACE FUNCTION public.reclamos_actualizado_trg()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  NEW."Actualizado" := now();
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS reclamos_actualizado ON public.reclamos;
+CREATE TRIGGER reclamos_actualizado BEFORE UPDATE ON public.reclamos
+  FOR EACH ROW EXECUTE FUNCTION public.reclamos_actualizado_trg();